@@ -0,0 +1,531 @@
+"""
+Analytics Query Service for the Data Warehouse
+
+A small read-only HTTP API over the warehouse for dashboards and game
+features, so consumers stop running their own aggregate SQL against the
+fact tables:
+
+    GET /players/<user_id>                       lifetime stats of a player
+    GET /leaderboard?metric=wins&limit=10&days=30
+                                                 top players by wins, games
+                                                 or win_rate (min_games)
+    GET /revenue/daily?from=2025-01-01&to=2025-01-31&type=purchase
+                                                 daily totals from the rollups
+    GET /roles/win-rates?from=2025-01-01&to=2025-01-31
+                                                 win and survival rate per role
+    GET /health, GET /metrics
+
+Results are cached per endpoint and parameters, bounded in size (least
+recently used entries are evicted) and in age. A background thread polls
+etl_run_log for newly successful runs and drops exactly the entries of the
+endpoints that read the tables those runs wrote, so a repeated dashboard
+load is served from memory until the data it shows actually changes.
+
+Usage:
+    python analytics_service.py
+
+Environment Variables:
+    ANALYTICS_PORT: HTTP port (default: 8088)
+    ANALYTICS_CACHE_SIZE: Cached results kept (default: 1000)
+    ANALYTICS_CACHE_TTL_SECONDS: Maximum age of a cached result (default: 300)
+    ANALYTICS_POLL_SECONDS: Interval of the etl_run_log poll (default: 5)
+    ANALYTICS_POOL_SIZE: Warehouse connections shared by requests (default: 10)
+    ANALYTICS_POOL_WAIT_SECONDS: How long a request waits for a free
+        connection before it is answered with 503 (default: 10)
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+import metrics
+from etl_pipeline import ConnectionPools
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+logger = logging.getLogger("Analytics-Service")
+
+ANALYTICS_PORT = int(os.getenv("ANALYTICS_PORT", "8088"))
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "1000"))
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "300"))
+ANALYTICS_POLL_SECONDS = float(os.getenv("ANALYTICS_POLL_SECONDS", "5"))
+ANALYTICS_POOL_SIZE = int(os.getenv("ANALYTICS_POOL_SIZE", "10"))
+ANALYTICS_POOL_WAIT_SECONDS = float(os.getenv("ANALYTICS_POOL_WAIT_SECONDS", "10"))
+
+# Runs are picked up by end time; re-read this far back so a run whose end
+# time is older than one already seen (written by another ETL process) is
+# not missed
+RUN_POLL_OVERLAP = timedelta(minutes=5)
+
+LEADERBOARD_METRICS = {
+    "wins": "COUNT(*) FILTER (WHERE s.is_winner)",
+    "games": "COUNT(*)",
+    "win_rate": "ROUND(AVG(s.is_winner::int), 4)",
+}
+LEADERBOARD_MAX_LIMIT = 100
+
+# Endpoint name -> the warehouse tables its query reads. Every ETL table
+# run listed here invalidates the endpoint's cached results (rollups are
+# logged under the 'warehouse' source by refresh_rollups). Session outcomes
+# are rewritten by refresh_games, which runs of any game table trigger.
+ENDPOINTS = {
+    "player": (
+        "dim_users",
+        "fact_games",
+        "fact_player_sessions",
+        "fact_game_actions",
+        "fact_transactions",
+    ),
+    "leaderboard": (
+        "dim_users",
+        "fact_games",
+        "fact_player_sessions",
+        "fact_game_actions",
+    ),
+    "daily_revenue": ("agg_daily_transaction_types",),
+    "role_win_rates": ("agg_daily_role_stats",),
+}
+
+
+class BadRequest(ValueError):
+    """A request parameter is missing or invalid (HTTP 400)."""
+
+
+class Busy(RuntimeError):
+    """No warehouse connection became free in time (HTTP 503)."""
+
+
+class ResultCache:
+    """Bounded LRU cache of query results with a TTL and per-table invalidation.
+
+    Every entry records the tables its result was read from. Tables carry
+    a version that invalidate() bumps; a result is only stored if none of
+    its tables changed while it was being queried, so a query racing an
+    ETL run never caches data from before that run.
+    """
+
+    def __init__(self, maxsize: int = ANALYTICS_CACHE_SIZE, ttl: float = ANALYTICS_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: "OrderedDict[Tuple, Tuple[float, Tuple[str, ...], Any]]" = OrderedDict()
+        self.versions: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def snapshot(self, tables: Tuple[str, ...]) -> Tuple[int, ...]:
+        """Current versions of the given tables."""
+        with self.lock:
+            return tuple(self.versions.get(t, 0) for t in tables)
+
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        """(found, value) of a cached result that has not expired."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            expires, _, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return False, None
+            self.entries.move_to_end(key)
+            return True, value
+
+    def put(self, key: Tuple, tables: Tuple[str, ...], snapshot: Tuple[int, ...], value: Any):
+        """Store a result queried when its tables were at `snapshot`."""
+        with self.lock:
+            if tuple(self.versions.get(t, 0) for t in tables) != snapshot:
+                return
+            self.entries[key] = (time.monotonic() + self.ttl, tables, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, tables: List[str]) -> int:
+        """Drop every result read from any of the tables; returns the count."""
+        changed = set(tables)
+        with self.lock:
+            for table in changed:
+                self.versions[table] = self.versions.get(table, 0) + 1
+            stale = [k for k, (_, deps, _) in self.entries.items() if changed & set(deps)]
+            for key in stale:
+                del self.entries[key]
+        return len(stale)
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.entries)
+
+
+def parse_date(value: Optional[str], default: date) -> date:
+    """Parse an optional YYYY-MM-DD parameter."""
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise BadRequest(f"Invalid date: {value}")
+
+
+def parse_int(value: Optional[str], default: int, low: int, high: int) -> int:
+    """Parse an optional integer parameter within [low, high]."""
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise BadRequest(f"Invalid number: {value}")
+    if not low <= number <= high:
+        raise BadRequest(f"Number out of range [{low}, {high}]: {number}")
+    return number
+
+
+def json_default(value: Any) -> Any:
+    """JSON form of the Decimal and date values psycopg2 returns."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+class AnalyticsService:
+    """Parameterized warehouse queries behind a result cache."""
+
+    def __init__(self, pools: Optional[ConnectionPools] = None, cache: Optional[ResultCache] = None):
+        self.pools = pools or ConnectionPools(maxconn=ANALYTICS_POOL_SIZE)
+        # ThreadedConnectionPool raises instead of waiting when exhausted,
+        # so requests queue here for one of its connections
+        self.slots = threading.BoundedSemaphore(self.pools.maxconn)
+        self.cache = cache or ResultCache()
+        self.stopping = threading.Event()
+        # End time and ids of the successful runs seen by the last poll
+        self.last_run_end: Optional[datetime] = None
+        self.seen_runs: Dict[int, datetime] = {}
+
+    def query(self, sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Run a read-only query on a pooled warehouse connection.
+
+        Waits up to ANALYTICS_POOL_WAIT_SECONDS for a free connection.
+        """
+        if not self.slots.acquire(timeout=ANALYTICS_POOL_WAIT_SECONDS):
+            raise Busy("All warehouse connections are busy")
+        try:
+            conn = self.pools.getconn("warehouse")
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql, params)
+                    columns = [d[0] for d in cur.description]
+                    rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+                conn.commit()
+                return rows
+            finally:
+                self.pools.putconn("warehouse", conn)
+        finally:
+            self.slots.release()
+
+    def cached(self, endpoint: str, params: Dict[str, Any], compute: Callable[[], Any]) -> Any:
+        """Serve an endpoint result from the cache, computing it on a miss."""
+        key = (endpoint, tuple(sorted(params.items())))
+        found, value = self.cache.get(key)
+        metrics.observe_query_cache(endpoint, found)
+        if found:
+            return value
+        tables = ENDPOINTS[endpoint]
+        snapshot = self.cache.snapshot(tables)
+        value = compute()
+        self.cache.put(key, tables, snapshot, value)
+        return value
+
+    # =========================================
+    # ENDPOINTS
+    # =========================================
+
+    def player_stats(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Lifetime game and currency stats of one player, None if unknown."""
+        params = {"user_id": user_id}
+
+        def compute():
+            rows = self.query(
+                """
+                SELECT u.user_id, u.username, u.created_at,
+                       COALESCE(s.games, 0) AS games,
+                       COALESCE(s.wins, 0) AS wins,
+                       COALESCE(s.survivals, 0) AS survivals,
+                       COALESCE(s.votes_cast, 0) AS votes_cast,
+                       COALESCE(s.actions_taken, 0) AS actions_taken,
+                       s.first_played, s.last_played,
+                       COALESCE(t.purchased, 0) AS purchased,
+                       COALESCE(t.rewarded, 0) AS rewarded,
+                       COALESCE(t.spent, 0) AS spent
+                FROM dim_users u
+                LEFT JOIN LATERAL (
+                    SELECT COUNT(*) AS games,
+                           COUNT(*) FILTER (WHERE is_winner) AS wins,
+                           COUNT(*) FILTER (WHERE survived_until_end) AS survivals,
+                           SUM(votes_cast) AS votes_cast,
+                           SUM(actions_taken) AS actions_taken,
+                           MIN(joined_at) AS first_played,
+                           MAX(joined_at) AS last_played
+                    FROM fact_player_sessions
+                    WHERE user_id = u.user_id
+                ) s ON TRUE
+                LEFT JOIN LATERAL (
+                    SELECT SUM(amount) FILTER (WHERE transaction_type = 'purchase') AS purchased,
+                           SUM(amount) FILTER (WHERE transaction_type = 'reward') AS rewarded,
+                           SUM(amount) FILTER (WHERE transaction_type = 'spend') AS spent
+                    FROM fact_transactions
+                    WHERE user_id = u.user_id
+                ) t ON TRUE
+                WHERE u.user_id = %(user_id)s AND u.is_current
+            """,
+                params,
+            )
+            if not rows:
+                return None
+            player = rows[0]
+            player["win_rate"] = (
+                round(player["wins"] / player["games"], 4) if player["games"] else None
+            )
+            return player
+
+        return self.cached("player", params, compute)
+
+    def leaderboard(self, query: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Top players by wins, games played or win rate."""
+        metric = query.get("metric", "wins")
+        if metric not in LEADERBOARD_METRICS:
+            raise BadRequest(f"Unknown metric: {metric} ({', '.join(LEADERBOARD_METRICS)})")
+        params = {
+            "metric": metric,
+            "limit": parse_int(query.get("limit"), 10, 1, LEADERBOARD_MAX_LIMIT),
+            "days": parse_int(query.get("days"), 0, 0, 3650),
+            "min_games": parse_int(query.get("min_games"), 10 if metric == "win_rate" else 1, 1, 100000),
+        }
+
+        def compute():
+            since = (
+                datetime.utcnow() - timedelta(days=params["days"])
+                if params["days"]
+                else datetime(1970, 1, 1)
+            )
+            return self.query(
+                f"""
+                SELECT s.user_id, u.username,
+                       {LEADERBOARD_METRICS[metric]} AS value,
+                       COUNT(*) AS games
+                FROM fact_player_sessions s
+                LEFT JOIN dim_users u ON u.user_id = s.user_id AND u.is_current
+                WHERE s.joined_at >= %(since)s AND s.game_id IS NOT NULL
+                GROUP BY s.user_id, u.username
+                HAVING COUNT(*) >= %(min_games)s
+                ORDER BY value DESC, games DESC, s.user_id
+                LIMIT %(limit)s
+            """,
+                {**params, "since": since},
+            )
+
+        return self.cached("leaderboard", params, compute)
+
+    def daily_revenue(self, query: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Daily transaction count, amount and unique users of one type."""
+        today = datetime.utcnow().date()
+        params = {
+            "from": parse_date(query.get("from"), today - timedelta(days=30)),
+            "to": parse_date(query.get("to"), today),
+            "type": query.get("type", "purchase"),
+        }
+        if params["from"] > params["to"]:
+            raise BadRequest("'from' is after 'to'")
+
+        def compute():
+            return self.query(
+                """
+                SELECT t.full_date AS day, a.transaction_count,
+                       a.total_amount, a.unique_users
+                FROM agg_daily_transaction_types a
+                JOIN dim_time t ON t.time_id = a.time_id
+                WHERE t.full_date BETWEEN %(from)s AND %(to)s
+                  AND a.transaction_type = %(type)s
+                ORDER BY t.full_date
+            """,
+                params,
+            )
+
+        return self.cached("daily_revenue", params, compute)
+
+    def role_win_rates(self, query: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Sessions, win rate and survival rate per role over a date range."""
+        today = datetime.utcnow().date()
+        params = {
+            "from": parse_date(query.get("from"), today - timedelta(days=30)),
+            "to": parse_date(query.get("to"), today),
+        }
+        if params["from"] > params["to"]:
+            raise BadRequest("'from' is after 'to'")
+
+        def compute():
+            return self.query(
+                """
+                SELECT r.role_name, r.role_type, SUM(a.sessions) AS sessions,
+                       ROUND(SUM(a.wins)::numeric / NULLIF(SUM(a.sessions), 0), 4) AS win_rate,
+                       ROUND(SUM(a.survivals)::numeric / NULLIF(SUM(a.sessions), 0), 4)
+                           AS survival_rate
+                FROM agg_daily_role_stats a
+                JOIN dim_time t ON t.time_id = a.time_id
+                JOIN dim_roles r ON r.role_id = a.role_id
+                WHERE t.full_date BETWEEN %(from)s AND %(to)s
+                GROUP BY r.role_name, r.role_type
+                ORDER BY sessions DESC
+            """,
+                params,
+            )
+
+        return self.cached("role_win_rates", params, compute)
+
+    # =========================================
+    # INVALIDATION
+    # =========================================
+
+    def poll_runs(self) -> List[str]:
+        """Invalidate the cache for tables with new successful ETL runs.
+
+        Returns the tables that changed since the previous poll.
+        """
+        if self.last_run_end is None:
+            # Results cached from now on already include every earlier run
+            rows = self.query(
+                "SELECT MAX(run_end_time) AS last FROM etl_run_log WHERE status = 'success'",
+                {},
+            )
+            self.last_run_end = rows[0]["last"] or datetime(1970, 1, 1)
+            return []
+
+        runs = self.query(
+            """
+            SELECT run_id, table_name, run_end_time
+            FROM etl_run_log
+            WHERE status = 'success' AND run_end_time >= %(since)s
+        """,
+            {"since": self.last_run_end - RUN_POLL_OVERLAP},
+        )
+        new = [r for r in runs if r["run_id"] not in self.seen_runs]
+        for run in new:
+            self.seen_runs[run["run_id"]] = run["run_end_time"]
+            self.last_run_end = max(self.last_run_end, run["run_end_time"])
+        cutoff = self.last_run_end - RUN_POLL_OVERLAP
+        self.seen_runs = {k: v for k, v in self.seen_runs.items() if v >= cutoff}
+
+        tables = sorted({r["table_name"] for r in new})
+        if tables:
+            dropped = self.cache.invalidate(tables)
+            logger.info(f"♻️ New runs of {', '.join(tables)}: dropped {dropped} cached results")
+        return tables
+
+    def poll_forever(self):
+        """Poll etl_run_log until stopped, surviving warehouse outages."""
+        while not self.stopping.is_set():
+            try:
+                self.poll_runs()
+            except Exception as e:
+                # Cached results may be stale while the log cannot be read
+                logger.error(f"❌ etl_run_log poll failed, clearing the cache: {e}")
+                self.cache.invalidate(sorted({t for ts in ENDPOINTS.values() for t in ts}))
+            self.stopping.wait(ANALYTICS_POLL_SECONDS)
+
+
+ROUTES = [
+    (re.compile(r"^/players/(?P<user_id>[^/]+)$"), "player"),
+    (re.compile(r"^/leaderboard$"), "leaderboard"),
+    (re.compile(r"^/revenue/daily$"), "daily_revenue"),
+    (re.compile(r"^/roles/win-rates$"), "role_win_rates"),
+]
+
+
+def make_handler(service: AnalyticsService):
+    """Request handler class bound to a service instance."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, status: int, body: Any):
+            payload = json.dumps(body, default=json_default).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            if url.path == "/health":
+                return self.send_json(200, {"status": "ok", "cached": len(service.cache)})
+            if url.path == "/metrics":
+                payload = generate_latest()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE_LATEST)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            for pattern, endpoint in ROUTES:
+                match = pattern.match(url.path)
+                if not match:
+                    continue
+                try:
+                    if endpoint == "player":
+                        result = service.player_stats(match.group("user_id"))
+                        if result is None:
+                            return self.send_json(404, {"error": "Unknown player"})
+                    else:
+                        result = getattr(service, endpoint)(query)
+                except BadRequest as e:
+                    return self.send_json(400, {"error": str(e)})
+                except Busy as e:
+                    logger.warning(f"⚠️ {endpoint} rejected: {e}")
+                    return self.send_json(503, {"error": str(e)})
+                except Exception as e:
+                    logger.error(f"❌ {endpoint} query failed: {e}")
+                    return self.send_json(500, {"error": "Query failed"})
+                return self.send_json(200, result)
+            self.send_json(404, {"error": "Not found"})
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return Handler
+
+
+def main():
+    service = AnalyticsService()
+    poller = threading.Thread(target=service.poll_forever, name="etl-run-poll", daemon=True)
+    poller.start()
+
+    server = ThreadingHTTPServer(("0.0.0.0", ANALYTICS_PORT), make_handler(service))
+    logger.info(
+        f"🚀 Analytics service on :{ANALYTICS_PORT} (cache {ANALYTICS_CACHE_SIZE} results, "
+        f"TTL {ANALYTICS_CACHE_TTL_SECONDS:.0f}s, run poll every {ANALYTICS_POLL_SECONDS:.0f}s)"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Analytics service stopped.")
+    finally:
+        service.stopping.set()
+        server.server_close()
+        service.pools.closeall()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,565 @@
+"""
+Benchmarks for the Data Warehouse ETL
+
+Measures warehouse write throughput of the available load methods, and
+end-to-end pipeline throughput against synthetic source data, so
+strategies can be compared on real hardware before changing defaults and
+regressions caught between releases.
+
+Usage:
+    python benchmark.py loaders --rows 100000
+    python benchmark.py loaders --rows 1000000 --batch-size 10000 --methods copy
+    python benchmark.py generate --rows 1000000 --reset
+    python benchmark.py pipeline --incremental-rows 10000
+
+`generate` and `pipeline` write to the databases configured through the
+usual *_DB_* environment variables, which must point at disposable local
+stand-ins, never at the platform databases.
+
+Results are printed as JSON, one object per load method or pipeline phase.
+"""
+
+import sys
+import json
+import time
+import random
+import resource
+import argparse
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import metrics
+from etl_pipeline import (
+    ETLPipeline,
+    ETL_BATCH_SIZE,
+    ETL_PIPELINE_DEPTH,
+    ETL_WORKERS,
+    FACT_TRANSACTIONS_COLUMNS,
+    LOAD_METHODS,
+    ROLLUPS,
+)
+
+logger = logging.getLogger("ETL-Benchmark")
+
+TRANSACTION_TYPES = ("purchase", "reward", "spend")
+
+# Share of generated rows per source table
+SCALE_MIX = {
+    "User": 0.10,
+    "CurrencyTransaction": 0.52,
+    "Lobby": 0.02,
+    "LobbyTimeCycle": 0.02,
+    "LobbyPlayer": 0.24,
+    "Vote": 0.10,
+}
+# Source rows generated per INSERT ... SELECT transaction
+GENERATE_CHUNK_ROWS = 1_000_000
+# Event times of a fresh data set span this window, ending now
+GENERATE_SPAN = timedelta(days=180)
+# Share of existing users and lobbies modified before an incremental run
+UPDATE_FRACTION = 0.01
+
+# Minimal source tables with the columns the extract queries read
+SOURCE_DDL = {
+    "user_service": """
+        CREATE TABLE IF NOT EXISTS "User" (
+            id TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            email TEXT NOT NULL,
+            "createdAt" TIMESTAMP NOT NULL,
+            "updatedAt" TIMESTAMP NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS "User_updatedAt_id_idx" ON "User" ("updatedAt", id);
+        CREATE TABLE IF NOT EXISTS "CurrencyTransaction" (
+            id TEXT PRIMARY KEY,
+            "userId" TEXT NOT NULL,
+            type TEXT NOT NULL,
+            amount NUMERIC(10, 2) NOT NULL,
+            description TEXT,
+            "createdAt" TIMESTAMP NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS "CurrencyTransaction_createdAt_id_idx"
+            ON "CurrencyTransaction" ("createdAt", id);
+    """,
+    "game_service": """
+        CREATE TABLE IF NOT EXISTS "Lobby" (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            "maxPlayers" INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            "cycleNumber" INTEGER NOT NULL DEFAULT 0,
+            "gameStartTime" TIMESTAMP,
+            "gameEndTime" TIMESTAMP,
+            "createdAt" TIMESTAMP NOT NULL,
+            "updatedAt" TIMESTAMP NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS "Lobby_updatedAt_id_idx" ON "Lobby" ("updatedAt", id);
+        CREATE TABLE IF NOT EXISTS "LobbyTimeCycle" (
+            id TEXT PRIMARY KEY,
+            "lobbyId" TEXT NOT NULL,
+            "cycleNumber" INTEGER NOT NULL,
+            "timeCycle" TEXT NOT NULL,
+            "createdAt" TIMESTAMP NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS "LobbyPlayer" (
+            id TEXT PRIMARY KEY,
+            "lobbyId" TEXT NOT NULL,
+            "userId" TEXT NOT NULL,
+            role TEXT,
+            "joinedAt" TIMESTAMP NOT NULL,
+            "isAlive" BOOLEAN NOT NULL,
+            "isActive" BOOLEAN NOT NULL,
+            "updatedAt" TIMESTAMP NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS "LobbyPlayer_updatedAt_id_idx"
+            ON "LobbyPlayer" ("updatedAt", id);
+        CREATE TABLE IF NOT EXISTS "Vote" (
+            id TEXT PRIMARY KEY,
+            "lobbyId" TEXT NOT NULL,
+            "voterId" TEXT NOT NULL,
+            "targetId" TEXT,
+            "lobbyTimeCycleId" TEXT,
+            "createdAt" TIMESTAMP NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS "Vote_createdAt_id_idx" ON "Vote" ("createdAt", id);
+    """,
+}
+
+# Deterministic set-based generators: row i of every table always gets the
+# same values, so data sets of the same size are identical across runs.
+# Parameters: start/end (row numbers), ts (time of row `start`), step_ms,
+# users/lobbies/cycles (referenced key ranges).
+SOURCE_GENERATORS = {
+    "User": ("user_service", """
+        INSERT INTO "User" (id, username, email, "createdAt", "updatedAt")
+        SELECT 'bench-user-' || i, 'user' || i, 'user' || i || '@bench.local', t, t
+        FROM generate_series(%(start)s, %(end)s - 1) AS i,
+             LATERAL (SELECT %(ts)s + (i - %(start)s) * %(step_ms)s * interval '1 millisecond') AS x(t)
+    """),
+    "CurrencyTransaction": ("user_service", """
+        INSERT INTO "CurrencyTransaction"
+            (id, "userId", type, amount, description, "createdAt")
+        SELECT 'bench-tx-' || i,
+               'bench-user-' || (i * 2654435761 %% %(users)s),
+               (ARRAY['purchase', 'reward', 'spend'])[1 + i %% 3],
+               (i * 7919 %% 100000) / 100.0,
+               'Benchmark transaction ' || i,
+               t
+        FROM generate_series(%(start)s, %(end)s - 1) AS i,
+             LATERAL (SELECT %(ts)s + (i - %(start)s) * %(step_ms)s * interval '1 millisecond') AS x(t)
+    """),
+    "Lobby": ("game_service", """
+        INSERT INTO "Lobby"
+            (id, name, "maxPlayers", status, "cycleNumber", "gameStartTime",
+             "gameEndTime", "createdAt", "updatedAt")
+        SELECT 'bench-lobby-' || i, 'Lobby ' || i, 6 + i %% 10,
+               (ARRAY['WAITING', 'IN_GAME', 'FINISHED'])[1 + i %% 3],
+               CASE WHEN i %% 3 = 0 THEN 0 ELSE 1 + i %% 8 END,
+               CASE WHEN i %% 3 <> 0 THEN t END,
+               CASE WHEN i %% 3 = 2 THEN t + (10 + i %% 50) * interval '1 minute' END,
+               t, t
+        FROM generate_series(%(start)s, %(end)s - 1) AS i,
+             LATERAL (SELECT %(ts)s + (i - %(start)s) * %(step_ms)s * interval '1 millisecond') AS x(t)
+    """),
+    "LobbyTimeCycle": ("game_service", """
+        INSERT INTO "LobbyTimeCycle" (id, "lobbyId", "cycleNumber", "timeCycle", "createdAt")
+        SELECT 'bench-cycle-' || i, 'bench-lobby-' || (i %% %(lobbies)s),
+               1 + i / %(lobbies)s, (ARRAY['DAY', 'NIGHT'])[1 + i %% 2], t
+        FROM generate_series(%(start)s, %(end)s - 1) AS i,
+             LATERAL (SELECT %(ts)s + (i - %(start)s) * %(step_ms)s * interval '1 millisecond') AS x(t)
+    """),
+    "LobbyPlayer": ("game_service", """
+        INSERT INTO "LobbyPlayer"
+            (id, "lobbyId", "userId", role, "joinedAt", "isAlive", "isActive", "updatedAt")
+        SELECT 'bench-player-' || i,
+               'bench-lobby-' || (i %% %(lobbies)s),
+               'bench-user-' || (i * 2654435761 %% %(users)s),
+               (ARRAY['CITIZEN', 'MAFIA', 'DOCTOR', 'DETECTIVE', 'GODFATHER', 'SERIAL_KILLER'])[1 + i %% 6],
+               t, i %% 2 = 0, TRUE, t
+        FROM generate_series(%(start)s, %(end)s - 1) AS i,
+             LATERAL (SELECT %(ts)s + (i - %(start)s) * %(step_ms)s * interval '1 millisecond') AS x(t)
+    """),
+    "Vote": ("game_service", """
+        INSERT INTO "Vote"
+            (id, "lobbyId", "voterId", "targetId", "lobbyTimeCycleId", "createdAt")
+        SELECT 'bench-vote-' || i,
+               'bench-lobby-' || (i %% %(lobbies)s),
+               'bench-user-' || (i * 2654435761 %% %(users)s),
+               'bench-user-' || (i * 40503 %% %(users)s),
+               'bench-cycle-' || (i %% %(cycles)s),
+               t
+        FROM generate_series(%(start)s, %(end)s - 1) AS i,
+             LATERAL (SELECT %(ts)s + (i - %(start)s) * %(step_ms)s * interval '1 millisecond') AS x(t)
+    """),
+}
+# Append-only source tables, positioned by "createdAt"
+APPEND_ONLY_SOURCES = ("CurrencyTransaction", "LobbyTimeCycle", "Vote")
+# Source tables with an updatedAt column, touched before incremental runs
+UPDATABLE_SOURCES = {"User": "username", "Lobby": "name"}
+
+
+def synthetic_transactions(rows: int, batch_size: int) -> Iterator[List[Dict]]:
+    """Generate transformed fact_transactions rows in chunks."""
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1)
+    for offset in range(0, rows, batch_size):
+        yield [
+            {
+                "user_id": f"bench-user-{rng.randrange(10_000)}",
+                "user_key": None,
+                "transaction_type": rng.choice(TRANSACTION_TYPES),
+                "amount": Decimal(rng.randrange(1, 100_000)) / 100,
+                "description": f"Benchmark transaction {i}",
+                "occurred_at": start + timedelta(seconds=i),
+                "source_system": "user_service",
+                "source_transaction_id": f"bench-{i}",
+            }
+            for i in range(offset, min(offset + batch_size, rows))
+        ]
+
+
+def bench_loaders(pipeline: ETLPipeline, rows: int, methods: List[str]) -> List[Dict]:
+    """Time each load method writing the same synthetic rows.
+
+    Rows go into a temporary copy of fact_transactions (same defaults and
+    indexes), so the benchmark never touches warehouse data.
+    """
+    with pipeline.warehouse_conn.cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE bench_fact_transactions
+                (LIKE fact_transactions INCLUDING ALL)
+        """)
+    pipeline.warehouse_conn.commit()
+
+    results = []
+    for method in methods:
+        with pipeline.warehouse_conn.cursor() as cur:
+            cur.execute("TRUNCATE bench_fact_transactions")
+        pipeline.warehouse_conn.commit()
+
+        loaded = 0
+        started = time.perf_counter()
+        for chunk in synthetic_transactions(rows, pipeline.batch_size):
+            loaded += pipeline.write_rows(
+                "bench_fact_transactions", FACT_TRANSACTIONS_COLUMNS, chunk, method
+            )
+        elapsed = time.perf_counter() - started
+
+        results.append(
+            {
+                "benchmark": "loaders",
+                "table": "fact_transactions",
+                "method": method,
+                "rows": loaded,
+                "batch_size": pipeline.batch_size,
+                "seconds": round(elapsed, 3),
+                "rows_per_sec": round(loaded / elapsed, 1) if elapsed else None,
+            }
+        )
+        logger.info(f"⏱️ {method}: {loaded} rows in {elapsed:.2f}s")
+
+    return results
+
+
+def table_rows(pipeline: ETLPipeline, source: str, table: str) -> Tuple[int, Optional[datetime]]:
+    """Row count and latest event time of a source stand-in table."""
+    column = '"createdAt"' if table in APPEND_ONLY_SOURCES else '"updatedAt"'
+    conn = pipeline.source_conns[source]
+    with conn.cursor() as cur:
+        cur.execute(f'SELECT COUNT(*), MAX({column}) FROM "{table}"')
+        count, latest = cur.fetchone()
+    conn.commit()
+    return count, latest
+
+
+def generate_source_data(
+    pipeline: ETLPipeline, rows: int, reset: bool = False, update: bool = False
+) -> List[Dict]:
+    """Append `rows` synthetic rows, split by SCALE_MIX, to the source stand-ins.
+
+    A fresh data set spans GENERATE_SPAN up to now; appended rows continue
+    after the latest existing row so incremental runs pick them up. With
+    `update`, UPDATE_FRACTION of existing users and lobbies are modified too.
+    """
+    for source, ddl in SOURCE_DDL.items():
+        pipeline.connect_source(source)
+        conn = pipeline.source_conns[source]
+        with conn.cursor() as cur:
+            cur.execute(ddl)
+            if reset:
+                tables = [t for t, (s, _) in SOURCE_GENERATORS.items() if s == source]
+                cur.execute("TRUNCATE " + ", ".join(f'"{t}"' for t in tables))
+        conn.commit()
+
+    existing = {
+        table: table_rows(pipeline, source, table)
+        for table, (source, _) in SOURCE_GENERATORS.items()
+    }
+    counts = {table: int(rows * share) for table, share in SCALE_MIX.items()}
+    references = {
+        "users": max(existing["User"][0] + counts["User"], 1),
+        "lobbies": max(existing["Lobby"][0] + counts["Lobby"], 1),
+        "cycles": max(existing["LobbyTimeCycle"][0] + counts["LobbyTimeCycle"], 1),
+    }
+
+    results = []
+    for table, (source, query) in SOURCE_GENERATORS.items():
+        conn = pipeline.source_conns[source]
+        start, latest = existing[table]
+        count = counts[table]
+        if latest is None:
+            ts = datetime.utcnow() - GENERATE_SPAN
+            step_ms = max(GENERATE_SPAN.total_seconds() * 1000 / max(count, 1), 1)
+        else:
+            ts = latest + timedelta(milliseconds=1)
+            step_ms = 1
+
+        started = time.perf_counter()
+        if update and table in UPDATABLE_SOURCES and start:
+            column = UPDATABLE_SOURCES[table]
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""
+                    UPDATE "{table}"
+                    SET {column} = {column} || '*', "updatedAt" = %s
+                    WHERE id IN (SELECT id FROM "{table}" TABLESAMPLE SYSTEM (%s))
+                """,
+                    (ts, UPDATE_FRACTION * 100),
+                )
+            conn.commit()
+            ts += timedelta(milliseconds=1)
+
+        for chunk_start in range(start, start + count, GENERATE_CHUNK_ROWS):
+            chunk_end = min(chunk_start + GENERATE_CHUNK_ROWS, start + count)
+            with conn.cursor() as cur:
+                cur.execute(
+                    query,
+                    {
+                        **references,
+                        "start": chunk_start,
+                        "end": chunk_end,
+                        "ts": ts + timedelta(milliseconds=(chunk_start - start) * step_ms),
+                        "step_ms": step_ms,
+                    },
+                )
+            conn.commit()
+        elapsed = time.perf_counter() - started
+
+        results.append(
+            {
+                "benchmark": "generate",
+                "table": table,
+                "rows": count,
+                "total_rows": start + count,
+                "seconds": round(elapsed, 3),
+                "rows_per_sec": round(count / elapsed, 1) if elapsed else None,
+            }
+        )
+        logger.info(f"🧪 Generated {count} {table} rows in {elapsed:.2f}s")
+
+    for conn in pipeline.source_conns.values():
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE")
+        conn.commit()
+    return results
+
+
+def metric_totals(metric, suffix: str = "") -> Dict[Tuple[str, ...], float]:
+    """Current sample values of a Prometheus metric, keyed by label values."""
+    totals = {}
+    for family in metric.collect():
+        for sample in family.samples:
+            if sample.name == family.name + suffix:
+                totals[tuple(sample.labels.values())] = sample.value
+    return totals
+
+
+def warehouse_position(pipeline: ETLPipeline) -> Tuple[int, str]:
+    """Warehouse database size and current WAL position."""
+    with pipeline.warehouse_conn.cursor() as cur:
+        cur.execute("SELECT pg_database_size(current_database()), pg_current_wal_lsn()")
+        size, lsn = cur.fetchone()
+    pipeline.warehouse_conn.commit()
+    return size, lsn
+
+
+def bench_pipeline_run(pipeline: ETLPipeline, phase: str, full_load: bool) -> Dict:
+    """Run the pipeline once and report throughput, stage times and bytes written."""
+    pipeline.connect_warehouse()
+    size_before, lsn_before = warehouse_position(pipeline)
+    pipeline.close_connections()
+    stages_before = metric_totals(metrics.STAGE_SECONDS, "_sum")
+    rows_before = metric_totals(metrics.ROWS_TOTAL, "_total")
+    failures_before = metric_totals(metrics.FAILURES_TOTAL, "_total")
+
+    started = time.perf_counter()
+    pipeline.run_all(full_load=full_load)
+    elapsed = time.perf_counter() - started
+
+    pipeline.connect_warehouse()
+    size_after, _ = warehouse_position(pipeline)
+    with pipeline.warehouse_conn.cursor() as cur:
+        cur.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)", (lsn_before,))
+        wal_bytes = int(cur.fetchone()[0])
+    pipeline.warehouse_conn.commit()
+    pipeline.close_connections()
+
+    def delta(after, before):
+        return {k: v - before.get(k, 0) for k, v in after.items() if v - before.get(k, 0)}
+
+    stages = delta(metric_totals(metrics.STAGE_SECONDS, "_sum"), stages_before)
+    rows = delta(metric_totals(metrics.ROWS_TOTAL, "_total"), rows_before)
+    failures = delta(metric_totals(metrics.FAILURES_TOTAL, "_total"), failures_before)
+
+    tables = {}
+    for (source, table, stage), seconds in stages.items():
+        tables.setdefault(table, {"source": source})[f"{stage}_seconds"] = round(seconds, 3)
+    for (source, table, stage), count in rows.items():
+        tables.setdefault(table, {"source": source})[f"rows_{stage}"] = int(count)
+    extracted = sum(c for (_, _, stage), c in rows.items() if stage == "extracted")
+
+    result = {
+        "benchmark": "pipeline",
+        "phase": phase,
+        "batch_size": pipeline.batch_size,
+        "workers": pipeline.workers,
+        "pipeline_depth": pipeline.pipeline_depth,
+        "bulk_load": pipeline.bulk_load and full_load,
+        "load_methods": pipeline.load_methods,
+        "rows_extracted": int(extracted),
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(extracted / elapsed, 1) if elapsed else None,
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "warehouse_bytes": size_after - size_before,
+        "wal_bytes": wal_bytes,
+        "failures": int(sum(failures.values())),
+        "tables": tables,
+    }
+    logger.info(f"⏱️ {phase}: {extracted} rows in {elapsed:.2f}s")
+    return result
+
+
+def reset_warehouse(pipeline: ETLPipeline):
+    """Empty the warehouse tables the pipeline writes to."""
+    pipeline.connect_warehouse()
+    pipeline.apply_schema()
+    with pipeline.warehouse_conn.cursor() as cur:
+        cur.execute("""
+            TRUNCATE dim_users, dim_lobbies, fact_games, fact_transactions,
+                     fact_player_sessions, fact_game_actions,
+                     etl_run_log, etl_watermark_keys
+        """)
+        cur.execute("TRUNCATE " + ", ".join(ROLLUPS))
+    pipeline.warehouse_conn.commit()
+    pipeline.close_connections()
+
+
+def bench_pipeline(
+    pipeline: ETLPipeline, incremental_rows: int, reset: bool = False
+) -> List[Dict]:
+    """Time a full load, then an incremental run after appending new rows."""
+    if reset:
+        reset_warehouse(pipeline)
+
+    results = [bench_pipeline_run(pipeline, "full", full_load=True)]
+    if incremental_rows:
+        generate_source_data(pipeline, incremental_rows, update=True)
+        pipeline.close_connections()
+        results.append(bench_pipeline_run(pipeline, "incremental", full_load=False))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Data Warehouse ETL benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    loaders = subparsers.add_parser("loaders", help="Compare warehouse load methods")
+    loaders.add_argument("--rows", type=int, default=100_000)
+    loaders.add_argument("--batch-size", type=int, default=ETL_BATCH_SIZE)
+    loaders.add_argument(
+        "--methods", nargs="+", choices=LOAD_METHODS, default=list(LOAD_METHODS)
+    )
+
+    generate = subparsers.add_parser(
+        "generate", help="Append synthetic rows to the source stand-ins"
+    )
+    generate.add_argument(
+        "--rows", type=int, default=100_000, help="Total rows across all tables"
+    )
+    generate.add_argument(
+        "--reset", action="store_true", help="Empty the stand-in tables first"
+    )
+
+    pipeline_parser = subparsers.add_parser(
+        "pipeline", help="Time full and incremental pipeline runs"
+    )
+    pipeline_parser.add_argument("--batch-size", type=int, default=ETL_BATCH_SIZE)
+    pipeline_parser.add_argument("--workers", type=int, default=ETL_WORKERS)
+    pipeline_parser.add_argument(
+        "--pipeline-depth", type=int, default=ETL_PIPELINE_DEPTH
+    )
+    pipeline_parser.add_argument(
+        "--bulk-load",
+        action="store_true",
+        help="Run the full load in bulk mode (shadow tables, deferred indexes)",
+    )
+    pipeline_parser.add_argument("--load-method", choices=LOAD_METHODS)
+    pipeline_parser.add_argument(
+        "--incremental-rows",
+        type=int,
+        default=10_000,
+        help="Rows appended before the incremental run (0 skips it)",
+    )
+    pipeline_parser.add_argument(
+        "--reset-warehouse",
+        action="store_true",
+        help="Empty the warehouse dimension, fact and ETL log tables first",
+    )
+
+    args = parser.parse_args()
+
+    if args.benchmark == "loaders":
+        pipeline = ETLPipeline(batch_size=args.batch_size)
+        pipeline.connect_warehouse()
+        try:
+            results = bench_loaders(pipeline, args.rows, args.methods)
+        finally:
+            pipeline.close_connections()
+    elif args.benchmark == "generate":
+        pipeline = ETLPipeline()
+        try:
+            results = generate_source_data(pipeline, args.rows, reset=args.reset)
+        finally:
+            pipeline.close_connections()
+    else:
+        load_methods = None
+        if args.load_method:
+            load_methods = {
+                "fact_transactions": args.load_method,
+                "fact_player_sessions": args.load_method,
+                "fact_game_actions": args.load_method,
+            }
+        pipeline = ETLPipeline(
+            batch_size=args.batch_size,
+            load_methods=load_methods,
+            workers=args.workers,
+            pipeline_depth=args.pipeline_depth,
+            bulk_load=args.bulk_load,
+        )
+        try:
+            results = bench_pipeline(
+                pipeline, args.incremental_rows, reset=args.reset_warehouse
+            )
+        finally:
+            pipeline.close_connections()
+
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
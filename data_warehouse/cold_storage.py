@@ -0,0 +1,190 @@
+"""
+Parquet Cold Storage for Warehouse Facts
+
+Closed months of the fact tables are exported by the ETL pipeline
+(`--export-parquet`, or the scheduler's daily export) to zstd-compressed
+Parquet files under ETL_EXPORT_DIR, one Hive-style directory per month:
+
+    <ETL_EXPORT_DIR>/<fact table>/month=YYYY-MM/data.parquet
+    <ETL_EXPORT_DIR>/manifest.json
+
+The manifest records every exported month with its row count and the
+latest etl_loaded_at it contains, so exports are incremental and a month
+that changed in the warehouse is written again.
+
+Historical queries run on DuckDB against the files, with every fact table
+available as a view. Filters on `month` skip whole directories and filters
+on other columns are pushed down to Parquet row-group statistics:
+
+    python cold_storage.py query "SELECT user_id, SUM(amount) FROM fact_transactions
+                                  WHERE month >= '2025-01' GROUP BY user_id"
+    python cold_storage.py manifest
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+ETL_EXPORT_DIR = os.getenv("ETL_EXPORT_DIR", "/var/lib/etl/cold-storage")
+MANIFEST_NAME = "manifest.json"
+PARQUET_COMPRESSION = "zstd"
+# Rows per Parquet row group; smaller groups give finer predicate pushdown
+PARQUET_ROW_GROUP_ROWS = 128 * 1024
+
+
+def arrow_type(data_type: str, precision: Optional[int], scale: Optional[int]) -> pa.DataType:
+    """Arrow type of a warehouse column (information_schema data_type)."""
+    if data_type == "integer":
+        return pa.int32()
+    if data_type == "bigint":
+        return pa.int64()
+    if data_type == "numeric":
+        return pa.decimal128(precision or 38, scale or 0)
+    if data_type == "boolean":
+        return pa.bool_()
+    if data_type == "date":
+        return pa.date32()
+    if data_type.startswith("timestamp"):
+        return pa.timestamp("us")
+    return pa.string()
+
+
+def arrow_schema(columns: List[Tuple[str, str, Optional[int], Optional[int]]]) -> pa.Schema:
+    """Arrow schema of (name, data_type, numeric_precision, numeric_scale) columns."""
+    return pa.schema([(name, arrow_type(*spec)) for name, *spec in columns])
+
+
+def month_key(month: date) -> str:
+    """Manifest key and partition value of a month."""
+    return f"{month:%Y-%m}"
+
+
+class ColdStorage:
+    """Parquet files and manifest of exported fact months under one root."""
+
+    def __init__(self, root: str = ETL_EXPORT_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+
+    def load_manifest(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Exported months per table: {table: {YYYY-MM: entry}}."""
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest: Dict[str, Dict[str, Dict[str, Any]]]):
+        """Replace the manifest atomically."""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def month_path(self, table: str, month: date) -> str:
+        """Parquet file of one month of a fact table."""
+        return os.path.join(self.root, table, f"month={month_key(month)}", "data.parquet")
+
+    def write_month(
+        self,
+        table: str,
+        month: date,
+        schema: pa.Schema,
+        chunks: Iterator[List[tuple]],
+    ) -> Tuple[int, int]:
+        """Write one month from chunks of row tuples; returns (rows, bytes).
+
+        The file is written next to its final path and renamed into place,
+        so readers never see a partial month. An empty month leaves no file.
+        """
+        path = self.month_path(table, month)
+        tmp_path = f"{path}.tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        rows = 0
+        writer = None
+        try:
+            for chunk in chunks:
+                columns = list(zip(*chunk))
+                batch = pa.RecordBatch.from_arrays(
+                    [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                    schema=schema,
+                )
+                if writer is None:
+                    writer = pq.ParquetWriter(
+                        tmp_path, schema, compression=PARQUET_COMPRESSION
+                    )
+                writer.write_batch(batch, row_group_size=PARQUET_ROW_GROUP_ROWS)
+                rows += len(chunk)
+        except Exception:
+            if writer is not None:
+                writer.close()
+                os.remove(tmp_path)
+            raise
+        if writer is not None:
+            writer.close()
+
+        if writer is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return 0, 0
+        os.replace(tmp_path, path)
+        return rows, os.path.getsize(path)
+
+    def connect(self) -> "duckdb.DuckDBPyConnection":
+        """In-memory DuckDB connection with a view per exported fact table."""
+        conn = duckdb.connect()
+        for table, months in sorted(self.load_manifest().items()):
+            # read_parquet fails on a pattern that matches no file
+            if not any(entry["rows"] for entry in months.values()):
+                continue
+            pattern = os.path.join(self.root, table, "month=*", "*.parquet")
+            conn.execute(
+                f"""
+                CREATE VIEW {table} AS
+                SELECT * FROM read_parquet('{pattern}', hive_partitioning = true,
+                                           union_by_name = true)
+            """
+            )
+        return conn
+
+    def query(self, sql: str, params: Optional[list] = None) -> Tuple[List[str], List[tuple]]:
+        """Run a query against the exported facts; returns (columns, rows)."""
+        conn = self.connect()
+        try:
+            result = conn.execute(sql, params or [])
+            columns = [d[0] for d in result.description]
+            return columns, result.fetchall()
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the Parquet cold storage")
+    parser.add_argument("--dir", default=ETL_EXPORT_DIR, help="Cold storage root")
+    sub = parser.add_subparsers(dest="command", required=True)
+    query = sub.add_parser("query", help="Run a DuckDB SQL query on the exported facts")
+    query.add_argument("sql")
+    sub.add_parser("manifest", help="Print the exported months per table")
+    args = parser.parse_args()
+
+    storage = ColdStorage(args.dir)
+    if args.command == "manifest":
+        json.dump(storage.load_manifest(), sys.stdout, indent=2, sort_keys=True)
+        print()
+        return
+
+    columns, rows = storage.query(args.sql)
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join("" if v is None else str(v) for v in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,25 +6,64 @@ from operational databases (User Management, Game Service) to the data warehouse
 
 Features:
 1. Incremental extraction based on timestamps
-2. Transformation for dimensional modeling
-3. Idempotent loading with conflict handling
-4. Detailed logging for monitoring
-5. Scheduled execution support
+2. Streaming extraction in fixed-size chunks via server-side cursors
+3. Transformation for dimensional modeling
+4. Idempotent loading with conflict handling
+5. Detailed logging for monitoring
+6. Scheduled execution support
 
 Usage:
     python etl_pipeline.py --source user_service --full-load
     python etl_pipeline.py --source game_service --incremental
     python etl_pipeline.py --all
+    python etl_pipeline.py --all --full-load --batch-size 10000
+    python etl_pipeline.py --source game_service --backfill --backfill-workers 8
+    python etl_pipeline.py --all --full-load --bulk-load
+    python etl_pipeline.py --export-parquet
+    python etl_pipeline.py --reconcile
 """
 
 import os
+import io
+import re
 import sys
+import json
+import time
+import queue
+import select
 import argparse
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from datetime import date, datetime, timedelta
+from functools import partial
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 import psycopg2
-from psycopg2.extras import RealDictCursor, execute_batch
+from psycopg2.extras import LogicalReplicationConnection, RealDictCursor, execute_batch
+from psycopg2.pool import ThreadedConnectionPool
+
+import metrics
+from profiling import RunProfiler
 
 # Configure logging - create log directory if it doesn't exist
 LOG_DIR = "/var/log/etl"
@@ -65,18 +104,869 @@ DB_CONFIGS = {
     },
 }
 
+# Number of rows fetched from a source server-side cursor (and loaded +
+# committed into the warehouse) per chunk
+ETL_BATCH_SIZE = int(os.getenv("ETL_BATCH_SIZE", "5000"))
+
+# Chunks a table job's extract thread may read ahead of its loads, so the
+# source read of the next chunks overlaps the warehouse write of the
+# current one (0 = extract and load take turns on one thread)
+ETL_PIPELINE_DEPTH = int(os.getenv("ETL_PIPELINE_DEPTH", "2"))
+
+# Incremental runs re-read this many seconds before the last watermark to
+# pick up rows committed late with an earlier timestamp; rows already loaded
+# in that window are recognised by their (id, timestamp) and skipped
+ETL_WATERMARK_OVERLAP_SECONDS = int(os.getenv("ETL_WATERMARK_OVERLAP_SECONDS", "120"))
+
+# Incremental runs stop a table job after this many extracted rows (at a
+# chunk boundary) and leave the rest for the next run; 0 = no limit
+ETL_MAX_ROWS_PER_RUN = int(os.getenv("ETL_MAX_ROWS_PER_RUN", "0"))
+
+# A full load that failed or was interrupted within this many hours is
+# resumed from its last committed chunk by the next full load of the table
+ETL_RESUME_MAX_AGE_HOURS = float(os.getenv("ETL_RESUME_MAX_AGE_HOURS", "24"))
+
+# Worker processes (each with its own connections) used by --backfill, and
+# the maximum number of rows sampled to split a table into ranges
+ETL_BACKFILL_WORKERS = int(os.getenv("ETL_BACKFILL_WORKERS", str(os.cpu_count() or 4)))
+BACKFILL_SAMPLE_ROWS = 1_000_000
+
+# Bulk mode of full loads and backfills (--bulk-load): fact tables are
+# loaded into an index-less shadow table with synchronous_commit off, whose
+# indexes are built afterwards (ETL_BULK_INDEX_WORKERS at a time) before it
+# is swapped in for the live table in one transaction
+ETL_BULK_LOAD = os.getenv("ETL_BULK_LOAD", "false").lower() in ("1", "true", "yes")
+ETL_BULK_INDEX_WORKERS = int(os.getenv("ETL_BULK_INDEX_WORKERS", "4"))
+
+# Profile every table run (--profile): per-stage cProfile stats, tracemalloc
+# peaks and statement timings are written under ETL_PROFILE_DIR/run_<run_id>
+ETL_PROFILE = os.getenv("ETL_PROFILE", "false").lower() in ("1", "true", "yes")
+
+# First key of the warehouse advisory locks held per table job and rollup
+# refresh (the second key is hashtext(<table>)), so runs in other processes
+# never overlap
+ETL_LOCK_NAMESPACE = 7310
+
+# Number of table jobs run concurrently by run_all (1 = sequential)
+ETL_WORKERS = int(os.getenv("ETL_WORKERS", "4"))
+
+# Upper bound of pooled connections per database; one per concurrent table
+# job plus one for the coordinating pipeline
+ETL_POOL_MAX_CONNECTIONS = int(
+    os.getenv("ETL_POOL_MAX_CONNECTIONS", str(ETL_WORKERS + 1))
+)
+
+# Entries kept per dimension by the dimension key cache
+ETL_DIM_CACHE_SIZE = int(os.getenv("ETL_DIM_CACHE_SIZE", "100000"))
+
+# Table jobs in dependency order. Each job extracts from one source table
+# and loads one warehouse table whose unique `key` column holds the source
+# id; jobs only wait for the jobs in depends_on.
+TABLE_JOBS = {
+    "dim_users": {
+        "source": "user_service",
+        "source_table": "User",
+        "key": "user_id",
+        "extract": "extract_users",
+        "load": "load_users",
+        "watermark": "updatedAt",
+        "depends_on": (),
+    },
+    "fact_transactions": {
+        "source": "user_service",
+        "source_table": "CurrencyTransaction",
+        "key": "source_transaction_id",
+        "extract": "extract_transactions",
+        "load": "load_transactions",
+        "watermark": "createdAt",
+        "depends_on": ("dim_users",),
+    },
+    "dim_lobbies": {
+        "source": "game_service",
+        "source_table": "Lobby",
+        "key": "lobby_id",
+        "extract": "extract_lobbies",
+        "load": "load_lobbies",
+        "watermark": "updatedAt",
+        "depends_on": (),
+    },
+    "fact_games": {
+        "source": "game_service",
+        "source_table": "Lobby",
+        "key": "lobby_id",
+        "extract": "extract_games",
+        "load": "load_games",
+        "watermark": "updatedAt",
+        "depends_on": ("dim_lobbies",),
+    },
+    "fact_player_sessions": {
+        "source": "game_service",
+        "source_table": "LobbyPlayer",
+        "key": "source_session_id",
+        "extract": "extract_player_sessions",
+        "load": "load_player_sessions",
+        "watermark": "updatedAt",
+        "depends_on": ("dim_users", "dim_lobbies", "fact_games"),
+    },
+    "fact_game_actions": {
+        "source": "game_service",
+        "source_table": "Vote",
+        "key": "source_action_id",
+        "extract": "extract_game_actions",
+        "load": "load_game_actions",
+        "watermark": "createdAt",
+        # Votes are changed in place and have no updatedAt; incremental
+        # runs re-check the recent ones for changed targets
+        "recheck": "recheck_game_actions",
+        # Both loads rewrite the sessions of their lobbies, so they never
+        # run concurrently
+        "depends_on": ("fact_games", "fact_player_sessions"),
+    },
+}
+
+# Votes created within this many hours are re-read by every incremental run
+# of fact_game_actions, so a vote changed while its cycle is still open is
+# picked up (0 = only the weekly full load catches changed votes)
+ETL_VOTE_RECHECK_HOURS = float(os.getenv("ETL_VOTE_RECHECK_HOURS", "24"))
+
+# Source SELECT of the dimension jobs, shared by their keyset extract and
+# by reconciliation, which re-extracts rows by id
+DIM_SOURCE_SELECTS = {
+    "dim_users": '''SELECT id, username, email, "createdAt", "updatedAt" FROM "User"''',
+    "dim_lobbies": (
+        '''SELECT id, name, "maxPlayers", status, "createdAt", "updatedAt" FROM "Lobby"'''
+    ),
+}
+
+# Dimensions compared by --reconcile: the (source, warehouse) columns the
+# loaders keep in sync, and the warehouse rows that mirror source rows.
+# Both sides are split into ETL_RECONCILE_BUCKETS hash ranges of the key;
+# only rows of ranges whose count or checksum differ are compared, and
+# only differing rows are re-extracted, deleted or soft-deleted.
+RECONCILE_TABLES = {
+    "dim_users": {
+        "columns": (("username", "username"), ("email", "email")),
+        "where": "is_current",
+    },
+    "dim_lobbies": {
+        "columns": (("name", "lobby_name"), ('"maxPlayers"', "max_players")),
+        "where": None,
+    },
+}
+ETL_RECONCILE_BUCKETS = int(os.getenv("ETL_RECONCILE_BUCKETS", "1024"))
+
+# Change data capture: logical replication slot created on every source.
+# Sources need wal_level=logical and the wal2json output plugin.
+CDC_SLOT_NAME = os.getenv("ETL_CDC_SLOT_NAME", "mafia_warehouse_etl")
+CDC_FLUSH_SECONDS = float(os.getenv("ETL_CDC_FLUSH_SECONDS", "2"))
+CDC_RETRY_SECONDS = float(os.getenv("ETL_CDC_RETRY_SECONDS", "10"))
+# etl_run_log table_name of the per-source row recording each batch's LSN,
+# written once every table of the batch has committed
+CDC_LSN_TABLE = "cdc_batch"
+
+# Warehouse write strategy per fact table:
+#   copy  - stream the chunk through COPY ... FROM STDIN (default)
+#   batch - execute_batch INSERTs, kept as a fallback
+LOAD_METHODS = ("copy", "batch")
+TABLE_LOAD_METHODS = {
+    "fact_transactions": os.getenv("ETL_LOAD_METHOD_TRANSACTIONS", "copy"),
+    "fact_player_sessions": os.getenv("ETL_LOAD_METHOD_PLAYER_SESSIONS", "copy"),
+    "fact_game_actions": os.getenv("ETL_LOAD_METHOD_GAME_ACTIONS", "copy"),
+}
+
+# Warehouse write strategy per dimension table:
+#   merge - COPY into a temp staging table, then one set-based upsert that
+#           only rewrites rows whose tracked columns changed (default)
+#   batch - execute_batch INSERT ... ON CONFLICT DO UPDATE, kept as a fallback
+DIM_LOAD_METHODS = ("merge", "batch")
+TABLE_DIM_LOAD_METHODS = {
+    "dim_users": os.getenv("ETL_LOAD_METHOD_USERS", "merge"),
+    "dim_lobbies": os.getenv("ETL_LOAD_METHOD_LOBBIES", "merge"),
+}
+
+DIM_USERS_COLUMNS = ("user_id", "username", "email", "created_at", "last_updated")
+# Attributes whose changes open a new dim_users version (SCD Type 2)
+DIM_USERS_TRACKED = ("username", "email")
+DIM_LOBBIES_COLUMNS = (
+    "lobby_id",
+    "lobby_name",
+    "max_players",
+    "created_at",
+    "last_updated",
+)
+
+FACT_TRANSACTIONS_COLUMNS = (
+    "user_id",
+    "user_key",
+    "transaction_type",
+    "amount",
+    "description",
+    "occurred_at",
+    "source_system",
+    "source_transaction_id",
+)
+FACT_PLAYER_SESSIONS_COLUMNS = (
+    "user_id",
+    "user_key",
+    "lobby_id",
+    "role_assigned",
+    "role_id",
+    "joined_at",
+    "survived_until_end",
+    "source_session_id",
+)
+FACT_GAMES_COLUMNS = ("lobby_id", "start_time", "end_time", "total_cycles")
+FACT_GAME_ACTIONS_COLUMNS = (
+    "lobby_id",
+    "cycle_number",
+    "cycle_type",
+    "actor_user_id",
+    "target_user_id",
+    "action_type",
+    "occurred_at",
+    "source_action_id",
+)
+# Natural key -> surrogate key lookups served by the dimension key cache.
+# `natural` is the SQL expression of the natural key, `current` restricts
+# the rows to the versions facts should reference and `recency` orders the
+# rows loaded when the cache is warmed (most recent first).
+DIMENSION_KEYS = {
+    "dim_users": {
+        "natural": "user_id",
+        "surrogate": "user_key",
+        "current": "is_current",
+        "recency": "last_updated",
+    },
+    "dim_roles": {
+        "natural": "UPPER(REPLACE(role_name, ' ', '_'))",
+        "surrogate": "role_id",
+        "current": "TRUE",
+        "recency": "role_id",
+    },
+    "dim_time": {
+        "natural": "full_date",
+        "surrogate": "time_id",
+        "current": "TRUE",
+        "recency": "full_date",
+    },
+}
+# Surrogate keys resolved on fact rows: (key column, dimension, natural column)
+FACT_DIMENSION_REFS = {
+    "fact_transactions": (("user_key", "dim_users", "user_id"),),
+    "fact_player_sessions": (
+        ("user_key", "dim_users", "user_id"),
+        ("role_id", "dim_roles", "role_assigned"),
+    ),
+}
+
+# Source roles playing for the mafia; every other role plays for the citizens
+MAFIA_ROLES = ["MAFIA", "GODFATHER"]
+# Fact tables whose loads re-derive the game statistics of their lobbies
+GAME_FACT_TABLES = ("fact_games", "fact_player_sessions", "fact_game_actions")
+
+# Fact tables a bulk load may rebuild through a shadow table. Dimensions
+# keep their history and fact_games is referenced by foreign keys, so they
+# are always loaded in place. Each maps to the copy of a source row read
+# twice that the shadow keeps, matching its incremental load: transactions
+# are insert-only (ON CONFLICT DO NOTHING keeps the first), sessions and
+# actions are upserted (the last copy wins).
+BULK_LOAD_TABLES = {
+    "fact_transactions": "first",
+    "fact_player_sessions": "last",
+    "fact_game_actions": "last",
+}
+
+# Monthly range-partitioned fact tables: partition column and surrogate key
+PARTITIONED_FACTS = {
+    "fact_transactions": "occurred_at",
+    "fact_player_sessions": "joined_at",
+    "fact_game_actions": "occurred_at",
+    "fact_access_events": "occurred_at",
+}
+FACT_SURROGATE_KEYS = {
+    "fact_transactions": "transaction_id",
+    "fact_player_sessions": "session_id",
+    "fact_game_actions": "action_id",
+    "fact_access_events": "event_id",
+}
+# Partitions kept ready beyond the current month
+ETL_PARTITION_MONTHS_AHEAD = int(os.getenv("ETL_PARTITION_MONTHS_AHEAD", "3"))
+# Months of partitions kept attached (0 = keep everything); older partitions
+# are detached, or dropped when ETL_PARTITION_RETENTION_ACTION=drop
+ETL_PARTITION_RETENTION_MONTHS = int(os.getenv("ETL_PARTITION_RETENTION_MONTHS", "0"))
+ETL_PARTITION_RETENTION_ACTION = os.getenv("ETL_PARTITION_RETENTION_ACTION", "detach")
+PARTITION_RETENTION_ACTIONS = ("detach", "drop", "archive")
+
+# Parquet cold storage of closed fact months (see cold_storage.py). The
+# latest ETL_EXPORT_RECHECK_MONTHS exported months of each table are
+# compared with the warehouse on every export and rewritten if they changed.
+ETL_EXPORT_DIR = os.getenv("ETL_EXPORT_DIR", "/var/lib/etl/cold-storage")
+ETL_EXPORT_RECHECK_MONTHS = int(os.getenv("ETL_EXPORT_RECHECK_MONTHS", "1"))
+
+# Daily rollup tables keyed to dim_time. After every run, only the days
+# touched by rows just loaded into `fact` are deleted and re-aggregated.
+# Queries receive %(days)s (the touched dates) and %(start)s/%(end)s (their
+# bounding range, for partition pruning).
+ROLLUPS = {
+    "agg_daily_user_transactions": {
+        "fact": "fact_transactions",
+        "query": """
+            INSERT INTO agg_daily_user_transactions
+                (time_id, user_id, transaction_type, transaction_count, total_amount)
+            SELECT t.time_id, f.user_id, f.transaction_type, COUNT(*), SUM(f.amount)
+            FROM fact_transactions f
+            JOIN dim_time t ON t.full_date = f.occurred_at::date
+            WHERE f.occurred_at >= %(start)s AND f.occurred_at < %(end)s
+              AND f.occurred_at::date = ANY(%(days)s)
+            GROUP BY t.time_id, f.user_id, f.transaction_type
+        """,
+    },
+    "agg_daily_transaction_types": {
+        "fact": "fact_transactions",
+        "query": """
+            INSERT INTO agg_daily_transaction_types
+                (time_id, transaction_type, transaction_count, total_amount, unique_users)
+            SELECT t.time_id, f.transaction_type, COUNT(*), SUM(f.amount),
+                   COUNT(DISTINCT f.user_id)
+            FROM fact_transactions f
+            JOIN dim_time t ON t.full_date = f.occurred_at::date
+            WHERE f.occurred_at >= %(start)s AND f.occurred_at < %(end)s
+              AND f.occurred_at::date = ANY(%(days)s)
+            GROUP BY t.time_id, f.transaction_type
+        """,
+    },
+    "agg_daily_active_players": {
+        "fact": "fact_player_sessions",
+        "query": """
+            INSERT INTO agg_daily_active_players (time_id, active_players, sessions)
+            SELECT t.time_id, COUNT(DISTINCT f.user_id), COUNT(*)
+            FROM fact_player_sessions f
+            JOIN dim_time t ON t.full_date = f.joined_at::date
+            WHERE f.joined_at >= %(start)s AND f.joined_at < %(end)s
+              AND f.joined_at::date = ANY(%(days)s)
+            GROUP BY t.time_id
+        """,
+    },
+    "agg_daily_lobby_games": {
+        "fact": "fact_games",
+        "query": """
+            INSERT INTO agg_daily_lobby_games (time_id, lobby_id, games, total_players)
+            SELECT t.time_id, g.lobby_id, COUNT(*), SUM(g.total_players)
+            FROM fact_games g
+            JOIN dim_time t ON t.full_date = g.start_time::date
+            WHERE g.start_time >= %(start)s AND g.start_time < %(end)s
+              AND g.start_time::date = ANY(%(days)s)
+            GROUP BY t.time_id, g.lobby_id
+        """,
+    },
+    "agg_daily_role_stats": {
+        "fact": "fact_player_sessions",
+        "query": """
+            INSERT INTO agg_daily_role_stats (time_id, role_id, sessions, wins, survivals)
+            SELECT t.time_id, r.role_id, COUNT(*),
+                   COUNT(*) FILTER (WHERE f.is_winner),
+                   COUNT(*) FILTER (WHERE f.survived_until_end)
+            FROM fact_player_sessions f
+            JOIN dim_time t ON t.full_date = f.joined_at::date
+            JOIN dim_roles r
+              ON UPPER(REPLACE(r.role_name, ' ', '_'))
+               = UPPER(REPLACE(f.role_assigned, ' ', '_'))
+            WHERE f.joined_at >= %(start)s AND f.joined_at < %(end)s
+              AND f.joined_at::date = ANY(%(days)s)
+            GROUP BY t.time_id, r.role_id
+        """,
+    },
+}
+# Event-time column of every fact table feeding a rollup
+FACT_TIME_COLUMNS = {**PARTITIONED_FACTS, "fact_games": "start_time"}
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
+
+# Legacy fact rows loaded before source ids were stored, and the columns
+# that identify duplicates among them. compact_facts keeps the first
+# (transactions never change) or the last (sessions are re-appended on
+# every update) copy, and drops any that a keyed row now covers.
+FACT_COMPACTION = {
+    "fact_transactions": {
+        "id": "transaction_id",
+        "source_key": "source_transaction_id",
+        "natural_key": ("user_id", "transaction_type", "amount", "occurred_at"),
+        "keep": "first",
+    },
+    "fact_player_sessions": {
+        "id": "session_id",
+        "source_key": "source_session_id",
+        "natural_key": ("user_id", "lobby_id", "joined_at"),
+        "keep": "last",
+    },
+}
+
+
+class ColumnBatch:
+    """A chunk of rows held column-wise: column name -> list of values.
+
+    Fact transforms build batches a column at a time (a rename reuses the
+    source column list, a constant is one list) instead of allocating a
+    dict per row, and copy_rows renders each column in a single pass.
+    """
+
+    def __init__(self, columns: Dict[str, List[Any]]):
+        self.columns = columns
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict], names: Iterable[str]) -> "ColumnBatch":
+        """Pivot dict rows into the named columns (None where a row lacks one)."""
+        return cls({name: [row.get(name) for row in rows] for name in names})
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()), ()))
+
+    def __getitem__(self, name: str) -> List[Any]:
+        return self.columns[name]
+
+    def __setitem__(self, name: str, values: List[Any]):
+        self.columns[name] = values
+
+    def take(self, indices: List[int]) -> "ColumnBatch":
+        """The rows at the given positions, as a new batch."""
+        return ColumnBatch(
+            {name: [values[i] for i in indices] for name, values in self.columns.items()}
+        )
+
+    def rows(self) -> List[Dict]:
+        """The batch as dict rows, for the row-based fallback paths."""
+        names = list(self.columns)
+        return [dict(zip(names, values)) for values in zip(*self.columns.values())]
+
+
+Rows = Union[List[Dict], ColumnBatch]
+
+
+def column_values(rows: Rows, name: str) -> List[Any]:
+    """One column of dict rows or of a ColumnBatch."""
+    if isinstance(rows, ColumnBatch):
+        return rows[name]
+    return [row[name] for row in rows]
+
+
+def to_copy_text(value: Any) -> str:
+    """Render a value as a field of PostgreSQL's COPY text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+# Incremental position in a source table: (watermark column value, id)
+Watermark = Tuple[datetime, str]
+
+
+def hash_diff_sql(columns: tuple, alias: str) -> str:
+    """SQL expression of the hash_diff of a dimension row's tracked columns.
+
+    The row's text form keeps NULL and '' apart. schema.sql backfills
+    existing dim_users rows with the same expression.
+    """
+    return f"md5(ROW({', '.join(f'{alias}.{c}' for c in columns)})::text)"
+
+
+def role_key(name: Optional[str]) -> Optional[str]:
+    """Natural key of a role: 'Serial Killer' and 'SERIAL_KILLER' match."""
+    return name.upper().replace(" ", "_") if name else None
+
+
+def reconcile_bucket_sql(key: str, buckets: int) -> str:
+    """SQL expression of the reconciliation hash range of a key.
+
+    Derived from md5 so the source and warehouse databases agree on it
+    regardless of their versions and collations.
+    """
+    return f"mod(('x' || substr(md5({key}::text), 1, 8))::bit(32)::bigint, {buckets})"
+
+
+def reconcile_row_sql(key: str, columns: List[str]) -> str:
+    """SQL text form of a row's key and compared columns, the same on both sides."""
+    return f"ROW({', '.join(f'{c}::text' for c in [key, *columns])})::text"
+
+
+def shadow_name(table: str) -> str:
+    """Name of the shadow table a bulk load fills for a fact table."""
+    return f"{table}_bulk"
+
+
+def month_start(value: Any) -> date:
+    """First day of the month of a date, datetime or ISO timestamp string."""
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    """Shift a month-start date by a number of months."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    """Name of the monthly partition of a fact table."""
+    return f"{table}_p{month:%Y%m}"
+
+
+class ChunkPrefetcher:
+    """Read extract chunks on a background thread, ahead of their loads.
+
+    At most `depth` chunks are queued, so a slow warehouse holds back the
+    source reads (and their memory) instead of buffering the table. An
+    extract error is raised by the consumer after the chunks read before
+    it. close() stops the reader and closes the extract generator, which
+    releases its server-side cursor.
+    """
+
+    _DONE = object()
+
+    def __init__(
+        self,
+        chunks: Iterator[List[Dict]],
+        depth: int,
+        on_extract: Optional[Callable[[float], None]] = None,
+        name: str = "etl-extract",
+    ):
+        self.chunks = chunks
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(depth, 1))
+        self.on_extract = on_extract
+        self.stopping = threading.Event()
+        # Seconds the consumer spent waiting for the next chunk
+        self.wait_seconds = 0.0
+        self.thread = threading.Thread(target=self._produce, name=name, daemon=True)
+        self.thread.start()
+
+    def _put(self, item: Any) -> bool:
+        """Queue an item unless the consumer stops first."""
+        while not self.stopping.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        end = self._DONE
+        try:
+            while not self.stopping.is_set():
+                started = time.perf_counter()
+                chunk = next(self.chunks, None)
+                if chunk is None:
+                    break
+                if self.on_extract:
+                    self.on_extract(time.perf_counter() - started)
+                if not self._put(chunk):
+                    break
+        except Exception as e:
+            end = e
+        finally:
+            if self.stopping.is_set():
+                self.chunks.close()
+            self._put(end)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> List[Dict]:
+        started = time.perf_counter()
+        item = self.queue.get()
+        self.wait_seconds = time.perf_counter() - started
+        if item is self._DONE:
+            self.queue.put(item)
+            raise StopIteration
+        if isinstance(item, Exception):
+            self.queue.put(self._DONE)
+            raise item
+        return item
+
+    def close(self):
+        """Stop reading ahead and wait for the reader thread to exit."""
+        self.stopping.set()
+        while self.thread.is_alive():
+            try:
+                self.queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self.thread.join()
+
+
+class ConnectionPools:
+    """Long-lived connection pools for the warehouse and each source database.
+
+    Owned by a long-running process (the scheduler) and shared by every
+    pipeline it creates, so scheduled runs reuse authenticated connections
+    instead of opening new ones. Connections are health-checked when
+    borrowed and broken ones are discarded and replaced.
+    """
+
+    def __init__(self, maxconn: int = ETL_POOL_MAX_CONNECTIONS):
+        self.maxconn = maxconn
+        self.pools: Dict[str, ThreadedConnectionPool] = {}
+        self.lock = threading.Lock()
+
+    def get_pool(self, name: str) -> ThreadedConnectionPool:
+        """Get (lazily creating) the pool for a database in DB_CONFIGS."""
+        with self.lock:
+            if name not in self.pools:
+                self.pools[name] = ThreadedConnectionPool(
+                    1, self.maxconn, **DB_CONFIGS[name]
+                )
+                logger.info(f"🔌 Created connection pool for {name}")
+            return self.pools[name]
+
+    @staticmethod
+    def is_healthy(conn) -> bool:
+        """Check a pooled connection is still usable."""
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self, name: str):
+        """Borrow a healthy connection, reconnecting if the pooled one broke."""
+        pool = self.get_pool(name)
+        conn = pool.getconn()
+        if not self.is_healthy(conn):
+            logger.warning(f"⚠️ Discarding broken pooled connection to {name}")
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+        return conn
+
+    def putconn(self, name: str, conn):
+        """Return a borrowed connection, discarding it if it is broken."""
+        broken = bool(conn.closed)
+        if not broken:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        self.pools[name].putconn(conn, close=broken)
+
+    def usage(self) -> Dict[str, Dict[str, int]]:
+        """Connections currently borrowed and idle, per database."""
+        with self.lock:
+            return {
+                name: {"in_use": len(pool._used), "idle": len(pool._pool)}
+                for name, pool in self.pools.items()
+            }
+
+    def closeall(self):
+        """Close every pooled connection."""
+        with self.lock:
+            for pool in self.pools.values():
+                pool.closeall()
+            self.pools.clear()
+        logger.info("All connection pools closed")
+
+
+class DimensionKeyCache:
+    """Bounded LRU cache of dimension natural key -> surrogate key lookups.
+
+    Keeps up to `capacity` entries per dimension in DIMENSION_KEYS and is
+    safe to share between pipelines and runs (the scheduler keeps one for
+    its lifetime). Dimensions are warmed in bulk with their most recent
+    rows the first time they are needed, misses are resolved with one
+    query per batch of keys, and the pipeline invalidates the keys it
+    rewrites. Keys missing from the dimension are not cached, so they are
+    looked up again once the dimension row is loaded.
+    """
+
+    def __init__(self, capacity: int = ETL_DIM_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries: Dict[str, OrderedDict] = {
+            name: OrderedDict() for name in DIMENSION_KEYS
+        }
+        self.warmed: Set[str] = set()
+        self.hits = {name: 0 for name in DIMENSION_KEYS}
+        self.misses = {name: 0 for name in DIMENSION_KEYS}
+        self.lock = threading.Lock()
+
+    def put(self, dimension: str, pairs: List[Tuple[Any, Any]]):
+        """Add entries as the most recently used, evicting the least recent."""
+        entries = self.entries[dimension]
+        with self.lock:
+            for key, value in pairs:
+                entries[key] = value
+                entries.move_to_end(key)
+            while len(entries) > self.capacity:
+                entries.popitem(last=False)
+
+    def warm(self, conn, dimensions: List[str]):
+        """Load the most recent rows of dimensions not warmed yet."""
+        for dimension in dimensions:
+            if dimension in self.warmed:
+                continue
+            spec = DIMENSION_KEYS[dimension]
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""
+                    SELECT {spec['natural']}, {spec['surrogate']}
+                    FROM {dimension}
+                    WHERE {spec['current']}
+                    ORDER BY {spec['recency']} DESC
+                    LIMIT %s
+                """,
+                    (self.capacity,),
+                )
+                rows = cur.fetchall()
+            conn.commit()
+            self.put(dimension, rows[::-1])
+            self.warmed.add(dimension)
+            logger.info(f"🔑 Warmed {dimension} key cache with {len(rows)} keys")
+
+    def get_many(self, conn, dimension: str, keys: List[Any]) -> Dict[Any, Any]:
+        """Surrogate keys of the given natural keys that exist in the dimension.
+
+        Runs inside the caller's transaction, so keys written by the
+        current load are visible.
+        """
+        entries = self.entries[dimension]
+        found = {}
+        missing = []
+        with self.lock:
+            for key in set(keys):
+                if key in entries:
+                    entries.move_to_end(key)
+                    found[key] = entries[key]
+                else:
+                    missing.append(key)
+            self.hits[dimension] += len(found)
+            self.misses[dimension] += len(missing)
+        metrics.observe_key_cache(dimension, len(found), len(missing))
+
+        if missing:
+            spec = DIMENSION_KEYS[dimension]
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""
+                    SELECT {spec['natural']}, {spec['surrogate']}
+                    FROM {dimension}
+                    WHERE {spec['natural']} = ANY(%s) AND {spec['current']}
+                """,
+                    (missing,),
+                )
+                rows = cur.fetchall()
+            self.put(dimension, rows)
+            found.update(rows)
+        return found
+
+    def clear(self):
+        """Forget every entry, so the next use warms the dimensions again."""
+        with self.lock:
+            for entries in self.entries.values():
+                entries.clear()
+            self.warmed.clear()
+
+    def invalidate(self, dimension: str, keys: List[Any]):
+        """Forget the entries of natural keys whose surrogate key may change."""
+        entries = self.entries[dimension]
+        with self.lock:
+            for key in keys:
+                entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hits, misses and size per dimension."""
+        with self.lock:
+            return {
+                name: {
+                    "hits": self.hits[name],
+                    "misses": self.misses[name],
+                    "size": len(self.entries[name]),
+                }
+                for name in DIMENSION_KEYS
+            }
+
 
 class ETLPipeline:
     """Main ETL Pipeline class for data warehouse sync."""
 
-    def __init__(self):
+    def __init__(
+        self,
+        batch_size: int = ETL_BATCH_SIZE,
+        load_methods: Optional[Dict[str, str]] = None,
+        workers: int = ETL_WORKERS,
+        pools: Optional[ConnectionPools] = None,
+        max_rows: int = ETL_MAX_ROWS_PER_RUN,
+        key_cache: Optional[DimensionKeyCache] = None,
+        pipeline_depth: int = ETL_PIPELINE_DEPTH,
+        bulk_load: bool = ETL_BULK_LOAD,
+        profile: bool = ETL_PROFILE,
+    ):
         self.warehouse_conn = None
         self.source_conns: Dict[str, Any] = {}
+        # Second source connections for point lookups, whose commits must not
+        # close the server-side cursors streaming on source_conns
+        self.lookup_conns: Dict[str, Any] = {}
+        self.pools = pools
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_rows = max_rows
+        self.pipeline_depth = pipeline_depth
+        self.bulk_load = bulk_load
+        self.profile = profile
+        self.load_methods = {
+            **TABLE_LOAD_METHODS,
+            **TABLE_DIM_LOAD_METHODS,
+            **(load_methods or {}),
+        }
+        for table, method in self.load_methods.items():
+            allowed = DIM_LOAD_METHODS if table.startswith("dim_") else LOAD_METHODS
+            if method not in allowed:
+                raise ValueError(f"Unknown load method for {table}: {method}")
+        # Row-level outcome counters of the table run in progress
+        self.run_stats: Dict[str, int] = {}
+        # Monthly partitions known to exist, per partitioned fact table
+        # (None when the table is still an unpartitioned legacy heap)
+        self.partitions: Dict[str, Optional[Set[date]]] = {}
+        # Event dates of fact rows written by this pipeline, per fact table
+        self.touched_days: Dict[str, Set[date]] = {}
+        # Seconds spent in transform_* since the last load() call started
+        self.transform_seconds = 0.0
+        # Outcome of every table job run by this pipeline: status
+        # (success, failed or locked), new rows and whether max_rows was hit
+        self.job_results: Dict[str, Dict[str, Any]] = {}
+        # Backfill shards leave game statistics to the parent, which derives
+        # them once all shards are loaded
+        self.defer_game_refresh = False
+        # Dimension surrogate keys of fact rows (shared with job pipelines)
+        self.key_cache = key_cache or DimensionKeyCache()
+        # Shadow table loads are redirected to, per fact table being bulk loaded
+        self.bulk_tables: Dict[str, str] = {}
+        # Profiler of the table run in progress, when profiling
+        self.profiler: Optional[RunProfiler] = None
+
+    def connect(self, name: str):
+        """Open a connection, borrowing it from the shared pools if any."""
+        if self.pools:
+            return self.pools.getconn(name)
+        return psycopg2.connect(**DB_CONFIGS[name])
 
     def connect_warehouse(self):
         """Establish connection to data warehouse."""
+        if self.warehouse_conn:
+            return
+
         try:
-            self.warehouse_conn = psycopg2.connect(**DB_CONFIGS["warehouse"])
+            self.warehouse_conn = self.connect("warehouse")
             logger.info("✅ Connected to data warehouse")
         except Exception as e:
             logger.error(f"❌ Failed to connect to warehouse: {e}")
@@ -86,9 +976,11 @@ class ETLPipeline:
         """Establish connection to a source database."""
         if source_name not in DB_CONFIGS:
             raise ValueError(f"Unknown source: {source_name}")
+        if source_name in self.source_conns:
+            return
 
         try:
-            conn = psycopg2.connect(**DB_CONFIGS[source_name])
+            conn = self.connect(source_name)
             self.source_conns[source_name] = conn
             logger.info(f"✅ Connected to {source_name} database")
         except Exception as e:
@@ -96,60 +988,249 @@ class ETLPipeline:
             raise
 
     def close_connections(self):
-        """Close all database connections."""
+        """Close all database connections (or return them to the pools)."""
+        conns = list(self.source_conns.items()) + list(self.lookup_conns.items())
         if self.warehouse_conn:
-            self.warehouse_conn.close()
-        for conn in self.source_conns.values():
-            conn.close()
+            conns.append(("warehouse", self.warehouse_conn))
+        for name, conn in conns:
+            if self.pools:
+                self.pools.putconn(name, conn)
+            else:
+                conn.close()
+        self.warehouse_conn = None
+        self.source_conns = {}
+        self.lookup_conns = {}
         logger.info("All connections closed")
 
-    def get_last_etl_timestamp(self, source: str, table: str) -> Optional[datetime]:
-        """Get the last successful ETL timestamp for incremental loads."""
+    def get_last_etl_watermark(self, source: str, table: str) -> Optional[Watermark]:
+        """Get the last committed (timestamp, id) watermark for incremental loads.
+
+        Failed runs are considered too: chunks are committed one at a time,
+        so a failed run's watermark still marks rows that made it into the
+        warehouse. Bulk load runs only count once their shadow table has
+        been swapped in.
+        """
         with self.warehouse_conn.cursor() as cur:
             cur.execute(
                 """
-                SELECT last_extracted_timestamp 
+                SELECT last_extracted_timestamp, COALESCE(last_extracted_id, '')
                 FROM etl_run_log 
-                WHERE source_system = %s AND table_name = %s AND status = 'success'
+                WHERE source_system = %s AND table_name = %s
+                  AND status IN ('success', 'failed')
+                  AND last_extracted_timestamp IS NOT NULL
+                  AND parent_run_id IS NULL
+                  AND NOT COALESCE(bulk_load, FALSE)
                 ORDER BY run_end_time DESC 
                 LIMIT 1
             """,
                 (source, table),
             )
             result = cur.fetchone()
-            return result[0] if result else None
+            return tuple(result) if result else None
+
+    def get_overlap_keys(self, source: str, table: str) -> Set[Tuple[str, datetime]]:
+        """Get the (id, timestamp) keys loaded inside the last overlap window."""
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT source_id, source_updated_at
+                FROM etl_watermark_keys
+                WHERE source_system = %s AND table_name = %s
+            """,
+                (source, table),
+            )
+            return set(cur.fetchall())
+
+    def save_overlap_keys(
+        self, source: str, table: str, keys: List[Tuple[str, datetime]]
+    ):
+        """Replace the stored overlap-window keys of a table."""
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                """
+                DELETE FROM etl_watermark_keys
+                WHERE source_system = %s AND table_name = %s
+            """,
+                (source, table),
+            )
+            execute_batch(
+                cur,
+                """
+                INSERT INTO etl_watermark_keys
+                    (source_system, table_name, source_id, source_updated_at)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT DO NOTHING
+            """,
+                [(source, table, key, ts) for key, ts in keys],
+                page_size=100,
+            )
+            self.warehouse_conn.commit()
+
+    def get_last_etl_lsn(self, source: str) -> Optional[str]:
+        """Get the last replication LSN confirmed into the warehouse for a source.
+
+        Only the source-level batch rows count: a table's own run may have
+        committed while a later table of the same batch failed.
+        """
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT MAX(last_extracted_lsn)
+                FROM etl_run_log
+                WHERE source_system = %s AND table_name = %s AND status = 'success'
+            """,
+                (source, CDC_LSN_TABLE),
+            )
+            return cur.fetchone()[0]
+
+    def get_resume_checkpoint(
+        self, source: str, table: str
+    ) -> Optional[Tuple[int, Optional[Watermark]]]:
+        """Find the checkpoint of a recent unfinished full load of a table.
+
+        Returns (run_id, watermark of its last committed chunk) when the
+        latest full load failed less than ETL_RESUME_MAX_AGE_HOURS ago.
+        Bulk loads that were never swapped in are not resumable: their
+        checkpoints only cover rows of the shadow table.
+        """
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT run_id, status, run_start_time,
+                       last_extracted_timestamp, COALESCE(last_extracted_id, '')
+                FROM etl_run_log
+                WHERE source_system = %s AND table_name = %s AND full_load
+                  AND parent_run_id IS NULL AND shard_count IS NULL
+                  AND NOT COALESCE(bulk_load, FALSE)
+                ORDER BY run_id DESC
+                LIMIT 1
+            """,
+                (source, table),
+            )
+            result = cur.fetchone()
+        self.warehouse_conn.commit()
+        if not result:
+            return None
+
+        run_id, status, started, last_timestamp, last_id = result
+        max_age = timedelta(hours=ETL_RESUME_MAX_AGE_HOURS)
+        if status != "failed" or last_timestamp is None:
+            return None
+        if started < datetime.utcnow() - max_age:
+            return None
+        return run_id, (last_timestamp, last_id)
+
+    def mark_interrupted_runs(self, source: str, table: str):
+        """Mark runs left 'running' by a dead process as failed.
+
+        Only called while holding the table's job lock, so no live run can
+        be affected. The end time is set to the start time to keep the
+        run's place in the watermark history.
+        """
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE etl_run_log
+                SET status = 'failed', run_end_time = run_start_time,
+                    error_message = 'Interrupted before completion'
+                WHERE source_system = %s AND table_name = %s AND status = 'running'
+            """,
+                (source, table),
+            )
+            if cur.rowcount:
+                logger.warning(f"⚠️ Marked {cur.rowcount} interrupted {table} run(s) as failed")
+        self.warehouse_conn.commit()
+
+    def log_etl_start(
+        self,
+        source: str,
+        table: str,
+        full_load: bool = False,
+        resumed_from: Optional[int] = None,
+        shard: Optional[Dict[str, Any]] = None,
+        shard_count: Optional[int] = None,
+    ) -> int:
+        """Log the start of an ETL run (or of one backfill shard).
 
-    def log_etl_start(self, source: str, table: str) -> int:
-        """Log the start of an ETL run."""
+        Runs of a table being bulk loaded are flagged `bulk_load` until the
+        swap clears it, so their watermarks stay unused while the rows only
+        exist in the shadow table, even if the process dies.
+        """
+        shard = shard or {}
         with self.warehouse_conn.cursor() as cur:
             cur.execute(
                 """
-                INSERT INTO etl_run_log (source_system, table_name, run_start_time, status)
-                VALUES (%s, %s, %s, 'running')
+                INSERT INTO etl_run_log
+                    (source_system, table_name, run_start_time, status,
+                     full_load, resumed_from_run_id, parent_run_id,
+                     range_start, range_end, shard_count, bulk_load)
+                VALUES (%s, %s, %s, 'running', %s, %s, %s, %s, %s, %s, %s)
                 RETURNING run_id
             """,
-                (source, table, datetime.utcnow()),
+                (
+                    source,
+                    table,
+                    datetime.utcnow(),
+                    full_load,
+                    resumed_from,
+                    shard.get("parent_run_id"),
+                    shard.get("range_start"),
+                    shard.get("range_end"),
+                    shard_count,
+                    table in self.bulk_tables,
+                ),
             )
             run_id = cur.fetchone()[0]
             self.warehouse_conn.commit()
             return run_id
 
+    def log_etl_progress(
+        self,
+        run_id: int,
+        records_extracted: int,
+        records_loaded: int,
+        watermark: Optional[Watermark],
+    ):
+        """Checkpoint a running ETL after a committed chunk.
+
+        The watermark is the key of the last row of the chunk; an
+        interrupted run resumes after it.
+        """
+        last_timestamp, last_id = watermark or (None, None)
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE etl_run_log 
+                SET records_extracted = %s, records_loaded = %s,
+                    last_extracted_timestamp = %s, last_extracted_id = %s
+                WHERE run_id = %s
+            """,
+                (records_extracted, records_loaded, last_timestamp, last_id, run_id),
+            )
+            self.warehouse_conn.commit()
+
     def log_etl_end(
         self,
         run_id: int,
         records_extracted: int,
         records_loaded: int,
         status: str,
-        last_timestamp: Optional[datetime] = None,
+        watermark: Optional[Watermark] = None,
         error: str = None,
+        stats: Optional[Dict[str, int]] = None,
+        last_lsn: Optional[str] = None,
     ):
         """Log the end of an ETL run."""
+        stats = stats or {}
+        last_timestamp, last_id = watermark or (None, None)
         with self.warehouse_conn.cursor() as cur:
             cur.execute(
                 """
                 UPDATE etl_run_log 
                 SET run_end_time = %s, records_extracted = %s, records_loaded = %s,
-                    status = %s, last_extracted_timestamp = %s, error_message = %s
+                    status = %s, last_extracted_timestamp = %s, error_message = %s,
+                    records_inserted = %s, records_updated = %s, records_unchanged = %s,
+                    last_extracted_lsn = %s, last_extracted_id = %s
                 WHERE run_id = %s
             """,
                 (
@@ -159,161 +1240,576 @@ class ETLPipeline:
                     status,
                     last_timestamp,
                     error,
+                    stats.get("inserted"),
+                    stats.get("updated"),
+                    stats.get("unchanged"),
+                    last_lsn,
+                    last_id,
                     run_id,
                 ),
             )
             self.warehouse_conn.commit()
 
-    # =========================================
-    # USER SERVICE ETL
-    # =========================================
+    def stream_query(
+        self,
+        source_name: str,
+        cursor_name: str,
+        query: str,
+        params: Optional[tuple] = None,
+    ) -> Iterator[List[Dict]]:
+        """Stream a source query in chunks of `batch_size` rows.
 
-    def extract_users(self, since: Optional[datetime] = None) -> List[Dict]:
-        """Extract users from user management service."""
-        conn = self.source_conns.get("user_service")
-        if not conn:
-            raise ValueError("User service not connected")
+        Uses a named (server-side) cursor so only one chunk is held in
+        memory at a time, regardless of the size of the source table.
+        """
+        conn = self.source_conns[source_name]
+        total = 0
 
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            if since:
-                cur.execute(
-                    """
-                    SELECT id, username, email, "createdAt", "updatedAt"
-                    FROM "User"
-                    WHERE "updatedAt" > %s
-                    ORDER BY "updatedAt"
-                """,
-                    (since,),
-                )
-            else:
-                cur.execute("""
-                    SELECT id, username, email, "createdAt", "updatedAt"
-                    FROM "User"
-                    ORDER BY "createdAt"
-                """)
+        cursor_factory = (
+            self.profiler.cursor_class(RealDictCursor) if self.profiler else RealDictCursor
+        )
+        with conn.cursor(name=cursor_name, cursor_factory=cursor_factory) as cur:
+            cur.itersize = self.batch_size
+            cur.execute(query, params)
+            while True:
+                chunk = cur.fetchmany(self.batch_size)
+                if not chunk:
+                    break
+                total += len(chunk)
+                yield chunk
 
-            users = cur.fetchall()
-            logger.info(f"📤 Extracted {len(users)} users from user_service")
-            return [dict(u) for u in users]
+        # Named cursors live inside a transaction; end it so the source
+        # connection does not sit idle in transaction between runs
+        conn.commit()
+        logger.info(f"📤 Extracted {total} rows from {source_name} ({cursor_name})")
 
-    def load_users(self, users: List[Dict]) -> int:
-        """Load users into dimension table."""
-        if not users:
-            return 0
+    def stream_keyset(
+        self,
+        source_name: str,
+        cursor_name: str,
+        select: str,
+        column: str,
+        since: Optional[Watermark] = None,
+        until: Optional[datetime] = None,
+    ) -> Iterator[List[Dict]]:
+        """Stream a source SELECT in (column, id) keyset order.
+
+        Always ordered by the keyset so the last row of every chunk is the
+        highest position extracted so far. Rows start after the `since`
+        key and, when `until` is given, stop before that time.
+        """
+        conditions = []
+        params = []
+        if since:
+            conditions.append(f"({column}, id) > (%s, %s)")
+            params.extend(since)
+        if until:
+            conditions.append(f"{column} < %s")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.stream_query(
+            source_name,
+            cursor_name,
+            f"{select} {where} ORDER BY {column}, id",
+            tuple(params) or None,
+        )
+
+    def copy_rows(self, cur, table: str, columns: tuple, rows: Rows):
+        """Stream rows into a table with COPY ... FROM STDIN.
+
+        The chunk is rendered column by column into an in-memory buffer,
+        so nothing is spooled to disk on the ETL side.
+        """
+        if not isinstance(rows, ColumnBatch):
+            rows = ColumnBatch.from_rows(rows, columns)
+        rendered = [map(to_copy_text, rows[c]) for c in columns]
+        buffer = io.StringIO()
+        buffer.writelines("\t".join(fields) + "\n" for fields in zip(*rendered))
+        buffer.seek(0)
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
 
+    def write_rows(
+        self,
+        table: str,
+        columns: tuple,
+        rows: Rows,
+        method: str = "batch",
+        on_conflict: str = "",
+    ) -> int:
+        """Write rows to a warehouse table using the given load method.
+
+        `on_conflict` is appended to the INSERT of the batch method; COPY
+        cannot resolve conflicts, so idempotent COPY loads go through
+        merge_rows instead.
+        """
+        if table in self.bulk_tables:
+            return self.bulk_write(table, columns, rows)
         with self.warehouse_conn.cursor() as cur:
-            insert_sql = """
-                INSERT INTO dim_users (user_id, username, email, created_at, last_updated)
-                VALUES (%(id)s, %(username)s, %(email)s, %(createdAt)s, %(updatedAt)s)
-                ON CONFLICT (user_id) DO UPDATE SET
-                    username = EXCLUDED.username,
-                    email = EXCLUDED.email,
-                    last_updated = EXCLUDED.last_updated
-            """
-            execute_batch(cur, insert_sql, users, page_size=100)
+            if method == "copy":
+                self.copy_rows(cur, table, columns, rows)
+            else:
+                insert_sql = f"""
+                    INSERT INTO {table} ({', '.join(columns)})
+                    VALUES ({', '.join(f'%({c})s' for c in columns)})
+                    {on_conflict}
+                """
+                if isinstance(rows, ColumnBatch):
+                    rows = rows.rows()
+                execute_batch(cur, insert_sql, rows, page_size=100)
             self.warehouse_conn.commit()
+        return len(rows)
 
-        logger.info(f"📥 Loaded {len(users)} users to warehouse")
-        return len(users)
+    def bulk_write(self, table: str, columns: tuple, rows: Rows) -> int:
+        """COPY rows into the shadow table of a bulk-loaded fact table.
 
-    def extract_transactions(self, since: Optional[datetime] = None) -> List[Dict]:
-        """Extract currency transactions from user management service."""
-        conn = self.source_conns.get("user_service")
-        if not conn:
-            raise ValueError("User service not connected")
+        The shadow table has no unique indexes to resolve conflicts on;
+        duplicates are removed once before its indexes are built.
+        """
+        with self.warehouse_conn.cursor() as cur:
+            self.copy_rows(cur, self.bulk_tables[table], columns, rows)
+        self.warehouse_conn.commit()
+        return len(rows)
 
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            if since:
-                cur.execute(
-                    """
-                    SELECT id, "userId", type, amount, description, "createdAt"
-                    FROM "CurrencyTransaction"
-                    WHERE "createdAt" > %s
-                    ORDER BY "createdAt"
-                """,
-                    (since,),
-                )
+    def merge_rows(
+        self,
+        table: str,
+        key: str,
+        columns: tuple,
+        tracked: tuple,
+        rows: Rows,
+        conflict_key: Optional[tuple] = None,
+    ) -> Dict[str, int]:
+        """Upsert rows into a warehouse table through a staging table.
+
+        The chunk is COPYed into a session-local temp table (temp tables
+        are never WAL-logged), then applied with one set-based upsert on
+        the unique `key` column. Existing rows are only rewritten when one
+        of the tracked columns IS DISTINCT FROM the staged value, so
+        re-extracted but unchanged rows cost no table or WAL churn. With
+        no tracked columns, conflicting rows are skipped. `conflict_key`
+        names the unique index columns when they extend `key` (e.g. with
+        the partition column).
+        """
+        if table in self.bulk_tables:
+            inserted = self.bulk_write(table, columns, rows)
+            return {"inserted": inserted, "updated": 0, "unchanged": 0}
+        stage = f"stage_{table}"
+        if not isinstance(rows, ColumnBatch):
+            rows = ColumnBatch.from_rows(rows, columns)
+        # A key may appear more than once in a chunk (e.g. several CDC
+        # updates of one row); the last occurrence is the newest
+        last = {k: i for i, k in enumerate(rows[key])}
+        if len(last) < len(rows):
+            rows = rows.take(sorted(last.values()))
+        if tracked:
+            updates = [
+                f"{c} = EXCLUDED.{c}" for c in columns if c not in (key, "created_at")
+            ]
+            if table.startswith("fact_"):
+                # Cold storage re-exports months whose etl_loaded_at moved
+                updates.append("etl_loaded_at = now()")
+            updates = ",\n".join(updates)
+            current = ", ".join(f"{table}.{c}" for c in tracked)
+            staged = ", ".join(f"EXCLUDED.{c}" for c in tracked)
+            conflict = f"""DO UPDATE SET
+                        {updates}
+                    WHERE ({current}) IS DISTINCT FROM ({staged})"""
+        else:
+            conflict = "DO NOTHING"
+
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(f"""
+                CREATE TEMP TABLE IF NOT EXISTS {stage}
+                    (LIKE {table} INCLUDING DEFAULTS)
+                    ON COMMIT DELETE ROWS
+            """)
+            self.copy_rows(cur, stage, columns, rows)
+            conflict_columns = conflict_key or (key,)
+            if table in PARTITIONED_FACTS:
+                # Partitioned tables cannot return system columns such as
+                # xmax; tell updates apart by the keys that existed before
+                existing = f"""
+                    existing AS (
+                        SELECT s.{key} FROM {stage} s JOIN {table} t
+                            ON {' AND '.join(f't.{c} = s.{c}' for c in conflict_columns)}
+                    ),"""
+                returning = f"NOT EXISTS (SELECT 1 FROM existing e WHERE e.{key} = {table}.{key})"
             else:
-                cur.execute("""
-                    SELECT id, "userId", type, amount, description, "createdAt"
-                    FROM "CurrencyTransaction"
-                    ORDER BY "createdAt"
-                """)
+                existing = ""
+                returning = "xmax = 0"
+            cur.execute(f"""
+                WITH {existing} merged AS (
+                    INSERT INTO {table} ({', '.join(columns)})
+                    SELECT {', '.join(columns)}
+                    FROM {stage}
+                    ON CONFLICT ({', '.join(conflict_columns)}) {conflict}
+                    RETURNING ({returning}) AS inserted
+                )
+                SELECT COUNT(*) FILTER (WHERE inserted),
+                       COUNT(*) FILTER (WHERE NOT inserted)
+                FROM merged
+            """)
+            inserted, updated = cur.fetchone()
+            self.warehouse_conn.commit()
 
-            transactions = cur.fetchall()
-            logger.info(
-                f"📤 Extracted {len(transactions)} transactions from user_service"
+        return {
+            "inserted": inserted,
+            "updated": updated,
+            "unchanged": len(rows) - inserted - updated,
+        }
+
+    def merge_versions(
+        self,
+        table: str,
+        key: str,
+        columns: tuple,
+        tracked: tuple,
+        rows: List[Dict],
+    ) -> Dict[str, int]:
+        """Apply rows to a Type 2 slowly changing dimension table.
+
+        The chunk is COPYed into a staging table and applied with two
+        set-based statements in one transaction: current versions whose
+        hash_diff (md5 of the tracked columns) differs from the staged row
+        are closed at the row's last_updated, then a new current version is
+        inserted for every key left without one. Rows older than the
+        current version are ignored, so replays cannot reorder history.
+        Keys whose version was closed count as updated, and keys that only
+        got a new version count as inserted.
+        """
+        stage = f"stage_{table}"
+        rows = list({row[key]: row for row in rows}.values())
+        staged_hash = hash_diff_sql(tracked, "s")
+
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(f"""
+                CREATE TEMP TABLE IF NOT EXISTS {stage}
+                    (LIKE {table} INCLUDING DEFAULTS)
+                    ON COMMIT DELETE ROWS
+            """)
+            self.copy_rows(cur, stage, columns, rows)
+            cur.execute(f"""
+                UPDATE {table} d
+                SET is_current = FALSE, valid_to = s.last_updated
+                FROM {stage} s
+                WHERE d.{key} = s.{key}
+                  AND d.is_current
+                  AND d.hash_diff IS DISTINCT FROM {staged_hash}
+                  AND s.last_updated > d.valid_from
+                RETURNING d.{key}
+            """)
+            closed = {row[0] for row in cur.fetchall()}
+            cur.execute(f"""
+                INSERT INTO {table}
+                    ({', '.join(columns)}, hash_diff, is_current, valid_from)
+                SELECT {', '.join(f's.{c}' for c in columns)}, {staged_hash}, TRUE,
+                       CASE WHEN EXISTS (SELECT 1 FROM {table} v WHERE v.{key} = s.{key})
+                            THEN s.last_updated ELSE s.created_at END
+                FROM {stage} s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {table} d WHERE d.{key} = s.{key} AND d.is_current
+                )
+                RETURNING {key}
+            """)
+            inserted = {row[0] for row in cur.fetchall()} - closed
+            self.warehouse_conn.commit()
+
+        return {
+            "inserted": len(inserted),
+            "updated": len(closed),
+            "unchanged": len(rows) - len(inserted) - len(closed),
+        }
+
+    def record_stats(self, stats: Dict[str, int]):
+        """Add per-chunk row outcomes to the current table run."""
+        for name, count in stats.items():
+            self.run_stats[name] = self.run_stats.get(name, 0) + count
+
+    def timed_transform(
+        self, transform: Callable[[Rows], Rows], rows: Rows
+    ) -> Rows:
+        """Run a transform_* method, accounting its time to the transform stage."""
+        started = time.perf_counter()
+        try:
+            with self.profile_stage("transform"):
+                return transform(rows)
+        finally:
+            self.transform_seconds += time.perf_counter() - started
+
+    def timed_load(
+        self, source: str, table: str, load: Callable[[List[Dict]], int], rows: List[Dict]
+    ) -> int:
+        """Run a load_* method and record its transform and load stage times."""
+        self.transform_seconds = 0.0
+        started = time.perf_counter()
+        with self.profile_stage("load"):
+            loaded = load(rows)
+        elapsed = time.perf_counter() - started
+        metrics.observe_stage(source, table, "transform", self.transform_seconds)
+        metrics.observe_stage(source, table, "load", elapsed - self.transform_seconds)
+        return loaded
+
+    def profile_stage(self, stage: str):
+        """Context manager profiling its body as a stage of the current run."""
+        return self.profiler.stage(stage) if self.profiler else nullcontext()
+
+    def resolve_keys(self, table: str, batch: ColumnBatch) -> ColumnBatch:
+        """Add the dimension surrogate key columns of a transformed fact batch.
+
+        Each dimension is resolved through the key cache with one lookup
+        for the chunk's distinct natural keys; rows whose dimension row
+        does not exist (yet) get a NULL key.
+        """
+        for column, dimension, natural in FACT_DIMENSION_REFS[table]:
+            values = batch[natural]
+            if dimension == "dim_roles":
+                values = list(map(role_key, values))
+            keys = self.key_cache.get_many(
+                self.warehouse_conn, dimension, [v for v in values if v is not None]
             )
-            return [dict(t) for t in transactions]
+            batch[column] = list(map(keys.get, values))
+        return batch
 
-    def load_transactions(self, transactions: List[Dict]) -> int:
-        """Load transactions into fact table."""
-        if not transactions:
+    def record_touched(self, table: str, rows: Rows):
+        """Remember the event dates of fact rows for the rollup refresh.
+
+        The days are also queued in etl_rollup_pending for every rollup of
+        the fact table, so they survive a failed refresh or a crash.
+        """
+        days = {
+            date.fromisoformat(value[:10]) if isinstance(value, str) else value.date()
+            for value in column_values(rows, FACT_TIME_COLUMNS[table])
+        }
+        if not days:
+            return
+        self.touched_days.setdefault(table, set()).update(days)
+        rollups = [rollup for rollup, spec in ROLLUPS.items() if spec["fact"] == table]
+        if not rollups:
+            return
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO etl_rollup_pending (rollup_table, day)
+                SELECT r, d FROM unnest(%s::text[]) AS r, unnest(%s::date[]) AS d
+                ON CONFLICT DO NOTHING
+            """,
+                (rollups, sorted(days)),
+            )
+        self.warehouse_conn.commit()
+
+    def pending_rollup_days(self) -> Dict[str, Set[date]]:
+        """Read the days queued for each rollup by earlier runs."""
+        pending: Dict[str, Set[date]] = {}
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute("SELECT rollup_table, day FROM etl_rollup_pending")
+            for rollup, day in cur.fetchall():
+                pending.setdefault(rollup, set()).add(day)
+        self.warehouse_conn.commit()
+        return pending
+
+    # =========================================
+    # USER SERVICE ETL
+    # =========================================
+
+    def extract_users(
+        self, since: Optional[Watermark] = None, until: Optional[datetime] = None
+    ) -> Iterator[List[Dict]]:
+        """Extract users from user management service in chunks."""
+        if "user_service" not in self.source_conns:
+            raise ValueError("User service not connected")
+
+        return self.stream_keyset(
+            "user_service",
+            "etl_users",
+            DIM_SOURCE_SELECTS["dim_users"],
+            '"updatedAt"',
+            since,
+            until,
+        )
+
+    def transform_users(self, users: List[Dict]) -> List[Dict]:
+        """Transform source users to the dim_users schema."""
+        return [
+            {
+                "user_id": u["id"],
+                "username": u["username"],
+                "email": u["email"],
+                "created_at": u["createdAt"],
+                "last_updated": u["updatedAt"],
+            }
+            for u in users
+        ]
+
+    def load_users(self, users: List[Dict]) -> int:
+        """Load users into dimension table."""
+        if not users:
             return 0
 
-        # Transform to warehouse schema
-        transformed = []
-        for t in transactions:
-            transformed.append(
-                {
-                    "user_id": t["userId"],
-                    "transaction_type": t["type"],
-                    "amount": t["amount"],
-                    "description": t.get("description"),
-                    "occurred_at": t["createdAt"],
-                }
+        if self.load_methods["dim_users"] == "merge":
+            stats = self.merge_versions(
+                "dim_users",
+                "user_id",
+                DIM_USERS_COLUMNS,
+                DIM_USERS_TRACKED,
+                self.timed_transform(self.transform_users, users),
+            )
+            self.record_stats(stats)
+            # New versions get new surrogate keys
+            self.key_cache.invalidate("dim_users", [u["id"] for u in users])
+            logger.info(
+                f"📥 Merged {len(users)} users to warehouse "
+                f"({stats['inserted']} new, {stats['updated']} new versions)"
             )
+            return len(users)
 
+        # Legacy path: overwrites the current version in place (Type 1)
         with self.warehouse_conn.cursor() as cur:
-            insert_sql = """
-                INSERT INTO fact_transactions 
-                    (user_id, transaction_type, amount, description, occurred_at, source_system)
-                VALUES (%(user_id)s, %(transaction_type)s, %(amount)s, %(description)s, 
-                        %(occurred_at)s, 'user_service')
+            insert_sql = f"""
+                INSERT INTO dim_users
+                    (user_id, username, email, created_at, last_updated, hash_diff, valid_from)
+                VALUES (%(id)s, %(username)s, %(email)s, %(createdAt)s, %(updatedAt)s,
+                        md5(ROW(%(username)s::VARCHAR, %(email)s::VARCHAR)::text),
+                        %(createdAt)s)
+                ON CONFLICT (user_id) WHERE is_current DO UPDATE SET
+                    username = EXCLUDED.username,
+                    email = EXCLUDED.email,
+                    last_updated = EXCLUDED.last_updated,
+                    hash_diff = {hash_diff_sql(DIM_USERS_TRACKED, "EXCLUDED")}
             """
-            execute_batch(cur, insert_sql, transformed, page_size=100)
+            execute_batch(cur, insert_sql, users, page_size=100)
             self.warehouse_conn.commit()
 
-        logger.info(f"📥 Loaded {len(transformed)} transactions to warehouse")
-        return len(transformed)
+        logger.info(f"📥 Loaded {len(users)} users to warehouse")
+        return len(users)
+
+    def extract_transactions(
+        self, since: Optional[Watermark] = None, until: Optional[datetime] = None
+    ) -> Iterator[List[Dict]]:
+        """Extract currency transactions from user management service in chunks."""
+        if "user_service" not in self.source_conns:
+            raise ValueError("User service not connected")
+
+        return self.stream_keyset(
+            "user_service",
+            "etl_transactions",
+            """
+            SELECT id, "userId", type, amount, description, "createdAt"
+            FROM "CurrencyTransaction"
+        """,
+            '"createdAt"',
+            since,
+            until,
+        )
+
+    def transform_transactions(self, transactions: List[Dict]) -> ColumnBatch:
+        """Transform source transactions to a fact_transactions column batch.
+
+        Renamed columns reuse the pivoted source column lists as they are.
+        """
+        source = ColumnBatch.from_rows(
+            transactions, ("id", "userId", "type", "amount", "description", "createdAt")
+        )
+        return ColumnBatch(
+            {
+                "user_id": source["userId"],
+                "transaction_type": source["type"],
+                "amount": source["amount"],
+                "description": source["description"],
+                "occurred_at": source["createdAt"],
+                "source_system": ["user_service"] * len(source),
+                "source_transaction_id": source["id"],
+            }
+        )
+
+    def load_transactions(self, transactions: List[Dict]) -> int:
+        """Load transactions into fact table."""
+        if not transactions:
+            return 0
+
+        transformed = self.timed_transform(self.transform_transactions, transactions)
+        transformed = self.timed_transform(
+            partial(self.resolve_keys, "fact_transactions"), transformed
+        )
+        self.ensure_partitions_for("fact_transactions", transformed)
+        if self.load_methods["fact_transactions"] == "copy":
+            stats = self.merge_rows(
+                "fact_transactions",
+                "source_transaction_id",
+                FACT_TRANSACTIONS_COLUMNS,
+                (),
+                transformed,
+                conflict_key=("source_transaction_id", "occurred_at"),
+            )
+            self.record_stats(stats)
+            loaded = stats["inserted"]
+        else:
+            loaded = self.write_rows(
+                "fact_transactions",
+                FACT_TRANSACTIONS_COLUMNS,
+                transformed,
+                "batch",
+                on_conflict=(
+                    "ON CONFLICT (source_transaction_id, occurred_at) DO NOTHING"
+                ),
+            )
+
+        self.record_touched("fact_transactions", transformed)
+        logger.info(f"📥 Loaded {loaded} transactions to warehouse")
+        return loaded
 
     # =========================================
     # GAME SERVICE ETL
     # =========================================
 
-    def extract_lobbies(self, since: Optional[datetime] = None) -> List[Dict]:
-        """Extract lobbies from game service."""
-        conn = self.source_conns.get("game_service")
-        if not conn:
+    def extract_lobbies(
+        self, since: Optional[Watermark] = None, until: Optional[datetime] = None
+    ) -> Iterator[List[Dict]]:
+        """Extract lobbies from game service in chunks."""
+        if "game_service" not in self.source_conns:
             raise ValueError("Game service not connected")
 
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            if since:
-                cur.execute(
-                    """
-                    SELECT id, name, "maxPlayers", status, "createdAt", "updatedAt"
-                    FROM "Lobby"
-                    WHERE "updatedAt" > %s
-                    ORDER BY "updatedAt"
-                """,
-                    (since,),
-                )
-            else:
-                cur.execute("""
-                    SELECT id, name, "maxPlayers", status, "createdAt", "updatedAt"
-                    FROM "Lobby"
-                    ORDER BY "createdAt"
-                """)
+        return self.stream_keyset(
+            "game_service",
+            "etl_lobbies",
+            DIM_SOURCE_SELECTS["dim_lobbies"],
+            '"updatedAt"',
+            since,
+            until,
+        )
 
-            lobbies = cur.fetchall()
-            logger.info(f"📤 Extracted {len(lobbies)} lobbies from game_service")
-            return [dict(l) for l in lobbies]
+    def transform_lobbies(self, lobbies: List[Dict]) -> List[Dict]:
+        """Transform source lobbies to the dim_lobbies schema."""
+        return [
+            {
+                "lobby_id": l["id"],
+                "lobby_name": l["name"],
+                "max_players": l["maxPlayers"],
+                "created_at": l["createdAt"],
+                "last_updated": l["updatedAt"],
+            }
+            for l in lobbies
+        ]
 
     def load_lobbies(self, lobbies: List[Dict]) -> int:
         """Load lobbies into dimension table."""
         if not lobbies:
             return 0
 
+        if self.load_methods["dim_lobbies"] == "merge":
+            stats = self.merge_rows(
+                "dim_lobbies",
+                "lobby_id",
+                DIM_LOBBIES_COLUMNS,
+                ("lobby_name", "max_players"),
+                self.timed_transform(self.transform_lobbies, lobbies),
+            )
+            self.record_stats(stats)
+            logger.info(
+                f"📥 Merged {len(lobbies)} lobbies to warehouse "
+                f"({stats['inserted']} new, {stats['updated']} changed)"
+            )
+            return len(lobbies)
+
         with self.warehouse_conn.cursor() as cur:
             insert_sql = """
                 INSERT INTO dim_lobbies (lobby_id, lobby_name, max_players, created_at, last_updated)
@@ -329,205 +1825,2768 @@ class ETLPipeline:
         logger.info(f"📥 Loaded {len(lobbies)} lobbies to warehouse")
         return len(lobbies)
 
-    def extract_player_sessions(self, since: Optional[datetime] = None) -> List[Dict]:
-        """Extract player sessions (lobby players) from game service."""
-        conn = self.source_conns.get("game_service")
-        if not conn:
+    def extract_games(
+        self, since: Optional[Watermark] = None, until: Optional[datetime] = None
+    ) -> Iterator[List[Dict]]:
+        """Extract started games (lobby game runs) from game service in chunks."""
+        if "game_service" not in self.source_conns:
+            raise ValueError("Game service not connected")
+
+        return self.stream_keyset(
+            "game_service",
+            "etl_games",
+            """
+            SELECT * FROM (
+                SELECT id, "gameStartTime", "gameEndTime", "cycleNumber", "updatedAt"
+                FROM "Lobby"
+                WHERE "gameStartTime" IS NOT NULL
+            ) g
+        """,
+            '"updatedAt"',
+            since,
+            until,
+        )
+
+    def transform_games(self, lobbies: List[Dict]) -> List[Dict]:
+        """Transform source lobbies to the fact_games schema.
+
+        Lobbies that never started a game (e.g. from CDC) are dropped.
+        """
+        return [
+            {
+                "lobby_id": l["id"],
+                "start_time": l["gameStartTime"],
+                "end_time": l.get("gameEndTime"),
+                "total_cycles": l.get("cycleNumber"),
+            }
+            for l in lobbies
+            if l.get("gameStartTime")
+        ]
+
+    def load_games(self, lobbies: List[Dict]) -> int:
+        """Load games into fact table and derive their statistics."""
+        transformed = self.timed_transform(self.transform_games, lobbies)
+        if not transformed:
+            return 0
+
+        stats = self.merge_rows(
+            "fact_games",
+            "lobby_id",
+            FACT_GAMES_COLUMNS,
+            ("end_time", "total_cycles"),
+            transformed,
+            conflict_key=("lobby_id", "start_time"),
+        )
+        self.record_stats(stats)
+        self.record_touched("fact_games", transformed)
+        self.refresh_games(column_values(transformed, "lobby_id"))
+        loaded = stats["inserted"] + stats["updated"]
+        logger.info(f"📥 Loaded {loaded} games to warehouse")
+        return loaded
+
+    def extract_player_sessions(
+        self, since: Optional[Watermark] = None, until: Optional[datetime] = None
+    ) -> Iterator[List[Dict]]:
+        """Extract player sessions (lobby players) from game service in chunks."""
+        if "game_service" not in self.source_conns:
+            raise ValueError("Game service not connected")
+
+        return self.stream_keyset(
+            "game_service",
+            "etl_player_sessions",
+            """
+            SELECT id, "lobbyId", "userId", role, "joinedAt", "isAlive", "isActive", "updatedAt"
+            FROM "LobbyPlayer"
+        """,
+            '"updatedAt"',
+            since,
+            until,
+        )
+
+    def transform_player_sessions(self, sessions: List[Dict]) -> ColumnBatch:
+        """Transform source lobby players to a fact_player_sessions column batch."""
+        source = ColumnBatch.from_rows(
+            sessions, ("id", "lobbyId", "userId", "role", "joinedAt", "isAlive")
+        )
+        return ColumnBatch(
+            {
+                "user_id": source["userId"],
+                "lobby_id": source["lobbyId"],
+                "role_assigned": source["role"],
+                "joined_at": source["joinedAt"],
+                "survived_until_end": [alive or False for alive in source["isAlive"]],
+                "source_session_id": source["id"],
+            }
+        )
+
+    def load_player_sessions(self, sessions: List[Dict]) -> int:
+        """Load player sessions into fact table."""
+        if not sessions:
+            return 0
+
+        transformed = self.timed_transform(self.transform_player_sessions, sessions)
+        transformed = self.timed_transform(
+            partial(self.resolve_keys, "fact_player_sessions"), transformed
+        )
+        self.ensure_partitions_for("fact_player_sessions", transformed)
+        if self.load_methods["fact_player_sessions"] == "copy":
+            stats = self.merge_rows(
+                "fact_player_sessions",
+                "source_session_id",
+                FACT_PLAYER_SESSIONS_COLUMNS,
+                ("role_assigned", "survived_until_end"),
+                transformed,
+                conflict_key=("source_session_id", "joined_at"),
+            )
+            self.record_stats(stats)
+            loaded = stats["inserted"] + stats["updated"]
+        else:
+            loaded = self.write_rows(
+                "fact_player_sessions",
+                FACT_PLAYER_SESSIONS_COLUMNS,
+                transformed,
+                "batch",
+                on_conflict="""
+                    ON CONFLICT (source_session_id, joined_at) DO UPDATE SET
+                        role_assigned = EXCLUDED.role_assigned,
+                        role_id = EXCLUDED.role_id,
+                        survived_until_end = EXCLUDED.survived_until_end,
+                        etl_loaded_at = now()
+                """,
+            )
+
+        self.record_touched("fact_player_sessions", transformed)
+        self.refresh_games(column_values(transformed, "lobby_id"))
+        logger.info(f"📥 Loaded {loaded} player sessions to warehouse")
+        return loaded
+
+    def extract_game_actions(
+        self, since: Optional[Watermark] = None, until: Optional[datetime] = None
+    ) -> Iterator[List[Dict]]:
+        """Extract votes with their day/night cycle from game service in chunks.
+
+        The LobbyTimeCycle columns ("cycleNumber", "timeCycle") follow the
+        Lobby API fields of the same names; the table itself is not
+        documented.
+        """
+        if "game_service" not in self.source_conns:
             raise ValueError("Game service not connected")
 
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            if since:
+        return self.stream_keyset(
+            "game_service",
+            "etl_game_actions",
+            """
+            SELECT * FROM (
+                SELECT v.id, v."lobbyId", v."voterId", v."targetId",
+                       v."lobbyTimeCycleId", v."createdAt",
+                       c."cycleNumber", c."timeCycle"
+                FROM "Vote" v
+                LEFT JOIN "LobbyTimeCycle" c ON c.id = v."lobbyTimeCycleId"
+            ) v
+        """,
+            '"createdAt"',
+            since,
+            until,
+        )
+
+    def lookup_cycles(self, votes: List[Dict]):
+        """Fill in the cycle of votes that arrived without it (CDC rows).
+
+        Change rows only carry the Vote columns, so their cycles are read
+        by primary key in one query per chunk, on a lookup connection of
+        their own: committing the streaming source connection would close
+        any server-side cursor open on it.
+        """
+        ids = list({v["lobbyTimeCycleId"] for v in votes if v.get("lobbyTimeCycleId")})
+        cycles = {}
+        if ids:
+            if "game_service" not in self.lookup_conns:
+                self.lookup_conns["game_service"] = self.connect("game_service")
+            conn = self.lookup_conns["game_service"]
+            with conn.cursor() as cur:
                 cur.execute(
                     """
-                    SELECT id, "lobbyId", "userId", role, "joinedAt", "isAlive", "isActive", "updatedAt"
-                    FROM "LobbyPlayer"
-                    WHERE "updatedAt" > %s
-                    ORDER BY "updatedAt"
+                    SELECT id, "cycleNumber", "timeCycle"
+                    FROM "LobbyTimeCycle"
+                    WHERE id = ANY(%s)
                 """,
-                    (since,),
+                    (ids,),
                 )
-            else:
-                cur.execute("""
-                    SELECT id, "lobbyId", "userId", role, "joinedAt", "isAlive", "isActive", "updatedAt"
-                    FROM "LobbyPlayer"
-                    ORDER BY "joinedAt"
-                """)
-
-            sessions = cur.fetchall()
-            logger.info(
-                f"📤 Extracted {len(sessions)} player sessions from game_service"
+                cycles = {row[0]: row[1:] for row in cur.fetchall()}
+            conn.commit()
+        for vote in votes:
+            vote["cycleNumber"], vote["timeCycle"] = cycles.get(
+                vote.get("lobbyTimeCycleId"), (None, None)
             )
-            return [dict(s) for s in sessions]
 
-    def load_player_sessions(self, sessions: List[Dict]) -> int:
-        """Load player sessions into fact table."""
-        if not sessions:
+    def transform_game_actions(self, votes: List[Dict]) -> ColumnBatch:
+        """Transform source votes to a fact_game_actions column batch.
+
+        Votes are cast by day; a vote whose cycle is gone keeps cycle 0.
+        """
+        source = ColumnBatch.from_rows(
+            votes,
+            ("id", "lobbyId", "voterId", "targetId", "createdAt", "cycleNumber", "timeCycle"),
+        )
+        return ColumnBatch(
+            {
+                "lobby_id": source["lobbyId"],
+                "cycle_number": [n or 0 for n in source["cycleNumber"]],
+                "cycle_type": [(c or "day").lower() for c in source["timeCycle"]],
+                "actor_user_id": source["voterId"],
+                "target_user_id": source["targetId"],
+                "action_type": ["vote"] * len(source),
+                "occurred_at": source["createdAt"],
+                "source_action_id": source["id"],
+            }
+        )
+
+    def load_game_actions(self, votes: List[Dict]) -> int:
+        """Load game actions into fact table and re-derive session statistics."""
+        if not votes:
             return 0
 
-        # Transform to warehouse schema
-        transformed = []
-        for s in sessions:
-            transformed.append(
-                {
-                    "user_id": s["userId"],
-                    "lobby_id": s["lobbyId"],
-                    "role_assigned": s.get("role"),
-                    "joined_at": s["joinedAt"],
-                    "survived_until_end": s.get("isAlive", False),
-                }
+        missing = [v for v in votes if "cycleNumber" not in v]
+        if missing:
+            self.lookup_cycles(missing)
+        transformed = self.timed_transform(self.transform_game_actions, votes)
+        self.ensure_partitions_for("fact_game_actions", transformed)
+        if self.load_methods["fact_game_actions"] == "copy":
+            stats = self.merge_rows(
+                "fact_game_actions",
+                "source_action_id",
+                FACT_GAME_ACTIONS_COLUMNS,
+                ("target_user_id",),
+                transformed,
+                conflict_key=("source_action_id", "occurred_at"),
+            )
+            self.record_stats(stats)
+            loaded = stats["inserted"] + stats["updated"]
+        else:
+            loaded = self.write_rows(
+                "fact_game_actions",
+                FACT_GAME_ACTIONS_COLUMNS,
+                transformed,
+                "batch",
+                on_conflict="""
+                    ON CONFLICT (source_action_id, occurred_at) DO UPDATE SET
+                        target_user_id = EXCLUDED.target_user_id,
+                        etl_loaded_at = now()
+                """,
             )
 
+        self.refresh_games(column_values(transformed, "lobby_id"))
+        logger.info(f"📥 Loaded {loaded} game actions to warehouse")
+        return loaded
+
+    def recheck_game_actions(self):
+        """Re-read the votes of the last ETL_VOTE_RECHECK_HOURS and apply changes.
+
+        A player changing their vote updates the Vote row in place without
+        moving its createdAt watermark. Recent votes are compared with the
+        warehouse chunk by chunk, and only those whose target changed (or
+        that are missing) are loaded, so games are only re-derived for
+        their lobbies. Logged as its own run without a watermark.
+        """
+        if ETL_VOTE_RECHECK_HOURS <= 0:
+            return
+        since = datetime.utcnow() - timedelta(hours=ETL_VOTE_RECHECK_HOURS)
+        run_id = self.log_etl_start("game_service", "fact_game_actions")
+        self.run_stats = {}
+        checked = 0
+        loaded = 0
+        try:
+            for chunk in self.extract_game_actions((since, "")):
+                checked += len(chunk)
+                with self.warehouse_conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        SELECT source_action_id, target_user_id
+                        FROM fact_game_actions
+                        WHERE source_action_id = ANY(%s) AND occurred_at >= %s
+                    """,
+                        ([v["id"] for v in chunk], since),
+                    )
+                    targets = dict(cur.fetchall())
+                self.warehouse_conn.commit()
+                changed = [
+                    v
+                    for v in chunk
+                    if v["id"] not in targets or targets[v["id"]] != v["targetId"]
+                ]
+                if changed:
+                    loaded += self.load_game_actions(changed)
+            self.log_etl_end(run_id, checked, loaded, "success", stats=self.run_stats)
+            if loaded:
+                logger.info(f"🗳️ Re-checked {checked} recent votes, {loaded} changed")
+        except Exception as e:
+            logger.error(f"❌ Re-check of recent votes failed: {e}")
+            self.warehouse_conn.rollback()
+            self.log_etl_end(run_id, checked, loaded, "failed", error=str(e))
+
+    def refresh_games(self, lobby_ids: List[str]):
+        """Re-derive the game statistics of the given lobbies in the warehouse.
+
+        Four set-based statements in one transaction: sessions and actions
+        are linked to their game (a session to the first game of its lobby
+        still running when the player joined, an action to the last game
+        started before it), then every game gets its duration, player count
+        and winner faction, and every session its is_winner, actions_taken
+        and votes_cast. Rows are only rewritten when a value changed, and
+        rewritten rows get a new etl_loaded_at so cold storage re-exports
+        their month.
+
+        A finished game is won by the citizens when no mafia survived, by
+        the mafia when survivors are at least half mafia, else it is a draw.
+        """
+        if self.defer_game_refresh or not lobby_ids:
+            return
+
+        faction = (
+            "CASE WHEN UPPER(s.role_assigned) = ANY(%(mafia)s) "
+            "THEN 'mafia' ELSE 'citizens' END"
+        )
+        params = {"lobbies": list(set(lobby_ids)), "mafia": MAFIA_ROLES}
         with self.warehouse_conn.cursor() as cur:
-            insert_sql = """
-                INSERT INTO fact_player_sessions 
-                    (user_id, lobby_id, role_assigned, joined_at, survived_until_end)
-                VALUES (%(user_id)s, %(lobby_id)s, %(role_assigned)s, %(joined_at)s, %(survived_until_end)s)
-            """
-            execute_batch(cur, insert_sql, transformed, page_size=100)
+            cur.execute(
+                """
+                UPDATE fact_player_sessions s
+                SET game_id = m.game_id, etl_loaded_at = now()
+                FROM (
+                    SELECT DISTINCT ON (s.session_id, s.joined_at)
+                           s.session_id, s.joined_at, g.game_id
+                    FROM fact_player_sessions s
+                    JOIN fact_games g
+                      ON g.lobby_id = s.lobby_id
+                     AND COALESCE(g.end_time, 'infinity') >= s.joined_at
+                    WHERE s.lobby_id = ANY(%(lobbies)s)
+                    ORDER BY s.session_id, s.joined_at, g.start_time
+                ) m
+                WHERE s.lobby_id = ANY(%(lobbies)s)
+                  AND s.session_id = m.session_id
+                  AND s.joined_at = m.joined_at
+                  AND s.game_id IS DISTINCT FROM m.game_id
+            """,
+                params,
+            )
+            cur.execute(
+                """
+                UPDATE fact_game_actions a
+                SET game_id = m.game_id, etl_loaded_at = now()
+                FROM (
+                    SELECT DISTINCT ON (a.action_id, a.occurred_at)
+                           a.action_id, a.occurred_at, g.game_id
+                    FROM fact_game_actions a
+                    JOIN fact_games g
+                      ON g.lobby_id = a.lobby_id AND g.start_time <= a.occurred_at
+                    WHERE a.lobby_id = ANY(%(lobbies)s)
+                    ORDER BY a.action_id, a.occurred_at, g.start_time DESC
+                ) m
+                WHERE a.lobby_id = ANY(%(lobbies)s)
+                  AND a.action_id = m.action_id
+                  AND a.occurred_at = m.occurred_at
+                  AND a.game_id IS DISTINCT FROM m.game_id
+            """,
+                params,
+            )
+            cur.execute(
+                f"""
+                UPDATE fact_games g
+                SET duration_minutes = p.duration_minutes,
+                    total_players = p.total_players,
+                    winner_faction = p.winner_faction,
+                    etl_loaded_at = now()
+                FROM (
+                    SELECT game_id,
+                           (EXTRACT(EPOCH FROM end_time - start_time) / 60)::INTEGER
+                               AS duration_minutes,
+                           players AS total_players,
+                           CASE
+                               WHEN end_time IS NULL THEN NULL
+                               WHEN mafia_alive = 0 AND citizens_alive > 0 THEN 'citizens'
+                               WHEN mafia_alive > 0 AND mafia_alive >= citizens_alive
+                                   THEN 'mafia'
+                               ELSE 'draw'
+                           END AS winner_faction
+                    FROM (
+                        SELECT g.game_id, g.start_time, g.end_time,
+                               COUNT(s.session_id) AS players,
+                               COUNT(*) FILTER (
+                                   WHERE s.survived_until_end AND {faction} = 'mafia'
+                               ) AS mafia_alive,
+                               COUNT(*) FILTER (
+                                   WHERE s.survived_until_end AND {faction} = 'citizens'
+                               ) AS citizens_alive
+                        FROM fact_games g
+                        LEFT JOIN fact_player_sessions s
+                          ON s.game_id = g.game_id AND s.lobby_id = g.lobby_id
+                        WHERE g.lobby_id = ANY(%(lobbies)s)
+                        GROUP BY g.game_id, g.start_time, g.end_time
+                    ) counts
+                ) p
+                WHERE g.game_id = p.game_id
+                  AND (g.duration_minutes, g.total_players, g.winner_faction)
+                      IS DISTINCT FROM (p.duration_minutes, p.total_players, p.winner_faction)
+                RETURNING g.start_time
+            """,
+                params,
+            )
+            games = cur.fetchall()
+            cur.execute(
+                f"""
+                UPDATE fact_player_sessions s
+                SET is_winner = m.is_winner,
+                    actions_taken = m.actions_taken,
+                    votes_cast = m.votes_cast,
+                    etl_loaded_at = now()
+                FROM (
+                    SELECT s.session_id, s.joined_at,
+                           CASE WHEN g.winner_faction IS NULL THEN NULL
+                                ELSE g.winner_faction = {faction}
+                           END AS is_winner,
+                           COALESCE(a.actions, 0) AS actions_taken,
+                           COALESCE(a.votes, 0) AS votes_cast
+                    FROM fact_player_sessions s
+                    JOIN fact_games g ON g.game_id = s.game_id
+                    LEFT JOIN (
+                        SELECT game_id, actor_user_id,
+                               COUNT(*) AS actions,
+                               COUNT(*) FILTER (WHERE action_type = 'vote') AS votes
+                        FROM fact_game_actions
+                        WHERE lobby_id = ANY(%(lobbies)s) AND game_id IS NOT NULL
+                        GROUP BY game_id, actor_user_id
+                    ) a ON a.game_id = s.game_id AND a.actor_user_id = s.user_id
+                    WHERE s.lobby_id = ANY(%(lobbies)s)
+                ) m
+                WHERE s.lobby_id = ANY(%(lobbies)s)
+                  AND s.session_id = m.session_id
+                  AND s.joined_at = m.joined_at
+                  AND (s.is_winner, s.actions_taken, s.votes_cast)
+                      IS DISTINCT FROM (m.is_winner, m.actions_taken, m.votes_cast)
+                RETURNING s.joined_at
+            """,
+                params,
+            )
+            sessions = cur.fetchall()
             self.warehouse_conn.commit()
 
-        logger.info(f"📥 Loaded {len(transformed)} player sessions to warehouse")
-        return len(transformed)
+        # Player counts and wins feed the daily lobby and role rollups
+        self.record_touched("fact_games", [{"start_time": r[0]} for r in games])
+        self.record_touched(
+            "fact_player_sessions", [{"joined_at": r[0]} for r in sessions]
+        )
+
+    def refresh_all_games(self):
+        """Re-derive the statistics of every game, a batch of lobbies at a time."""
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute("SELECT DISTINCT lobby_id FROM fact_games")
+            lobby_ids = [row[0] for row in cur.fetchall()]
+        self.warehouse_conn.commit()
+        for i in range(0, len(lobby_ids), self.batch_size):
+            self.refresh_games(lobby_ids[i : i + self.batch_size])
+        logger.info(f"🎲 Refreshed game statistics of {len(lobby_ids)} lobbies")
 
     # =========================================
     # ORCHESTRATION
     # =========================================
 
-    def run_user_service_etl(self, full_load: bool = False):
-        """Run ETL for user management service."""
-        logger.info("🚀 Starting User Service ETL...")
+    def run_table_etl(
+        self,
+        source: str,
+        table: str,
+        extract: Callable[..., Iterator[List[Dict]]],
+        load: Callable[[List[Dict]], int],
+        watermark_column: str,
+        full_load: bool = False,
+        resume_from: Optional[Tuple[int, Optional[Watermark]]] = None,
+        shard: Optional[Dict[str, Any]] = None,
+    ):
+        """Run a streaming extract -> transform -> load job for one table.
+
+        Every chunk is loaded and committed on its own, and the
+        (timestamp, id) watermark is checkpointed from the last row of
+        each chunk so a failure part way through only loses the chunk in
+        flight. Incremental runs start ETL_WATERMARK_OVERLAP_SECONDS before
+        the watermark and skip rows the previous run already loaded, so
+        rows committed late with an earlier timestamp are not lost.
 
-        # Connect to source
-        self.connect_source("user_service")
+        With a pipeline_depth, chunks are extracted on a separate thread
+        while earlier ones are loaded, so a run takes about as long as the
+        slower of the two stages rather than their sum.
+
+        `resume_from` is (run_id, checkpoint) of an earlier run to continue
+        after; full loads pick up a recent unfinished full load by default.
+        `shard` limits the run to one backfill time range (parent_run_id,
+        range_start, range_end); shard runs do not move the table watermark.
+        With profiling on, the run is profiled by stage (see profiling.py).
+        """
+        if self.profile and self.profiler is None:
+            return self.profile_run(
+                source,
+                table,
+                partial(
+                    self.run_table_etl,
+                    source,
+                    table,
+                    extract,
+                    load,
+                    watermark_column,
+                    full_load,
+                    resume_from,
+                    shard,
+                ),
+            )
 
-        # Users ETL
-        run_id = self.log_etl_start("user_service", "dim_users")
+        with self.profile_stage("bookkeeping"):
+            if (
+                full_load
+                and resume_from is None
+                and shard is None
+                and table not in self.bulk_tables
+            ):
+                resume_from = self.get_resume_checkpoint(source, table)
+        with self.profile_stage("load"):
+            self.key_cache.warm(
+                self.warehouse_conn,
+                [dimension for _, dimension, _ in FACT_DIMENSION_REFS.get(table, ())],
+            )
+        with self.profile_stage("bookkeeping"):
+            run_id = self.log_etl_start(
+                source, table, full_load, resume_from[0] if resume_from else None, shard
+            )
+            watermark = None if shard else self.get_last_etl_watermark(source, table)
+        if self.profiler:
+            self.profiler.run_id = run_id
+        run_started = time.perf_counter()
+        self.run_stats = {}
+        extracted = 0
+        loaded = 0
+        skipped = 0
+        capped = False
+        overlap = timedelta(seconds=ETL_WATERMARK_OVERLAP_SECONDS)
+        # (id, timestamp) keys of the rows inside the overlap window
+        window = deque()
+        resumed = bool(resume_from and resume_from[1])
+        prefetcher = None
         try:
-            since = (
-                None
-                if full_load
-                else self.get_last_etl_timestamp("user_service", "dim_users")
-            )
-            users = self.extract_users(since)
-            loaded = self.load_users(users)
-            last_ts = users[-1]["updatedAt"] if users else datetime.utcnow()
-            self.log_etl_end(run_id, len(users), loaded, "success", last_ts)
+            since = None
+            seen: Set[Tuple[str, datetime]] = set()
+            if resumed:
+                # Chunks up to the checkpoint are committed, and loads are
+                # idempotent, so no overlap window is needed
+                since = watermark = resume_from[1]
+                logger.info(
+                    f"↩️ Resuming {table} from run {resume_from[0]} after {since[0]}"
+                )
+            elif shard:
+                since = (shard["range_start"], "")
+            elif watermark and not full_load:
+                since = (watermark[0] - overlap, "")
+                with self.profile_stage("bookkeeping"):
+                    seen = self.get_overlap_keys(source, table)
+
+            chunks = extract(since, shard["range_end"] if shard else None)
+            if self.profiler:
+                chunks = self.profiler.iterate("extract", chunks)
+            if self.pipeline_depth > 0:
+                chunks = prefetcher = ChunkPrefetcher(
+                    chunks,
+                    self.pipeline_depth,
+                    partial(metrics.observe_stage, source, table, "extract"),
+                    name=f"etl-extract-{table}",
+                )
+            while True:
+                started = time.perf_counter()
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                if prefetcher:
+                    metrics.observe_stage(
+                        source, table, "extract_wait", prefetcher.wait_seconds
+                    )
+                else:
+                    metrics.observe_stage(
+                        source, table, "extract", time.perf_counter() - started
+                    )
+
+                fresh = [r for r in chunk if (r["id"], r[watermark_column]) not in seen]
+                chunk_loaded = (
+                    self.timed_load(source, table, load, fresh) if fresh else 0
+                )
+                metrics.observe_chunk(
+                    source, table, len(chunk), chunk_loaded, len(chunk) - len(fresh)
+                )
+                skipped += len(chunk) - len(fresh)
+                loaded += chunk_loaded
+                extracted += len(chunk)
+
+                last = chunk[-1]
+                watermark = (last[watermark_column], last["id"])
+                window.extend((r["id"], r[watermark_column]) for r in chunk)
+                while window[0][1] < watermark[0] - overlap:
+                    window.popleft()
+                with self.profile_stage("bookkeeping"):
+                    self.log_etl_progress(run_id, extracted, loaded, watermark)
+
+                if not full_load and self.max_rows and extracted >= self.max_rows:
+                    capped = True
+                    break
+
+            if capped:
+                # Close the server-side cursor and end its source transaction
+                chunks.close()
+                self.source_conns[source].commit()
+                logger.info(
+                    f"⏸️ {table} stopped after {extracted} rows (max rows per run), "
+                    "the rest is left for the next run"
+                )
+            with self.profile_stage("bookkeeping"):
+                if window and not shard:
+                    self.save_overlap_keys(source, table, list(window))
+                self.log_etl_end(
+                    run_id,
+                    extracted,
+                    loaded,
+                    "success",
+                    watermark,
+                    stats=self.run_stats,
+                )
+            if skipped:
+                logger.info(f"🔁 Skipped {skipped} {table} rows already loaded")
+            metrics.observe_run(
+                source,
+                table,
+                "success",
+                time.perf_counter() - run_started,
+                extracted,
+                watermark[0] if watermark else None,
+            )
+            status = "success"
         except Exception as e:
-            logger.error(f"❌ User ETL failed: {e}")
-            self.log_etl_end(run_id, 0, 0, "failed", error=str(e))
+            logger.error(f"❌ {table} ETL failed: {e}")
+            metrics.observe_run(
+                source, table, "failed", time.perf_counter() - run_started, extracted
+            )
+            self.warehouse_conn.rollback()
+            with self.profile_stage("bookkeeping"):
+                if window and not shard:
+                    self.save_overlap_keys(source, table, list(window))
+                self.log_etl_end(
+                    run_id,
+                    extracted,
+                    loaded,
+                    "failed",
+                    watermark if extracted or resumed else None,
+                    error=str(e),
+                    stats=self.run_stats,
+                )
+            status = "failed"
+        finally:
+            if prefetcher:
+                prefetcher.close()
 
-        # Transactions ETL
-        run_id = self.log_etl_start("user_service", "fact_transactions")
+        self.job_results[table] = {
+            "run_id": run_id,
+            "status": status,
+            "extracted": extracted,
+            "loaded": loaded,
+            "new_rows": extracted - skipped,
+            "capped": capped,
+            "watermark": watermark,
+            "stats": dict(self.run_stats),
+        }
+
+    def profile_run(self, source: str, table: str, run: Callable[[], None]):
+        """Run a table run under a RunProfiler and write its artifacts.
+
+        The run's warehouse and source connections time their statements
+        while it lasts; artifacts are written even when the run raises.
+        """
+        self.profiler = RunProfiler(source, table)
+        self.profiler.attach(
+            {"warehouse": self.warehouse_conn, source: self.source_conns[source]}
+        )
+        status = "failed"
         try:
-            since = (
-                None
-                if full_load
-                else self.get_last_etl_timestamp("user_service", "fact_transactions")
-            )
-            transactions = self.extract_transactions(since)
-            loaded = self.load_transactions(transactions)
-            last_ts = (
-                transactions[-1]["createdAt"] if transactions else datetime.utcnow()
+            run()
+            status = self.job_results[table]["status"]
+        finally:
+            profiler, self.profiler = self.profiler, None
+            profiler.detach()
+            try:
+                profiler.write(status)
+            except OSError as e:
+                logger.warning(f"⚠️ Could not write the {table} run profile: {e}")
+
+    def acquire_job_lock(self, name: str, wait: bool = False) -> bool:
+        """Take the warehouse advisory lock of a table job.
+
+        The lock is session-level, so it survives the per-chunk commits and
+        must be released with release_job_lock.
+        """
+        function = "pg_advisory_lock" if wait else "pg_try_advisory_lock"
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                f"SELECT {function}(%s, hashtext(%s))", (ETL_LOCK_NAMESPACE, name)
             )
-            self.log_etl_end(run_id, len(transactions), loaded, "success", last_ts)
-        except Exception as e:
-            logger.error(f"❌ Transactions ETL failed: {e}")
-            self.log_etl_end(run_id, 0, 0, "failed", error=str(e))
+            acquired = wait or cur.fetchone()[0]
+        self.warehouse_conn.commit()
+        return acquired
 
-        logger.info("✅ User Service ETL completed")
+    def release_job_lock(self, name: str):
+        """Release a table job's advisory lock."""
+        try:
+            with self.warehouse_conn.cursor() as cur:
+                cur.execute(
+                    "SELECT pg_advisory_unlock(%s, hashtext(%s))",
+                    (ETL_LOCK_NAMESPACE, name),
+                )
+            self.warehouse_conn.commit()
+        except psycopg2.Error as e:
+            # A broken connection is discarded (and its locks freed) by the pool
+            logger.warning(f"⚠️ Could not release {name} job lock: {e}")
 
-    def run_game_service_etl(self, full_load: bool = False):
-        """Run ETL for game service."""
-        logger.info("🚀 Starting Game Service ETL...")
+    def run_job(
+        self,
+        name: str,
+        full_load: bool = False,
+        resume_from: Optional[Tuple[int, Optional[Watermark]]] = None,
+    ):
+        """Run a table job from TABLE_JOBS under its warehouse advisory lock.
 
-        # Connect to source
-        self.connect_source("game_service")
+        Incremental runs skip a job that another run is loading; full
+        loads and resumed runs wait for it to finish.
+        """
+        job = TABLE_JOBS[name]
+        if not self.acquire_job_lock(name, wait=full_load or resume_from is not None):
+            logger.info(f"⏭️ {name} is being loaded by another run, skipping")
+            self.job_results[name] = {"status": "locked", "new_rows": 0, "capped": False}
+            return
 
-        # Lobbies ETL
-        run_id = self.log_etl_start("game_service", "dim_lobbies")
+        bulk = (
+            self.bulk_load
+            and full_load
+            and resume_from is None
+            and name in BULK_LOAD_TABLES
+        )
         try:
-            since = (
-                None
-                if full_load
-                else self.get_last_etl_timestamp("game_service", "dim_lobbies")
-            )
-            lobbies = self.extract_lobbies(since)
-            loaded = self.load_lobbies(lobbies)
-            last_ts = lobbies[-1]["updatedAt"] if lobbies else datetime.utcnow()
-            self.log_etl_end(run_id, len(lobbies), loaded, "success", last_ts)
-        except Exception as e:
-            logger.error(f"❌ Lobbies ETL failed: {e}")
-            self.log_etl_end(run_id, 0, 0, "failed", error=str(e))
+            self.mark_interrupted_runs(job["source"], name)
+            if bulk:
+                self.begin_bulk_load(name)
+            self.run_table_etl(
+                job["source"],
+                name,
+                getattr(self, job["extract"]),
+                getattr(self, job["load"]),
+                job["watermark"],
+                full_load,
+                resume_from,
+            )
+            if (
+                job.get("recheck")
+                and not full_load
+                and self.job_results[name]["status"] == "success"
+            ):
+                getattr(self, job["recheck"])()
+            if bulk:
+                self.complete_bulk_load(name, self.job_results[name])
+        finally:
+            if bulk:
+                self.end_bulk_load(name)
+            self.release_job_lock(name)
+
+    def resume_run(self, run_id: int, backfill_workers: int = ETL_BACKFILL_WORKERS):
+        """Continue a failed or interrupted table run after its last checkpoint.
+
+        Backfill runs resume their unfinished shards.
+        """
+        self.connect_warehouse()
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT source_system, table_name, status, COALESCE(full_load, FALSE),
+                       last_extracted_timestamp, COALESCE(last_extracted_id, ''),
+                       shard_count, parent_run_id
+                FROM etl_run_log
+                WHERE run_id = %s
+            """,
+                (run_id,),
+            )
+            result = cur.fetchone()
+        self.warehouse_conn.commit()
+        if not result:
+            raise ValueError(f"Unknown ETL run: {run_id}")
 
-        # Player Sessions ETL
-        run_id = self.log_etl_start("game_service", "fact_player_sessions")
+        source, table, status, full_load, last_timestamp, last_id = result[:6]
+        shard_count, parent_run_id = result[6:]
+        if table not in TABLE_JOBS:
+            raise ValueError(f"Run {run_id} ({table}) is not a table job run")
+        if status == "success":
+            raise ValueError(f"Run {run_id} ({table}) already completed")
+        if parent_run_id:
+            raise ValueError(
+                f"Run {run_id} is a shard of backfill run {parent_run_id}; "
+                "resume that run instead"
+            )
+
+        if shard_count is not None:
+            self.backfill_table(table, backfill_workers, resume_parent=run_id)
+        else:
+            checkpoint = (last_timestamp, last_id) if last_timestamp else None
+            self.connect_source(source)
+            self.run_job(table, full_load, resume_from=(run_id, checkpoint))
+        self.refresh_rollups()
+
+    def run_isolated_job(self, name: str, full_load: bool = False):
+        """Run a table job on a dedicated pipeline with its own connections."""
+        pipeline = ETLPipeline(
+            batch_size=self.batch_size,
+            load_methods=self.load_methods,
+            workers=1,
+            pools=self.pools,
+            max_rows=self.max_rows,
+            key_cache=self.key_cache,
+            pipeline_depth=self.pipeline_depth,
+            bulk_load=self.bulk_load,
+            profile=self.profile,
+        )
         try:
-            since = (
-                None
-                if full_load
-                else self.get_last_etl_timestamp("game_service", "fact_player_sessions")
-            )
-            sessions = self.extract_player_sessions(since)
-            loaded = self.load_player_sessions(sessions)
-            last_ts = sessions[-1]["updatedAt"] if sessions else datetime.utcnow()
-            self.log_etl_end(run_id, len(sessions), loaded, "success", last_ts)
-        except Exception as e:
-            logger.error(f"❌ Player Sessions ETL failed: {e}")
-            self.log_etl_end(run_id, 0, 0, "failed", error=str(e))
+            pipeline.connect_warehouse()
+            pipeline.connect_source(TABLE_JOBS[name]["source"])
+            pipeline.run_job(name, full_load)
+        finally:
+            pipeline.close_connections()
+            self.merge_touched(pipeline.touched_days)
+            self.job_results.update(pipeline.job_results)
+
+    def merge_touched(self, touched_days: Dict[str, Set[date]]):
+        """Fold another pipeline's touched days into this one's."""
+        for table, days in touched_days.items():
+            self.touched_days.setdefault(table, set()).update(days)
+
+    def run_parallel(self, jobs: List[str], full_load: bool = False):
+        """Run table jobs concurrently, respecting their declared dependencies.
 
+        psycopg2 releases the GIL while waiting on the network, so a thread
+        pool is enough to overlap independent jobs. A job whose dependency
+        failed still runs, matching the sequential behaviour.
+        """
+        pending = {
+            name: set(TABLE_JOBS[name]["depends_on"]) & set(jobs) for name in jobs
+        }
+        finished = set()
+        running = {}
+
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="etl-job"
+        ) as pool:
+            while pending or running:
+                for name in [n for n, deps in pending.items() if deps <= finished]:
+                    del pending[name]
+                    future = pool.submit(self.run_isolated_job, name, full_load)
+                    running[future] = name
+
+                if not running:
+                    raise ValueError(f"Circular job dependencies: {sorted(pending)}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.error(f"❌ {name} job failed: {e}")
+                    finished.add(name)
+
+    def run_source_etl(self, source: str, full_load: bool = False):
+        """Run every table job of one source sequentially."""
+        self.connect_source(source)
+        for name, job in TABLE_JOBS.items():
+            if job["source"] == source:
+                self.run_job(name, full_load)
+
+    def run_user_service_etl(self, full_load: bool = False):
+        """Run ETL for user management service."""
+        logger.info("🚀 Starting User Service ETL...")
+        self.run_source_etl("user_service", full_load)
+        logger.info("✅ User Service ETL completed")
+
+    def run_game_service_etl(self, full_load: bool = False):
+        """Run ETL for game service."""
+        logger.info("🚀 Starting Game Service ETL...")
+        self.run_source_etl("game_service", full_load)
         logger.info("✅ Game Service ETL completed")
 
-    def run_all(self, full_load: bool = False):
-        """Run ETL for all sources."""
+    def run_all(self, full_load: bool = False, sources: Optional[List[str]] = None):
+        """Run ETL for all sources (or the given ones)."""
+        sources = sources or ["user_service", "game_service"]
+        self.job_results = {}
+        cache_before = self.key_cache.stats()
+
         logger.info("=" * 60)
-        logger.info(f"🏁 Starting full ETL pipeline (full_load={full_load})")
+        logger.info(
+            f"🏁 Starting full ETL pipeline (full_load={full_load}, "
+            f"workers={self.workers})"
+        )
         logger.info("=" * 60)
 
-        self.connect_warehouse()
+        if self.workers > 1:
+            jobs = [n for n, job in TABLE_JOBS.items() if job["source"] in sources]
+            self.run_parallel(jobs, full_load)
+        else:
+            self.connect_warehouse()
+            try:
+                for source in sources:
+                    logger.info(f"🚀 Starting {source} ETL...")
+                    self.run_source_etl(source, full_load)
+                    logger.info(f"✅ {source} ETL completed")
+            finally:
+                self.close_connections()
 
+        self.connect_warehouse()
         try:
-            self.run_user_service_etl(full_load)
-            self.run_game_service_etl(full_load)
+            self.refresh_rollups()
+        except Exception as e:
+            logger.error(f"❌ Rollup refresh failed: {e}")
+            self.warehouse_conn.rollback()
         finally:
             self.close_connections()
 
+        for dimension, stats in self.key_cache.stats().items():
+            hits = stats["hits"] - cache_before[dimension]["hits"]
+            lookups = hits + stats["misses"] - cache_before[dimension]["misses"]
+            if lookups:
+                logger.info(
+                    f"🔑 {dimension} key cache: {hits / lookups:.1%} hits "
+                    f"of {lookups} lookups, {stats['size']} keys cached"
+                )
+
         logger.info("=" * 60)
         logger.info("🎉 ETL pipeline completed successfully")
         logger.info("=" * 60)
 
+    # =========================================
+    # ROLLUPS
+    # =========================================
 
-def main():
-    parser = argparse.ArgumentParser(description="Mafia Platform Data Warehouse ETL")
-    parser.add_argument(
-        "--source",
-        choices=["user_service", "game_service", "all"],
-        default="all",
-        help="Source to extract from",
-    )
-    parser.add_argument(
-        "--full-load",
-        action="store_true",
+    def ensure_time_dimension(self, days: Set[date]):
+        """Add dim_time rows for any of the given dates that are missing."""
+        known = self.key_cache.get_many(self.warehouse_conn, "dim_time", list(days))
+        days = set(days) - set(known)
+        if not days:
+            self.warehouse_conn.commit()
+            return
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO dim_time (full_date, year, quarter, month, week,
+                                      day_of_week, day_of_month, is_weekend)
+                SELECT d, EXTRACT(YEAR FROM d), EXTRACT(QUARTER FROM d),
+                       EXTRACT(MONTH FROM d), EXTRACT(WEEK FROM d),
+                       EXTRACT(DOW FROM d), EXTRACT(DAY FROM d),
+                       EXTRACT(DOW FROM d) IN (0, 6)
+                FROM unnest(%s::date[]) AS d
+                ON CONFLICT (full_date) DO NOTHING
+            """,
+                (sorted(days),),
+            )
+        self.warehouse_conn.commit()
+
+    def refresh_rollups(self, touched_days: Optional[Dict[str, Set[date]]] = None):
+        """Re-aggregate the rollup rows of the days touched by loaded facts.
+
+        Each rollup is refreshed in one transaction (delete the touched
+        days, re-insert them, clear them from etl_rollup_pending), so
+        readers never see a partial day. The transaction holds the rollup's
+        advisory lock, so concurrent refreshes of the same rollup (the
+        scheduler's and a manual one) take turns instead of inserting the
+        same days twice. Each refresh is logged as a 'warehouse' run in
+        etl_run_log so readers caching rollup queries know when to drop
+        them. Days left pending by a failed refresh are picked up again by
+        the next call.
+        """
+        touched_days = self.touched_days if touched_days is None else touched_days
+        pending = self.pending_rollup_days()
+        rollup_days = {
+            rollup: touched_days.get(spec["fact"], set()) | pending.get(rollup, set())
+            for rollup, spec in ROLLUPS.items()
+        }
+        all_days = set().union(*rollup_days.values())
+        if not all_days:
+            self.touched_days = {}
+            return
+        self.ensure_time_dimension(all_days)
+
+        for rollup, spec in ROLLUPS.items():
+            days = sorted(rollup_days[rollup])
+            if not days:
+                continue
+            params = {
+                "rollup": rollup,
+                "days": days,
+                "start": days[0],
+                "end": days[-1] + timedelta(days=1),
+            }
+            run_id = self.log_etl_start("warehouse", rollup)
+            try:
+                with self.warehouse_conn.cursor() as cur:
+                    cur.execute(
+                        "SELECT pg_advisory_xact_lock(%s, hashtext(%s))",
+                        (ETL_LOCK_NAMESPACE, rollup),
+                    )
+                    cur.execute(
+                        f"""
+                        DELETE FROM {rollup}
+                        WHERE time_id IN (
+                            SELECT time_id FROM dim_time WHERE full_date = ANY(%(days)s)
+                        )
+                    """,
+                        params,
+                    )
+                    cur.execute(spec["query"], params)
+                    rows = cur.rowcount
+                    cur.execute(
+                        """
+                        DELETE FROM etl_rollup_pending
+                        WHERE rollup_table = %(rollup)s AND day = ANY(%(days)s)
+                    """,
+                        params,
+                    )
+                self.warehouse_conn.commit()
+            except Exception as e:
+                self.warehouse_conn.rollback()
+                self.log_etl_end(run_id, 0, 0, "failed", error=str(e))
+                raise
+            self.log_etl_end(run_id, 0, rows, "success")
+            logger.info(f"📊 Refreshed {rollup} for {len(days)} day(s)")
+
+        self.touched_days = {}
+
+    def rebuild_rollups(self):
+        """Rebuild every rollup over the full date range of its facts."""
+        touched = {}
+        for table in {spec["fact"] for spec in ROLLUPS.values()}:
+            column = FACT_TIME_COLUMNS[table]
+            with self.warehouse_conn.cursor() as cur:
+                cur.execute(f"SELECT MIN({column})::date, MAX({column})::date FROM {table}")
+                low, high = cur.fetchone()
+            self.warehouse_conn.commit()
+            if low:
+                touched[table] = {
+                    low + timedelta(days=i) for i in range((high - low).days + 1)
+                }
+        self.refresh_rollups(touched)
+
+    # =========================================
+    # MAINTENANCE
+    # =========================================
+
+    def compact_facts(self, tables: Optional[List[str]] = None) -> Dict[str, int]:
+        """Delete duplicate legacy fact rows in short, id-ranged batches.
+
+        Rows without a source id (loaded before idempotent fact loads) are
+        removed when a keyed row with the same natural key exists, or when
+        another legacy copy is kept instead. Each batch of `batch_size` ids
+        is its own transaction, so only row locks are held and concurrent
+        reads and loads keep running.
+        """
+        removed = {}
+        for table in tables or list(FACT_COMPACTION):
+            spec = FACT_COMPACTION[table]
+            id_col, source_key = spec["id"], spec["source_key"]
+            match = " AND ".join(f"d.{c} = t.{c}" for c in spec["natural_key"])
+            newer = "<" if spec["keep"] == "first" else ">"
+
+            with self.warehouse_conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT MIN({id_col}), MAX({id_col}) FROM {table} "
+                    f"WHERE {source_key} IS NULL"
+                )
+                low, high = cur.fetchone()
+            self.warehouse_conn.commit()
+
+            removed[table] = 0
+            while low is not None and low <= high:
+                with self.warehouse_conn.cursor() as cur:
+                    cur.execute(
+                        f"""
+                        DELETE FROM {table} t
+                        WHERE t.{source_key} IS NULL
+                          AND t.{id_col} BETWEEN %s AND %s
+                          AND EXISTS (
+                              SELECT 1 FROM {table} d
+                              WHERE {match}
+                                AND (d.{source_key} IS NOT NULL
+                                     OR d.{id_col} {newer} t.{id_col})
+                          )
+                    """,
+                        (low, low + self.batch_size - 1),
+                    )
+                    removed[table] += cur.rowcount
+                self.warehouse_conn.commit()
+                low += self.batch_size
+
+            logger.info(f"🧹 Removed {removed[table]} duplicate rows from {table}")
+        return removed
+
+    def apply_schema(self):
+        """Apply schema.sql (idempotent) to the warehouse."""
+        with open(SCHEMA_PATH) as f:
+            schema = f.read()
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(schema)
+        self.warehouse_conn.commit()
+
+    # =========================================
+    # PARTITION MANAGEMENT
+    # =========================================
+
+    def list_partitions(self, table: str) -> Optional[Set[date]]:
+        """Months with an attached partition, or None if not partitioned."""
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,)
+            )
+            row = cur.fetchone()
+            if not row or row[0] != "p":
+                self.warehouse_conn.commit()
+                return None
+            cur.execute(
+                """
+                SELECT c.relname
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = to_regclass(%s)
+            """,
+                (table,),
+            )
+            names = [r[0] for r in cur.fetchall()]
+        self.warehouse_conn.commit()
+
+        months = set()
+        for name in names:
+            suffix = name[len(table) + 2 :]
+            if name.startswith(f"{table}_p") and suffix.isdigit():
+                months.add(date(int(suffix[:4]), int(suffix[4:]), 1))
+        return months
+
+    def create_partition(self, table: str, month: date):
+        """Create the monthly partition of a fact table if it is missing."""
+        name = partition_name(table, month)
+        with self.warehouse_conn.cursor() as cur:
+            try:
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table}
+                    FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')
+                """)
+                self.warehouse_conn.commit()
+                logger.info(f"🗂️ Created partition {name}")
+            except (psycopg2.errors.DuplicateTable, psycopg2.errors.UniqueViolation):
+                # Created concurrently by another job
+                self.warehouse_conn.rollback()
+
+    def ensure_partitions_for(self, table: str, rows: Rows):
+        """Create any monthly partitions the rows about to be loaded need."""
+        target = self.bulk_tables.get(table, table)
+        if target not in self.partitions:
+            self.partitions[target] = self.list_partitions(target)
+        known = self.partitions[target]
+        if known is None:
+            return
+
+        values = column_values(rows, PARTITIONED_FACTS[table])
+        for month in sorted({month_start(v) for v in values} - known):
+            self.create_partition(target, month)
+            known.add(month)
+
+    def maintain_partitions(
+        self,
+        months_ahead: int = ETL_PARTITION_MONTHS_AHEAD,
+        retention_months: int = ETL_PARTITION_RETENTION_MONTHS,
+        retention_action: str = ETL_PARTITION_RETENTION_ACTION,
+    ):
+        """Create upcoming partitions and retire those past retention.
+
+        Expired partitions are detached CONCURRENTLY (readers and loads are
+        not blocked); with retention_action "drop" they are dropped too,
+        with "archive" they are dropped only once exported to the Parquet
+        cold storage and unchanged since (row count and latest
+        etl_loaded_at match the manifest; others stay attached), otherwise
+        they stay behind as standalone tables for archiving.
+        """
+        if retention_action not in PARTITION_RETENTION_ACTIONS:
+            raise ValueError(f"Unknown partition retention action: {retention_action}")
+        exported = {}
+        if retention_action == "archive" and retention_months > 0:
+            import cold_storage
+
+            exported = cold_storage.ColdStorage(ETL_EXPORT_DIR).load_manifest()
+
+        current = month_start(datetime.utcnow())
+        for table in PARTITIONED_FACTS:
+            known = self.list_partitions(table)
+            if known is None:
+                logger.warning(f"⚠️ {table} is not partitioned; run --migrate-partitions")
+                continue
+
+            for offset in range(months_ahead + 1):
+                month = add_months(current, offset)
+                if month not in known:
+                    self.create_partition(table, month)
+                    known.add(month)
+            self.partitions[table] = known
+
+            if retention_months <= 0:
+                continue
+            cutoff = add_months(current, -retention_months)
+            for month in sorted(m for m in known if m < cutoff):
+                name = partition_name(table, month)
+                if retention_action == "archive":
+                    entry = exported.get(table, {}).get(f"{month:%Y-%m}")
+                    if entry is None:
+                        logger.warning(
+                            f"⚠️ Keeping partition {name}: not exported to cold storage yet"
+                        )
+                        continue
+                    rows, latest = self.month_summary(table, month)
+                    if (rows, latest.isoformat() if latest else None) != (
+                        entry["rows"],
+                        entry["max_loaded_at"],
+                    ):
+                        logger.warning(
+                            f"⚠️ Keeping partition {name}: changed since its cold "
+                            "storage export; run --export-parquet"
+                        )
+                        continue
+                self.warehouse_conn.autocommit = True
+                try:
+                    with self.warehouse_conn.cursor() as cur:
+                        cur.execute(
+                            f"ALTER TABLE {table} DETACH PARTITION {name} CONCURRENTLY"
+                        )
+                        if retention_action in ("drop", "archive"):
+                            cur.execute(f"DROP TABLE {name}")
+                finally:
+                    self.warehouse_conn.autocommit = False
+                known.discard(month)
+                logger.info(f"🗑️ Retired partition {name} ({retention_action})")
+
+    def migrate_to_partitions(self):
+        """Convert legacy unpartitioned fact tables into partitioned ones.
+
+        Each legacy table (and its indexes) is renamed out of the way in one
+        short transaction and schema.sql recreates the partitioned table, so
+        loads continue right away. Existing rows are then copied one month
+        per transaction; the legacy table is dropped once the row counts
+        match, and kept for inspection otherwise.
+        """
+        legacy = []
+        with self.warehouse_conn.cursor() as cur:
+            for table in PARTITIONED_FACTS:
+                cur.execute(
+                    "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+                    (table,),
+                )
+                row = cur.fetchone()
+                if not row or row[0] != "r":
+                    continue
+                cur.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+                cur.execute(
+                    """
+                    SELECT indexname FROM pg_indexes
+                    WHERE schemaname = 'public' AND tablename = %s
+                """,
+                    (f"{table}_legacy",),
+                )
+                for (index,) in cur.fetchall():
+                    cur.execute(f"ALTER INDEX {index} RENAME TO {index}_legacy")
+                legacy.append(table)
+        self.warehouse_conn.commit()
+
+        if not legacy:
+            logger.info("All fact tables are already partitioned")
+            return
+        self.apply_schema()
+        self.partitions = {}
+
+        for table in legacy:
+            column = PARTITIONED_FACTS[table]
+            source = f"{table}_legacy"
+            with self.warehouse_conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT column_name FROM information_schema.columns
+                    WHERE table_schema = 'public' AND table_name = %s
+                    INTERSECT
+                    SELECT column_name FROM information_schema.columns
+                    WHERE table_schema = 'public' AND table_name = %s
+                """,
+                    (source, table),
+                )
+                columns = ", ".join(r[0] for r in cur.fetchall())
+                cur.execute(f"SELECT MIN({column}), MAX({column}), COUNT(*) FROM {source}")
+                low, high, expected = cur.fetchone()
+            self.warehouse_conn.commit()
+
+            month = month_start(low) if low else None
+            while month and month <= month_start(high):
+                self.ensure_partitions_for(table, [{column: month}])
+                with self.warehouse_conn.cursor() as cur:
+                    cur.execute(
+                        f"""
+                        INSERT INTO {table} ({columns})
+                        SELECT {columns} FROM {source}
+                        WHERE {column} >= %s AND {column} < %s
+                    """,
+                        (month, add_months(month, 1)),
+                    )
+                    logger.info(f"📦 Migrated {cur.rowcount} {table} rows for {month:%Y-%m}")
+                self.warehouse_conn.commit()
+                month = add_months(month, 1)
+
+            with self.warehouse_conn.cursor() as cur:
+                id_column = FACT_SURROGATE_KEYS[table]
+                cur.execute(f"SELECT COUNT(*) FROM {table}")
+                migrated = cur.fetchone()[0]
+                if migrated >= expected:
+                    # Keep new surrogate ids above the migrated ones
+                    cur.execute(
+                        f"""
+                        SELECT setval(
+                            pg_get_serial_sequence(%s, %s),
+                            GREATEST((SELECT MAX({id_column}) FROM {table}), 1)
+                        )
+                    """,
+                        (table, id_column),
+                    )
+                    cur.execute(f"DROP TABLE {source}")
+                    logger.info(f"✅ Migrated {table} to monthly partitions")
+                else:
+                    logger.error(
+                        f"❌ {table}: {migrated} of {expected} rows migrated; "
+                        f"keeping {source}"
+                    )
+            self.warehouse_conn.commit()
+
+    # =========================================
+    # RECONCILIATION
+    # =========================================
+
+    def reconcile_queries(self, name: str, buckets: int) -> Dict[str, Tuple[str, str]]:
+        """(range checksum, row hash) queries of a dimension, per side.
+
+        The range query returns (range, rows, checksum), the checksum being
+        the sum of 60 bits of each row's md5. The row query returns
+        (range, key, md5) of the rows in the ranges passed as its
+        parameter, sorted the same way on both sides.
+        """
+        job = TABLE_JOBS[name]
+        spec = RECONCILE_TABLES[name]
+        sides = {
+            "source": ("id", f'"{job["source_table"]}"', None, 0),
+            "warehouse": (job["key"], name, spec["where"], 1),
+        }
+        queries = {}
+        for side, (key, table, where, index) in sides.items():
+            row = reconcile_row_sql(key, [c[index] for c in spec["columns"]])
+            rows = f"""
+                SELECT {reconcile_bucket_sql(key, buckets)} AS bucket,
+                       {key}::text AS key, md5({row}) AS hash
+                FROM {table}
+                {f"WHERE {where}" if where else ""}
+            """
+            queries[side] = (
+                f"""
+                SELECT bucket, COUNT(*),
+                       SUM(('x' || substr(hash, 1, 15))::bit(60)::bigint)
+                FROM ({rows}) r
+                GROUP BY bucket
+            """,
+                f"""
+                SELECT bucket, key, hash FROM ({rows}) r
+                WHERE bucket = ANY(%s)
+                ORDER BY bucket, key COLLATE "C"
+            """,
+            )
+        return queries
+
+    def range_checksums(self, conn, query: str) -> Dict[int, Tuple[int, Any]]:
+        """Run a range checksum query: {range: (rows, checksum)}."""
+        with conn.cursor() as cur:
+            cur.execute(query)
+            checksums = {bucket: (count, total) for bucket, count, total in cur.fetchall()}
+        conn.commit()
+        return checksums
+
+    def stream_row_hashes(
+        self, conn, name: str, query: str, buckets: List[int]
+    ) -> Iterator[Tuple[int, str, str]]:
+        """Stream the (range, key, md5) rows of the given ranges."""
+        with conn.cursor(name=name) as cur:
+            cur.itersize = self.batch_size
+            cur.execute(query, (buckets,))
+            yield from cur
+        conn.commit()
+
+    def diff_row_hashes(
+        self,
+        source_rows: Iterator[Tuple[int, str, str]],
+        warehouse_rows: Iterator[Tuple[int, str, str]],
+    ) -> Dict[str, List[str]]:
+        """Merge two sorted (range, key, md5) streams into the differing keys.
+
+        Returns the keys missing from the warehouse, those whose columns
+        differ, and those missing at the source.
+        """
+        diff = {"missing": [], "changed": [], "deleted": []}
+        src = next(source_rows, None)
+        wh = next(warehouse_rows, None)
+        while src is not None or wh is not None:
+            if wh is None or (src is not None and src[:2] < wh[:2]):
+                diff["missing"].append(src[1])
+                src = next(source_rows, None)
+            elif src is None or wh[:2] < src[:2]:
+                diff["deleted"].append(wh[1])
+                wh = next(warehouse_rows, None)
+            else:
+                if src[2] != wh[2]:
+                    diff["changed"].append(src[1])
+                src = next(source_rows, None)
+                wh = next(warehouse_rows, None)
+        return diff
+
+    def repair_rows(self, name: str, diff: Dict[str, List[str]]) -> Tuple[int, int]:
+        """Re-extract and load the missing and changed rows of a dimension.
+
+        Changed users are stamped with the reconciliation time when their
+        source updatedAt is not newer than the warehouse version, so the
+        Type 2 merge records the correction as a new version instead of
+        ignoring it as a replay. Returns (extracted, loaded).
+        """
+        job = TABLE_JOBS[name]
+        source = job["source"]
+        load = getattr(self, job["load"])
+        changed = set(diff["changed"])
+        keys = diff["missing"] + diff["changed"]
+        now = datetime.utcnow()
+        extracted = loaded = 0
+        for i in range(0, len(keys), self.batch_size):
+            chunks = self.stream_query(
+                source,
+                f"etl_reconcile_{name}",
+                f"SELECT * FROM ({DIM_SOURCE_SELECTS[name]}) s WHERE id::text = ANY(%s)",
+                (keys[i : i + self.batch_size],),
+            )
+            for chunk in chunks:
+                if name == "dim_users":
+                    for row in chunk:
+                        if row["id"] in changed:
+                            row["updatedAt"] = max(row["updatedAt"], now)
+                extracted += len(chunk)
+                loaded += self.timed_load(source, name, load, chunk)
+        return extracted, loaded
+
+    def delete_missing(self, name: str, keys: List[str]) -> int:
+        """Remove warehouse rows whose source rows are gone.
+
+        Keys are checked against the source once more first, so rows
+        inserted while the ranges were compared are kept. dim_users
+        versions are closed rather than deleted (see delete_rows).
+        """
+        job = TABLE_JOBS[name]
+        conn = self.source_conns[job["source"]]
+        deleted = 0
+        for i in range(0, len(keys), self.batch_size):
+            batch = keys[i : i + self.batch_size]
+            with conn.cursor() as cur:
+                cur.execute(
+                    f'SELECT id::text FROM "{job["source_table"]}" WHERE id::text = ANY(%s)',
+                    (batch,),
+                )
+                present = {r[0] for r in cur.fetchall()}
+            conn.commit()
+            gone = [k for k in batch if k not in present]
+            if gone:
+                deleted += self.delete_rows(name, job["key"], gone)
+        return deleted
+
+    def reconcile_table(self, name: str, buckets: int = ETL_RECONCILE_BUCKETS) -> Dict[str, int]:
+        """Compare a dimension with its source table and repair the differences.
+
+        Both databases return one (rows, checksum) pair per hash range of
+        the key, so a check of tables that agree transfers only `buckets`
+        rows per side. Differing ranges are compared row by row through
+        their row hashes, then missing and changed rows are re-extracted
+        and loaded, and rows gone from the source are deleted (or closed).
+        """
+        job = TABLE_JOBS[name]
+        source = job["source"]
+        source_conn = self.source_conns[source]
+        run_id = self.log_etl_start(source, name)
+        self.run_stats = {}
+        started = time.perf_counter()
+        extracted = loaded = 0
+        result = {"ranges": 0, "differing": 0, "missing": 0, "changed": 0, "deleted": 0}
+        try:
+            queries = self.reconcile_queries(name, buckets)
+            source_sums = self.range_checksums(source_conn, queries["source"][0])
+            warehouse_sums = self.range_checksums(
+                self.warehouse_conn, queries["warehouse"][0]
+            )
+            ranges = set(source_sums) | set(warehouse_sums)
+            differing = sorted(
+                b for b in ranges if source_sums.get(b) != warehouse_sums.get(b)
+            )
+            result["ranges"] = len(ranges)
+            result["differing"] = len(differing)
+
+            if differing:
+                diff = self.diff_row_hashes(
+                    self.stream_row_hashes(
+                        source_conn, f"etl_reconcile_{name}", queries["source"][1], differing
+                    ),
+                    self.stream_row_hashes(
+                        self.warehouse_conn,
+                        f"reconcile_{name}",
+                        queries["warehouse"][1],
+                        differing,
+                    ),
+                )
+                result.update({action: len(keys) for action, keys in diff.items()})
+                extracted, loaded = self.repair_rows(name, diff)
+                result["deleted"] = self.delete_missing(name, diff["deleted"])
+                self.record_stats({"deleted": result["deleted"]})
+
+            metrics.observe_reconcile(name, result)
+            self.log_etl_end(run_id, extracted, loaded, "success", stats=self.run_stats)
+            metrics.observe_run(
+                source, name, "success", time.perf_counter() - started, extracted
+            )
+            logger.info(
+                f"⚖️ Reconciled {name}: {result['differing']} of {result['ranges']} "
+                f"ranges differed; {result['missing']} missing, "
+                f"{result['changed']} changed, {result['deleted']} deleted"
+            )
+            result["status"] = "success"
+        except Exception as e:
+            logger.error(f"❌ {name} reconciliation failed: {e}")
+            metrics.observe_run(
+                source, name, "failed", time.perf_counter() - started, extracted
+            )
+            self.warehouse_conn.rollback()
+            source_conn.rollback()
+            self.log_etl_end(run_id, extracted, loaded, "failed", error=str(e))
+            result["status"] = "failed"
+        return result
+
+    def run_reconcile(
+        self,
+        sources: Optional[List[str]] = None,
+        buckets: int = ETL_RECONCILE_BUCKETS,
+    ) -> Dict[str, Dict[str, int]]:
+        """Reconcile every dimension of the given sources with its source table.
+
+        Each table is reconciled under its job lock, so it never races a
+        load of the same table.
+        """
+        sources = sources or ["user_service", "game_service"]
+        results = {}
+        self.connect_warehouse()
+        try:
+            for name in RECONCILE_TABLES:
+                source = TABLE_JOBS[name]["source"]
+                if source not in sources:
+                    continue
+                self.connect_source(source)
+                self.acquire_job_lock(name, wait=True)
+                try:
+                    self.mark_interrupted_runs(source, name)
+                    results[name] = self.reconcile_table(name, buckets)
+                finally:
+                    self.release_job_lock(name)
+        finally:
+            self.close_connections()
+        return results
+
+    # =========================================
+    # COLD STORAGE
+    # =========================================
+
+    def table_columns(self, table: str) -> List[Tuple]:
+        """(name, data_type, numeric_precision, numeric_scale) of a table's columns."""
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT column_name, data_type, numeric_precision, numeric_scale
+                FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = %s
+                ORDER BY ordinal_position
+            """,
+                (table,),
+            )
+            columns = cur.fetchall()
+        self.warehouse_conn.commit()
+        return columns
+
+    def closed_months(self, table: str) -> List[date]:
+        """Months before the current one that may hold rows of a fact table."""
+        current = month_start(datetime.utcnow())
+        known = self.list_partitions(table) if table in PARTITIONED_FACTS else None
+        if known is not None:
+            return sorted(m for m in known if m < current)
+
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(f"SELECT MIN({FACT_TIME_COLUMNS[table]}) FROM {table}")
+            first = cur.fetchone()[0]
+        self.warehouse_conn.commit()
+        months = []
+        month = month_start(first) if first else current
+        while month < current:
+            months.append(month)
+            month = add_months(month, 1)
+        return months
+
+    def month_summary(self, table: str, month: date) -> Tuple[int, Optional[datetime]]:
+        """Row count and latest etl_loaded_at of one month of a fact table."""
+        column = FACT_TIME_COLUMNS[table]
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                f"""
+                SELECT COUNT(*), MAX(etl_loaded_at) FROM {table}
+                WHERE {column} >= %s AND {column} < %s
+            """,
+                (month, add_months(month, 1)),
+            )
+            result = cur.fetchone()
+        self.warehouse_conn.commit()
+        return result
+
+    def stream_month(
+        self, table: str, month: date, columns: List[str], summary: Dict[str, Any]
+    ) -> Iterator[List[tuple]]:
+        """Stream one month of a fact table as chunks of row tuples.
+
+        The latest etl_loaded_at seen is left in summary["max_loaded_at"].
+        """
+        column = FACT_TIME_COLUMNS[table]
+        loaded_at = columns.index("etl_loaded_at")
+        with self.warehouse_conn.cursor(name=f"export_{table}") as cur:
+            cur.itersize = self.batch_size
+            cur.execute(
+                f"""
+                SELECT {', '.join(columns)} FROM {table}
+                WHERE {column} >= %s AND {column} < %s
+                ORDER BY {column}
+            """,
+                (month, add_months(month, 1)),
+            )
+            while True:
+                chunk = cur.fetchmany(self.batch_size)
+                if not chunk:
+                    break
+                latest = max(
+                    (r[loaded_at] for r in chunk if r[loaded_at]), default=None
+                )
+                if latest and (
+                    summary["max_loaded_at"] is None or latest > summary["max_loaded_at"]
+                ):
+                    summary["max_loaded_at"] = latest
+                yield chunk
+        self.warehouse_conn.commit()
+
+    def export_cold_storage(
+        self,
+        tables: Optional[List[str]] = None,
+        root: str = ETL_EXPORT_DIR,
+        recheck_months: int = ETL_EXPORT_RECHECK_MONTHS,
+    ) -> Dict[str, int]:
+        """Export closed months of the fact tables to Parquet cold storage.
+
+        Months missing from the manifest are exported; the latest
+        `recheck_months` exported months are rewritten when their row count
+        or latest etl_loaded_at changed in the warehouse. The manifest is
+        saved after every month, so an interrupted export resumes where it
+        stopped. Returns the months written per table.
+        """
+        # Imported here so runs without cold storage do not load pyarrow
+        import cold_storage
+
+        storage = cold_storage.ColdStorage(root)
+        manifest = storage.load_manifest()
+        written = {}
+        for table in tables or list(FACT_TIME_COLUMNS):
+            columns = self.table_columns(table)
+            schema = cold_storage.arrow_schema(columns)
+            names = [c[0] for c in columns]
+            exported = manifest.setdefault(table, {})
+            months = self.closed_months(table)
+            done = [m for m in months if cold_storage.month_key(m) in exported]
+            recheck = set(done[-recheck_months:]) if recheck_months > 0 else set()
+            written[table] = 0
+
+            for month in months:
+                key = cold_storage.month_key(month)
+                entry = exported.get(key)
+                if entry and month not in recheck:
+                    continue
+                if entry:
+                    count, latest = self.month_summary(table, month)
+                    latest = latest.isoformat() if latest else None
+                    if count == entry["rows"] and latest == entry["max_loaded_at"]:
+                        continue
+
+                summary = {"max_loaded_at": None}
+                rows, size = storage.write_month(
+                    table, month, schema, self.stream_month(table, month, names, summary)
+                )
+                latest = summary["max_loaded_at"]
+                exported[key] = {
+                    "rows": rows,
+                    "bytes": size,
+                    "max_loaded_at": latest.isoformat() if latest else None,
+                    "exported_at": datetime.utcnow().isoformat(),
+                }
+                storage.save_manifest(manifest)
+                written[table] += 1
+                logger.info(f"🧊 Exported {table} {key}: {rows} rows, {size} bytes")
+
+        logger.info(
+            f"🧊 Cold storage export finished: {sum(written.values())} month(s) "
+            f"written to {root}"
+        )
+        return written
+
+    # =========================================
+    # BULK LOADS
+    # =========================================
+
+    def use_bulk_table(self, table: str, shadow: str):
+        """Redirect this pipeline's loads of a fact table into its shadow table.
+
+        Commits stop waiting for the WAL flush: a crash can lose the last
+        commits, but the shadow table is only swapped in once complete.
+        """
+        self.bulk_tables[table] = shadow
+        if table in GAME_FACT_TABLES:
+            self.defer_game_refresh = True
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute("SET synchronous_commit = off")
+        self.warehouse_conn.commit()
+
+    def end_bulk_load(self, table: str):
+        """Stop redirecting loads of a table and restore durable commits."""
+        shadow = self.bulk_tables.pop(table, None)
+        self.partitions.pop(table, None)
+        self.partitions.pop(shadow, None)
+        self.defer_game_refresh = False
+        try:
+            with self.warehouse_conn.cursor() as cur:
+                cur.execute("RESET synchronous_commit")
+            self.warehouse_conn.commit()
+        except psycopg2.Error as e:
+            logger.warning(f"⚠️ Could not reset synchronous_commit: {e}")
+
+    def shadow_exists(self, table: str) -> bool:
+        """Whether a bulk load of the table left its shadow table behind."""
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute("SELECT to_regclass(%s) IS NOT NULL", (shadow_name(table),))
+            exists = cur.fetchone()[0]
+        self.warehouse_conn.commit()
+        return exists
+
+    def begin_bulk_load(self, table: str, reuse: bool = False) -> str:
+        """Create an empty shadow table of a fact table and load into it.
+
+        The shadow has the live table's columns, defaults, NOT NULL and
+        CHECK constraints and partitioning (with the same months), but no
+        indexes or keys. With `reuse`, a shadow left by an unfinished
+        backfill is kept so its resumed shards continue into it.
+        """
+        shadow = shadow_name(table)
+        if reuse and self.shadow_exists(table):
+            logger.info(f"↩️ Continuing bulk load of {table} into {shadow}")
+            self.use_bulk_table(table, shadow)
+            return shadow
+
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {shadow}")
+            cur.execute("SELECT pg_get_partkeydef(to_regclass(%s))", (table,))
+            partition_key = cur.fetchone()[0]
+            cur.execute(
+                f"""
+                CREATE TABLE {shadow}
+                    (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+                    {f"PARTITION BY {partition_key}" if partition_key else ""}
+            """
+            )
+        self.warehouse_conn.commit()
+        for month in sorted(self.list_partitions(table) or ()):
+            self.create_partition(shadow, month)
+        logger.info(f"🚚 Bulk loading {table} into {shadow}")
+        self.use_bulk_table(table, shadow)
+        return shadow
+
+    def abort_bulk_load(self, table: str, run_id: Optional[int], error: str):
+        """Drop a bulk load's shadow table; the live table is left as it was.
+
+        The run is marked 'aborted' and loses its watermark, so neither
+        incremental runs nor resumes continue after rows that only ever
+        reached the shadow table.
+        """
+        self.warehouse_conn.rollback()
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {shadow_name(table)}")
+            if run_id is not None:
+                cur.execute(
+                    """
+                    UPDATE etl_run_log
+                    SET status = 'aborted', error_message = %s,
+                        last_extracted_timestamp = NULL, last_extracted_id = NULL
+                    WHERE run_id = %s
+                """,
+                    (error, run_id),
+                )
+        self.warehouse_conn.commit()
+        logger.error(f"❌ Bulk load of {table} aborted, live table unchanged: {error}")
+
+    def complete_bulk_load(self, table: str, result: Dict[str, Any]):
+        """Swap in the shadow table of a successful run, or abort the bulk load."""
+        if result.get("status") != "success":
+            self.abort_bulk_load(table, result.get("run_id"), "bulk load run failed")
+            return
+        try:
+            self.finish_bulk_load(table, result["run_id"])
+        except Exception as e:
+            result["status"] = "failed"
+            self.abort_bulk_load(table, result.get("run_id"), str(e))
+            return
+        self.defer_game_refresh = False
+        if table in GAME_FACT_TABLES:
+            self.refresh_all_games()
+
+    def bulk_index_statements(self, table: str) -> List[List[str]]:
+        """Statements recreating the live table's keys and indexes on its shadow.
+
+        Returned in three groups run one after another: primary and unique
+        constraints, plain indexes (built in parallel) and foreign keys.
+        Index-backed objects get a `_bulk` suffix until the swap.
+        """
+        shadow = shadow_name(table)
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT conname, contype, pg_get_constraintdef(oid)
+                FROM pg_constraint
+                WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'u', 'f')
+                ORDER BY contype DESC, conname
+            """,
+                (table,),
+            )
+            constraints = cur.fetchall()
+            cur.execute(
+                """
+                SELECT c.relname, pg_get_indexdef(i.indexrelid)
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE i.indrelid = to_regclass(%s)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid
+                  )
+                ORDER BY c.relname
+            """,
+                (table,),
+            )
+            indexes = cur.fetchall()
+        self.warehouse_conn.commit()
+
+        keys = [
+            f"ALTER TABLE {shadow} ADD CONSTRAINT {name}_bulk {definition}"
+            for name, kind, definition in constraints
+            if kind in ("p", "u")
+        ]
+        plain = [
+            re.sub(
+                r"INDEX \S+ ON (ONLY )?\S+ ",
+                f"INDEX {name}_bulk ON {shadow} ",
+                definition,
+                count=1,
+            )
+            for name, definition in indexes
+        ]
+        foreign = [
+            f"ALTER TABLE {shadow} ADD CONSTRAINT {name} {definition}"
+            for name, kind, definition in constraints
+            if kind == "f"
+        ]
+        return [keys, plain, foreign]
+
+    def build_index(self, statement: str):
+        """Run one index build on its own warehouse connection."""
+        conn = psycopg2.connect(**DB_CONFIGS["warehouse"])
+        try:
+            with conn.cursor() as cur:
+                cur.execute(statement)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def finish_bulk_load(self, table: str, run_id: int):
+        """Index a loaded shadow table and swap it in for the live table.
+
+        Duplicate source rows (a row updated while the load ran is read
+        twice) are removed first, keeping the copy its incremental load
+        would keep (see BULK_LOAD_TABLES). Keys are
+        added, then the plain indexes are built ETL_BULK_INDEX_WORKERS at
+        a time, and the shadow is analyzed. The swap itself is one short
+        transaction: the live table is dropped and the shadow, its
+        partitions and indexes take over their names, so readers see
+        either the old or the new table, never a partial one. It also clears
+        the `bulk_load` flag of the run (and its backfill shards), whose
+        watermarks become the table's.
+        """
+        shadow = shadow_name(table)
+        key = TABLE_JOBS[table]["key"]
+        id_column = FACT_SURROGATE_KEYS[table]
+        # Surrogate keys grow in load order; delete the copies loaded
+        # after the kept one ("first") or before it ("last")
+        dropped = ">" if BULK_LOAD_TABLES[table] == "first" else "<"
+        started = time.perf_counter()
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                f"""
+                DELETE FROM {shadow} a USING {shadow} b
+                WHERE a.{key} = b.{key} AND a.{id_column} {dropped} b.{id_column}
+            """
+            )
+            if cur.rowcount:
+                logger.info(f"🧹 Removed {cur.rowcount} duplicate rows from {shadow}")
+        self.warehouse_conn.commit()
+
+        keys, plain, foreign = self.bulk_index_statements(table)
+        for statement in keys:
+            self.build_index(statement)
+        with ThreadPoolExecutor(
+            max_workers=max(ETL_BULK_INDEX_WORKERS, 1), thread_name_prefix="etl-index"
+        ) as pool:
+            list(pool.map(self.build_index, plain))
+        for statement in foreign:
+            self.build_index(statement)
+        logger.info(
+            f"🏗️ Built {len(keys) + len(plain)} indexes on {shadow} "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(f"ANALYZE {shadow}")
+        self.warehouse_conn.commit()
+
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT c.relname
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = to_regclass(%s)
+            """,
+                (shadow,),
+            )
+            partitions = [r[0] for r in cur.fetchall()]
+            cur.execute(
+                """
+                SELECT conname FROM pg_constraint
+                WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'u')
+            """,
+                (shadow,),
+            )
+            constraints = [r[0] for r in cur.fetchall()]
+            cur.execute(
+                """
+                SELECT c.relname
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE i.indrelid = to_regclass(%s)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid
+                  )
+            """,
+                (shadow,),
+            )
+            indexes = [r[0] for r in cur.fetchall()]
+            cur.execute("SELECT pg_get_serial_sequence(%s, %s)", (table, id_column))
+            sequence = cur.fetchone()[0]
+
+            # The shadow's ids come from the live table's sequence; keep it
+            if sequence:
+                cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY {shadow}.{id_column}")
+            cur.execute(f"DROP TABLE {table}")
+            cur.execute(f"ALTER TABLE {shadow} RENAME TO {table}")
+            for name in partitions:
+                cur.execute(f"ALTER TABLE {name} RENAME TO {table}{name[len(shadow):]}")
+            for name in constraints:
+                cur.execute(
+                    f"ALTER TABLE {table} RENAME CONSTRAINT {name} "
+                    f"TO {name[: -len('_bulk')]}"
+                )
+            for name in indexes:
+                cur.execute(f"ALTER INDEX {name} RENAME TO {name[: -len('_bulk')]}")
+            cur.execute(
+                """
+                UPDATE etl_run_log SET bulk_load = FALSE
+                WHERE run_id = %s OR parent_run_id = %s
+            """,
+                (run_id, run_id),
+            )
+        self.warehouse_conn.commit()
+        logger.info(f"🔀 Swapped bulk-loaded {shadow} in for {table}")
+
+    # =========================================
+    # BACKFILL
+    # =========================================
+
+    def plan_backfill_ranges(
+        self, table: str, shards: int
+    ) -> List[Tuple[datetime, datetime]]:
+        """Split a table job's source into [start, end) time ranges.
+
+        Inner boundaries are quantiles of the watermark column over a sample
+        of at most BACKFILL_SAMPLE_ROWS rows, so ranges hold roughly equal
+        row counts. The last range ends just after the current maximum;
+        later changes are left to incremental runs.
+        """
+        job = TABLE_JOBS[table]
+        column = f'"{job["watermark"]}"'
+        source_table = f'"{job["source_table"]}"'
+        conn = self.source_conns[job["source"]]
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT MIN({column}), MAX({column}) FROM {source_table}")
+            low, high = cur.fetchone()
+            inner = []
+            if low is not None and shards > 1:
+                cur.execute(
+                    "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                    (source_table,),
+                )
+                estimate = max(cur.fetchone()[0], 1)
+                cur.execute(
+                    f"""
+                    SELECT percentile_disc(%s::float8[]) WITHIN GROUP (ORDER BY {column})
+                    FROM {source_table} TABLESAMPLE SYSTEM (%s)
+                """,
+                    (
+                        [i / shards for i in range(1, shards)],
+                        min(100.0, 100.0 * BACKFILL_SAMPLE_ROWS / estimate),
+                    ),
+                )
+                inner = cur.fetchone()[0] or []
+        conn.commit()
+        if low is None:
+            return []
+
+        end = high + timedelta(microseconds=1)
+        bounds = sorted({low, *(b for b in inner if b and low < b < end)}) + [end]
+        return list(zip(bounds, bounds[1:]))
+
+    def get_resume_backfill(self, source: str, table: str) -> Optional[int]:
+        """Run id of the table's latest backfill if it failed recently."""
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT run_id, status, run_start_time
+                FROM etl_run_log
+                WHERE source_system = %s AND table_name = %s
+                  AND shard_count IS NOT NULL
+                ORDER BY run_id DESC
+                LIMIT 1
+            """,
+                (source, table),
+            )
+            result = cur.fetchone()
+        self.warehouse_conn.commit()
+        if not result:
+            return None
+        run_id, status, started = result
+        max_age = timedelta(hours=ETL_RESUME_MAX_AGE_HOURS)
+        if status != "failed" or started < datetime.utcnow() - max_age:
+            return None
+        return run_id
+
+    def get_backfill_shards(self, parent_run_id: int) -> List[Tuple]:
+        """Every shard run of a backfill, ordered by range and attempt."""
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT run_id, status, range_start, range_end,
+                       last_extracted_timestamp, COALESCE(last_extracted_id, ''),
+                       records_extracted, records_loaded,
+                       records_inserted, records_updated, records_unchanged
+                FROM etl_run_log
+                WHERE parent_run_id = %s
+                ORDER BY range_start, run_id
+            """,
+                (parent_run_id,),
+            )
+            shards = cur.fetchall()
+        self.warehouse_conn.commit()
+        return shards
+
+    def reopen_backfill(self, parent_run_id: int) -> Optional[List[Dict[str, Any]]]:
+        """Mark a failed backfill running again and list its unfinished ranges.
+
+        Returns None if the backfill did not log all of its shards (it died
+        while starting them), in which case it cannot be resumed.
+        """
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                "SELECT shard_count FROM etl_run_log WHERE run_id = %s",
+                (parent_run_id,),
+            )
+            shard_count = cur.fetchone()[0]
+        self.warehouse_conn.commit()
+
+        latest = {}
+        for shard in self.get_backfill_shards(parent_run_id):
+            latest[shard[2]] = shard
+        if len(latest) < shard_count:
+            return None
+
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE etl_run_log
+                SET status = 'running', run_end_time = NULL, error_message = NULL
+                WHERE run_id = %s
+            """,
+                (parent_run_id,),
+            )
+        self.warehouse_conn.commit()
+
+        return [
+            {
+                "range_start": range_start,
+                "range_end": range_end,
+                "resume_from": (
+                    run_id,
+                    (last_timestamp, last_id) if last_timestamp else None,
+                ),
+            }
+            for run_id, status, range_start, range_end, last_timestamp, last_id, *_ in (
+                latest.values()
+            )
+            if status != "success"
+        ]
+
+    def finish_backfill(self, parent_run_id: int):
+        """Merge a backfill's shard runs into its parent etl_run_log row.
+
+        Row counts add up every attempt; the backfill succeeds when the
+        latest attempt of every range succeeded, and only then records the
+        highest shard watermark for the following incremental runs.
+        """
+        shards = self.get_backfill_shards(parent_run_id)
+        latest = {}
+        totals = [0] * 5
+        for shard in shards:
+            latest[shard[2]] = shard
+            for i, value in enumerate(shard[6:]):
+                totals[i] += value or 0
+
+        with self.warehouse_conn.cursor() as cur:
+            cur.execute(
+                "SELECT shard_count FROM etl_run_log WHERE run_id = %s",
+                (parent_run_id,),
+            )
+            shard_count = cur.fetchone()[0]
+        self.warehouse_conn.commit()
+
+        failed = shard_count - sum(1 for s in latest.values() if s[1] == "success")
+        watermarks = [(s[4], s[5]) for s in latest.values() if s[4] is not None]
+        extracted, loaded, inserted, updated, unchanged = totals
+        self.log_etl_end(
+            parent_run_id,
+            extracted,
+            loaded,
+            "failed" if failed else "success",
+            None if failed or not watermarks else max(watermarks),
+            error=f"{failed} of {shard_count} shards failed" if failed else None,
+            stats={"inserted": inserted, "updated": updated, "unchanged": unchanged},
+        )
+        return failed
+
+    def backfill_table(
+        self,
+        table: str,
+        workers: int = ETL_BACKFILL_WORKERS,
+        shards: Optional[int] = None,
+        resume_parent: Optional[int] = None,
+    ):
+        """Full-load one table job by range shards in parallel worker processes.
+
+        Every shard is logged as its own etl_run_log run under a parent run
+        that carries the merged totals. A recent failed backfill of the
+        table (or `resume_parent`) is resumed instead of starting over.
+        """
+        job = TABLE_JOBS[table]
+        source = job["source"]
+        self.connect_warehouse()
+        self.connect_source(source)
+        self.acquire_job_lock(table, wait=True)
+        bulk = False
+        try:
+            self.mark_interrupted_runs(source, table)
+            parent_run_id = resume_parent or self.get_resume_backfill(source, table)
+            specs = self.reopen_backfill(parent_run_id) if parent_run_id else None
+            resuming = specs is not None
+
+            # A resumed bulk backfill continues into the shadow table its
+            # finished shards were loaded into
+            bulk = table in BULK_LOAD_TABLES and (
+                self.bulk_load or (resuming and self.shadow_exists(table))
+            )
+            if bulk:
+                self.begin_bulk_load(table, reuse=resuming)
+
+            if specs is None:
+                if parent_run_id:
+                    logger.warning(
+                        f"⚠️ Backfill {parent_run_id} of {table} did not start all "
+                        "of its shards and cannot be resumed, starting over"
+                    )
+                ranges = self.plan_backfill_ranges(table, shards or workers)
+                parent_run_id = self.log_etl_start(
+                    source, table, full_load=True, shard_count=len(ranges)
+                )
+                specs = [
+                    {"range_start": start, "range_end": end, "resume_from": None}
+                    for start, end in ranges
+                ]
+            else:
+                logger.info(
+                    f"↩️ Resuming backfill {parent_run_id} of {table} "
+                    f"({len(specs)} unfinished shard(s))"
+                )
+
+            logger.info(
+                f"🧩 Backfilling {table} in {len(specs)} shard(s) "
+                f"with {min(workers, len(specs) or 1)} worker process(es)"
+            )
+            self.run_backfill_shards(table, parent_run_id, specs, workers)
+            failed = self.finish_backfill(parent_run_id)
+            result = {"status": "failed" if failed else "success", "run_id": parent_run_id}
+            if bulk and not failed:
+                self.complete_bulk_load(table, result)
+            elif table in GAME_FACT_TABLES and not bulk:
+                self.refresh_all_games()
+            if failed:
+                logger.error(
+                    f"❌ Backfill {parent_run_id} of {table}: {failed} shard(s) "
+                    f"failed; re-run with --resume {parent_run_id}"
+                )
+            elif result["status"] == "success":
+                logger.info(f"✅ Backfill {parent_run_id} of {table} completed")
+        finally:
+            if bulk:
+                self.end_bulk_load(table)
+            self.release_job_lock(table)
+
+    def run_backfill_shards(
+        self,
+        table: str,
+        parent_run_id: int,
+        specs: List[Dict[str, Any]],
+        workers: int,
+    ):
+        """Run backfill shards in a pool of spawned worker processes."""
+        if not specs:
+            return
+        shared = {
+            "table": table,
+            "parent_run_id": parent_run_id,
+            "batch_size": self.batch_size,
+            "load_methods": self.load_methods,
+            "pipeline_depth": self.pipeline_depth,
+            "bulk_table": self.bulk_tables.get(table),
+            "profile": self.profile,
+        }
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(specs)),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            futures = {
+                pool.submit(run_backfill_shard, {**shared, **spec}): spec
+                for spec in specs
+            }
+            for future in as_completed(futures):
+                spec = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(
+                        f"❌ {table} shard from {spec['range_start']} failed: {e}"
+                    )
+                    continue
+                self.merge_touched(result["touched_days"])
+                logger.info(
+                    f"🧩 {table} shard from {spec['range_start']}: {result['status']} "
+                    f"({result['extracted']} rows)"
+                )
+
+    def run_backfill(
+        self,
+        sources: Optional[List[str]] = None,
+        workers: int = ETL_BACKFILL_WORKERS,
+        shards: Optional[int] = None,
+    ):
+        """Backfill every table job of the given sources in dependency order."""
+        sources = sources or ["user_service", "game_service"]
+        try:
+            for name, job in TABLE_JOBS.items():
+                if job["source"] in sources:
+                    self.backfill_table(name, workers, shards)
+            self.refresh_rollups()
+        finally:
+            self.close_connections()
+
+    # =========================================
+    # CHANGE DATA CAPTURE
+    # =========================================
+
+    def delete_rows(self, table: str, key: str, keys: List[Any]) -> int:
+        """Delete warehouse rows whose source rows were hard-deleted.
+
+        dim_users keeps its history: the current versions are closed instead.
+        """
+        column = FACT_TIME_COLUMNS.get(table)
+        with self.warehouse_conn.cursor() as cur:
+            if table == "dim_users":
+                cur.execute(
+                    """
+                    UPDATE dim_users SET is_current = FALSE, valid_to = %s
+                    WHERE user_id = ANY(%s) AND is_current
+                """,
+                    (datetime.utcnow(), keys),
+                )
+                closed = cur.rowcount
+                self.warehouse_conn.commit()
+                self.key_cache.invalidate("dim_users", keys)
+                return closed
+            if table == "fact_games":
+                # Keep the sessions and actions of deleted games, unlinked
+                for fact in ("fact_player_sessions", "fact_game_actions"):
+                    cur.execute(
+                        f"""
+                        UPDATE {fact} SET game_id = NULL, etl_loaded_at = now()
+                        WHERE lobby_id = ANY(%s) AND game_id IS NOT NULL
+                    """,
+                        (keys,),
+                    )
+            cur.execute(
+                f"DELETE FROM {table} WHERE {key} = ANY(%s) "
+                f"RETURNING {column or key}",
+                (keys,),
+            )
+            removed = cur.fetchall()
+            self.warehouse_conn.commit()
+        if column:
+            self.record_touched(table, [{column: r[0]} for r in removed])
+        return len(removed)
+
+    def apply_cdc_batch(
+        self,
+        source: str,
+        upserts: Dict[str, List[Dict]],
+        deletes: Dict[str, List[Any]],
+        lsn: str,
+    ):
+        """Apply a micro-batch of decoded changes through the table loaders.
+
+        Tables are applied in TABLE_JOBS order so dimensions land before
+        the facts that reference them, each logging its own run under the
+        table's job lock. A scheduled, reconcile or backfill run of the
+        table is waited for; a bulk load in particular swaps in its shadow
+        table, dropping any rows applied to the live table meanwhile. The
+        batch's commit LSN is recorded in one CDC_LSN_TABLE row only after
+        every table committed, so a batch that failed part way is replayed
+        in full (the loads are idempotent) instead of skipped.
+        """
+        changes = 0
+        for name, job in TABLE_JOBS.items():
+            rows = upserts.get(name, [])
+            keys = deletes.get(name, [])
+            if job["source"] != source or not (rows or keys):
+                continue
+
+            changes += len(rows) + len(keys)
+            self.acquire_job_lock(name, wait=True)
+            try:
+                self.apply_cdc_table(source, name, job, rows, keys)
+            finally:
+                self.release_job_lock(name)
+
+        run_id = self.log_etl_start(source, CDC_LSN_TABLE)
+        self.log_etl_end(run_id, changes, changes, "success", last_lsn=lsn)
+        self.refresh_rollups()
+
+    def apply_cdc_table(
+        self,
+        source: str,
+        name: str,
+        job: Dict[str, Any],
+        rows: List[Dict],
+        keys: List[Any],
+    ):
+        """Apply one table's upserts and deletes of a CDC batch as one run."""
+        run_id = self.log_etl_start(source, name)
+        self.run_stats = {}
+        try:
+            loaded = (
+                self.timed_load(source, name, getattr(self, job["load"]), rows)
+                if rows
+                else 0
+            )
+            metrics.observe_chunk(source, name, len(rows), loaded, 0)
+            if keys:
+                self.record_stats(
+                    {"deleted": self.delete_rows(name, job["key"], keys)}
+                )
+            self.log_etl_end(
+                run_id,
+                len(rows) + len(keys),
+                loaded,
+                "success",
+                stats=self.run_stats,
+            )
+        except Exception as e:
+            logger.error(f"❌ {name} CDC batch failed: {e}")
+            metrics.FAILURES_TOTAL.labels(source, name).inc()
+            self.warehouse_conn.rollback()
+            self.log_etl_end(run_id, len(rows) + len(keys), 0, "failed", error=str(e))
+            raise
+
+    def consume_cdc(self, source: str):
+        """Stream changes from a source's replication slot into the warehouse.
+
+        Changes are buffered per table and flushed at transaction
+        boundaries once `batch_size` changes or CDC_FLUSH_SECONDS have
+        accumulated. The slot is only acknowledged after the warehouse
+        commit, so a crash replays the unacknowledged transactions.
+        """
+        # Source table -> table jobs it feeds (a lobby feeds dim_lobbies
+        # and fact_games)
+        jobs: Dict[str, List[str]] = {}
+        for name, job in TABLE_JOBS.items():
+            if job["source"] == source:
+                jobs.setdefault(job["source_table"], []).append(name)
+        repl_conn = psycopg2.connect(
+            **DB_CONFIGS[source], connection_factory=LogicalReplicationConnection
+        )
+        try:
+            cur = repl_conn.cursor()
+            try:
+                cur.create_replication_slot(CDC_SLOT_NAME, output_plugin="wal2json")
+                logger.warning(
+                    f"⚠️ Created replication slot {CDC_SLOT_NAME} on {source}; "
+                    "run a --full-load to cover rows written before it existed"
+                )
+            except psycopg2.errors.DuplicateObject:
+                pass
+
+            start_lsn = self.get_last_etl_lsn(source) or 0
+            cur.start_replication(
+                slot_name=CDC_SLOT_NAME,
+                decode=True,
+                start_lsn=start_lsn,
+                options={
+                    "format-version": "2",
+                    "add-tables": ",".join(f"public.{t}" for t in jobs),
+                },
+            )
+            logger.info(f"📡 Streaming changes from {source} (from LSN {start_lsn})")
+
+            upserts: Dict[str, List[Dict]] = {}
+            deletes: Dict[str, List[Any]] = {}
+            pending = 0
+            commit_lsn = None
+            batch_started = time.monotonic()
+
+            while True:
+                msg = cur.read_message()
+                if msg is None:
+                    select.select([cur], [], [], CDC_FLUSH_SECONDS)
+                else:
+                    change = json.loads(msg.payload)
+                    action = change["action"]
+                    if action in ("I", "U"):
+                        row = {c["name"]: c["value"] for c in change["columns"]}
+                        for name in jobs[change["table"]]:
+                            upserts.setdefault(name, []).append(row)
+                        pending += 1
+                    elif action == "D":
+                        identity = {c["name"]: c["value"] for c in change["identity"]}
+                        for name in jobs[change["table"]]:
+                            deletes.setdefault(name, []).append(identity["id"])
+                        pending += 1
+                    if action == "C":
+                        commit_lsn = msg.data_start
+                        if not pending:
+                            # Nothing buffered: let the slot move past
+                            # transactions on unrelated tables
+                            cur.send_feedback(flush_lsn=commit_lsn)
+                    else:
+                        commit_lsn = None
+
+                # Only flush between transactions, so an acknowledged LSN
+                # never splits a source transaction
+                if (
+                    pending
+                    and commit_lsn is not None
+                    and (
+                        pending >= self.batch_size
+                        or time.monotonic() - batch_started >= CDC_FLUSH_SECONDS
+                    )
+                ):
+                    lsn = f"{commit_lsn >> 32:X}/{commit_lsn & 0xFFFFFFFF:X}"
+                    self.apply_cdc_batch(source, upserts, deletes, lsn)
+                    cur.send_feedback(flush_lsn=commit_lsn)
+                    logger.info(f"📥 Applied {pending} changes from {source} @ {lsn}")
+                    upserts, deletes, pending = {}, {}, 0
+                    batch_started = time.monotonic()
+        finally:
+            repl_conn.close()
+
+    def run_cdc_source(self, source: str):
+        """Consume CDC for one source forever, reconnecting after failures."""
+        while True:
+            try:
+                self.connect_warehouse()
+                self.consume_cdc(source)
+            except Exception as e:
+                logger.error(
+                    f"❌ CDC for {source} failed: {e}; "
+                    f"retrying in {CDC_RETRY_SECONDS:.0f}s"
+                )
+                self.close_connections()
+                time.sleep(CDC_RETRY_SECONDS)
+
+    def run_cdc(self, sources: Optional[List[str]] = None):
+        """Run CDC for every source concurrently, one pipeline per source."""
+        sources = sources or ["user_service", "game_service"]
+        logger.info("=" * 60)
+        logger.info(f"🏁 Starting CDC for {', '.join(sources)}")
+        logger.info("=" * 60)
+
+        with ThreadPoolExecutor(
+            max_workers=len(sources), thread_name_prefix="etl-cdc"
+        ) as pool:
+            for source in sources:
+                pipeline = ETLPipeline(
+                    batch_size=self.batch_size,
+                    load_methods=self.load_methods,
+                    workers=1,
+                    pools=self.pools,
+                )
+                pool.submit(pipeline.run_cdc_source, source)
+
+
+def run_backfill_shard(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract and load one backfill range (runs in a worker process)."""
+    table = spec["table"]
+    job = TABLE_JOBS[table]
+    pipeline = ETLPipeline(
+        batch_size=spec["batch_size"],
+        load_methods=spec["load_methods"],
+        workers=1,
+        pipeline_depth=spec["pipeline_depth"],
+        profile=spec["profile"],
+    )
+    pipeline.defer_game_refresh = True
+    try:
+        pipeline.connect_warehouse()
+        pipeline.connect_source(job["source"])
+        if spec["bulk_table"]:
+            pipeline.use_bulk_table(table, spec["bulk_table"])
+        pipeline.run_table_etl(
+            job["source"],
+            table,
+            getattr(pipeline, job["extract"]),
+            getattr(pipeline, job["load"]),
+            job["watermark"],
+            full_load=True,
+            resume_from=spec["resume_from"],
+            shard=spec,
+        )
+    finally:
+        pipeline.close_connections()
+    return {**pipeline.job_results[table], "touched_days": pipeline.touched_days}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mafia Platform Data Warehouse ETL")
+    parser.add_argument(
+        "--source",
+        choices=["user_service", "game_service", "all"],
+        default="all",
+        help="Source to extract from",
+    )
+    parser.add_argument(
+        "--full-load",
+        action="store_true",
         help="Perform full load instead of incremental",
     )
+    parser.add_argument(
+        "--cdc",
+        action="store_true",
+        help="Stream changes continuously from logical replication slots",
+    )
+    parser.add_argument(
+        "--compact-facts",
+        action="store_true",
+        help="Delete duplicate legacy fact rows in batches, then exit",
+    )
+    parser.add_argument(
+        "--maintain-partitions",
+        action="store_true",
+        help="Create upcoming fact partitions and apply retention, then exit",
+    )
+    parser.add_argument(
+        "--migrate-partitions",
+        action="store_true",
+        help="Convert legacy fact tables to monthly partitions, then exit",
+    )
+    parser.add_argument(
+        "--rebuild-rollups",
+        action="store_true",
+        help="Rebuild all aggregate tables from the fact tables, then exit",
+    )
+    parser.add_argument(
+        "--bulk-load",
+        action="store_true",
+        default=ETL_BULK_LOAD,
+        help="Full loads and backfills rebuild fact tables through an unindexed "
+        "shadow table that is indexed and swapped in at the end",
+    )
+    parser.add_argument(
+        "--reconcile",
+        action="store_true",
+        help="Compare dimensions with their sources by checksum ranges and repair them",
+    )
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Full-load each table in parallel time-range shards",
+    )
+    parser.add_argument(
+        "--backfill-workers",
+        type=int,
+        default=ETL_BACKFILL_WORKERS,
+        help="Worker processes used by --backfill (and resumed backfills)",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        help="Time ranges per table for --backfill (default: --backfill-workers)",
+    )
+    parser.add_argument(
+        "--resume",
+        type=int,
+        metavar="RUN_ID",
+        help="Continue a failed or interrupted table run from its last checkpoint",
+    )
+    parser.add_argument(
+        "--export-parquet",
+        action="store_true",
+        help="Export closed fact months to the Parquet cold storage (ETL_EXPORT_DIR)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=ETL_BATCH_SIZE,
+        help="Rows fetched, loaded and committed per chunk",
+    )
+    parser.add_argument(
+        "--load-method",
+        choices=LOAD_METHODS,
+        help="Override the load method for every fact table",
+    )
+    parser.add_argument(
+        "--dim-load-method",
+        choices=DIM_LOAD_METHODS,
+        help="Override the load method for every dimension table",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=ETL_WORKERS,
+        help="Number of table jobs to run concurrently (1 = sequential)",
+    )
+    parser.add_argument(
+        "--pipeline-depth",
+        type=int,
+        default=ETL_PIPELINE_DEPTH,
+        help="Chunks extracted ahead of the load in each table job (0 = no overlap)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=ETL_PROFILE,
+        help="Write per-stage CPU, memory and SQL profiles of every table run "
+        "to ETL_PROFILE_DIR/run_<run_id>",
+    )
 
     args = parser.parse_args()
 
-    pipeline = ETLPipeline()
+    load_methods = {}
+    if args.load_method:
+        load_methods.update({table: args.load_method for table in TABLE_LOAD_METHODS})
+    if args.dim_load_method:
+        load_methods.update(
+            {table: args.dim_load_method for table in TABLE_DIM_LOAD_METHODS}
+        )
+    pipeline = ETLPipeline(
+        batch_size=args.batch_size,
+        load_methods=load_methods,
+        workers=args.workers,
+        pipeline_depth=args.pipeline_depth,
+        bulk_load=args.bulk_load,
+        profile=args.profile,
+    )
 
-    if args.source == "all":
-        pipeline.run_all(args.full_load)
-    elif args.source == "user_service":
+    sources = None if args.source == "all" else [args.source]
+    maintenance = (
+        args.compact_facts
+        or args.maintain_partitions
+        or args.migrate_partitions
+        or args.rebuild_rollups
+        or args.export_parquet
+    )
+    if maintenance:
         pipeline.connect_warehouse()
         try:
-            pipeline.run_user_service_etl(args.full_load)
+            if args.migrate_partitions:
+                pipeline.migrate_to_partitions()
+            # Export first, so "archive" retention can drop what was exported
+            if args.export_parquet:
+                pipeline.export_cold_storage()
+            if args.maintain_partitions:
+                pipeline.maintain_partitions()
+            if args.compact_facts:
+                pipeline.compact_facts()
+            if args.rebuild_rollups:
+                pipeline.rebuild_rollups()
         finally:
             pipeline.close_connections()
-    elif args.source == "game_service":
-        pipeline.connect_warehouse()
+    elif args.resume:
         try:
-            pipeline.run_game_service_etl(args.full_load)
+            pipeline.resume_run(args.resume, args.backfill_workers)
         finally:
             pipeline.close_connections()
+    elif args.reconcile:
+        pipeline.run_reconcile(sources)
+    elif args.backfill:
+        pipeline.run_backfill(sources, args.backfill_workers, args.shards)
+    elif args.cdc:
+        pipeline.run_cdc(sources)
+    else:
+        pipeline.run_all(args.full_load, sources=sources)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,169 @@
+"""
+Prometheus Metrics for the Data Warehouse ETL
+
+Metrics are recorded by ETLPipeline in every process; the scheduler
+exposes them on an HTTP /metrics endpoint (ETL_METRICS_PORT) for the
+`etl-service` Prometheus scrape job.
+
+Rows per second are derived in Prometheus with rate() over
+etl_rows_total; etl_run_rows_per_second holds the throughput of the last
+completed run per table.
+"""
+
+from datetime import datetime
+from typing import Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from prometheus_client.core import REGISTRY, GaugeMetricFamily
+
+STAGE_SECONDS = Histogram(
+    "etl_stage_duration_seconds",
+    "Time spent per chunk in each ETL stage",
+    ["source", "table", "stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+RUN_SECONDS = Histogram(
+    "etl_run_duration_seconds",
+    "Wall time of a complete table run",
+    ["source", "table"],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+BATCH_ROWS = Histogram(
+    "etl_batch_rows",
+    "Rows per extracted chunk",
+    ["source", "table"],
+    buckets=(1, 10, 100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000),
+)
+ROWS_TOTAL = Counter(
+    "etl_rows_total",
+    "Rows processed, by stage (extracted, loaded, skipped)",
+    ["source", "table", "stage"],
+)
+RUN_ROWS_PER_SECOND = Gauge(
+    "etl_run_rows_per_second",
+    "Extracted rows per second of the last completed run",
+    ["source", "table"],
+)
+WATERMARK_LAG = Gauge(
+    "etl_watermark_lag_seconds",
+    "Now minus the last extracted timestamp, as of the last run",
+    ["source", "table"],
+)
+RUNS_TOTAL = Counter(
+    "etl_runs_total",
+    "Table runs, by final status",
+    ["source", "table", "status"],
+)
+FAILURES_TOTAL = Counter(
+    "etl_failures_total",
+    "Failed table runs and CDC batches",
+    ["source", "table"],
+)
+KEY_CACHE_LOOKUPS = Counter(
+    "etl_dimension_key_cache_lookups_total",
+    "Dimension surrogate key lookups, by result (hit, miss)",
+    ["dimension", "result"],
+)
+RECONCILE_RANGES = Counter(
+    "etl_reconcile_ranges_total",
+    "Key ranges compared by reconciliation, by result (match, differ)",
+    ["table", "result"],
+)
+RECONCILE_ROWS = Counter(
+    "etl_reconcile_rows_total",
+    "Rows repaired by reconciliation, by kind (missing, changed, deleted)",
+    ["table", "kind"],
+)
+QUERY_CACHE_LOOKUPS = Counter(
+    "analytics_query_cache_lookups_total",
+    "Analytics service result cache lookups, by result (hit, miss)",
+    ["endpoint", "result"],
+)
+JOB_FAILURES_TOTAL = Counter(
+    "etl_scheduled_job_failures_total",
+    "Scheduled jobs that raised",
+    ["job"],
+)
+
+
+def observe_stage(source: str, table: str, stage: str, seconds: float):
+    """Record the time one chunk spent in an ETL stage."""
+    STAGE_SECONDS.labels(source, table, stage).observe(max(seconds, 0.0))
+
+
+def observe_chunk(source: str, table: str, extracted: int, loaded: int, skipped: int):
+    """Record the row counts of one chunk."""
+    BATCH_ROWS.labels(source, table).observe(extracted)
+    ROWS_TOTAL.labels(source, table, "extracted").inc(extracted)
+    ROWS_TOTAL.labels(source, table, "loaded").inc(loaded)
+    if skipped:
+        ROWS_TOTAL.labels(source, table, "skipped").inc(skipped)
+
+
+def observe_key_cache(dimension: str, hits: int, misses: int):
+    """Record the outcome of one batch of dimension key lookups."""
+    if hits:
+        KEY_CACHE_LOOKUPS.labels(dimension, "hit").inc(hits)
+    if misses:
+        KEY_CACHE_LOOKUPS.labels(dimension, "miss").inc(misses)
+
+
+def observe_query_cache(endpoint: str, hit: bool):
+    """Record one analytics result cache lookup."""
+    QUERY_CACHE_LOOKUPS.labels(endpoint, "hit" if hit else "miss").inc()
+
+
+def observe_reconcile(table: str, result: Dict[str, int]):
+    """Record the compared ranges and repaired rows of one reconciliation."""
+    RECONCILE_RANGES.labels(table, "match").inc(result["ranges"] - result["differing"])
+    RECONCILE_RANGES.labels(table, "differ").inc(result["differing"])
+    for kind in ("missing", "changed", "deleted"):
+        if result[kind]:
+            RECONCILE_ROWS.labels(table, kind).inc(result[kind])
+
+
+def observe_run(
+    source: str,
+    table: str,
+    status: str,
+    seconds: float,
+    extracted: int,
+    watermark_ts: Optional[datetime] = None,
+):
+    """Record the outcome of a complete table run."""
+    RUNS_TOTAL.labels(source, table, status).inc()
+    RUN_SECONDS.labels(source, table).observe(seconds)
+    if status != "success":
+        FAILURES_TOTAL.labels(source, table).inc()
+        return
+    if seconds > 0:
+        RUN_ROWS_PER_SECOND.labels(source, table).set(extracted / seconds)
+    if watermark_ts is not None:
+        # Source timestamps are naive UTC
+        lag = (datetime.utcnow() - watermark_ts.replace(tzinfo=None)).total_seconds()
+        WATERMARK_LAG.labels(source, table).set(max(lag, 0.0))
+
+
+class PoolCollector:
+    """Report connection-pool usage at scrape time."""
+
+    def __init__(self, pools):
+        self.pools = pools
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "etl_pool_connections",
+            "Pooled connections per database, by state",
+            labels=["database", "state"],
+        )
+        for name, usage in self.pools.usage().items():
+            for state, count in usage.items():
+                family.add_metric([name, state], count)
+        yield family
+
+
+def serve(port: int, pools=None):
+    """Start the /metrics HTTP endpoint in a background thread."""
+    if pools is not None:
+        REGISTRY.register(PoolCollector(pools))
+    start_http_server(port)
@@ -0,0 +1,472 @@
+"""
+Per-run Profiling of ETL Table Runs
+
+With profiling on (`etl_pipeline.py --profile`, or ETL_PROFILE=true for
+the scheduler) every table run writes diagnostic artifacts keyed by its
+etl_run_log run_id, so a slow production run can be examined afterwards:
+
+    <ETL_PROFILE_DIR>/run_<run_id>/summary.json
+    <ETL_PROFILE_DIR>/run_<run_id>/<stage>.prof    (pstats, per stage)
+    <ETL_PROFILE_DIR>/run_<run_id>/<stage>.txt     (top functions, per stage)
+
+Stages are extract, transform, load and bookkeeping (etl_run_log,
+watermark and overlap key queries). summary.json holds the wall and CPU
+seconds, calls and tracemalloc peak of every stage, the allocation
+sites at the run's memory high-water mark, the slowest SQL statements and,
+where pg_stat_statements is installed, the statements with the most server
+execution time during the run.
+
+Statement times are taken around each round trip of the run's connections
+(execute, COPY, and FETCH of server-side cursors), keyed by statement text.
+tracemalloc is process-wide, so memory peaks are approximate while other
+jobs run concurrently; use --workers 1 for exact attribution.
+
+    python -m pstats /var/log/etl/profiles/run_123/load.prof
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import logging
+import cProfile
+import pstats
+import threading
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+ETL_PROFILE_DIR = os.getenv("ETL_PROFILE_DIR", "/var/log/etl/profiles")
+# Run directories kept under ETL_PROFILE_DIR; older ones are deleted
+ETL_PROFILE_KEEP_RUNS = int(os.getenv("ETL_PROFILE_KEEP_RUNS", "200"))
+# Statements and functions listed per report
+PROFILE_TOP = 25
+# Allocation sites are re-captured when traced memory grows past the last
+# capture by this factor
+SNAPSHOT_GROWTH = 1.1
+
+logger = logging.getLogger("ETL")
+
+# tracemalloc is process-wide; it runs while any profiler is active
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+
+def _start_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def statement_key(sql: Any) -> str:
+    """Whitespace-collapsed statement text, the key of its timings."""
+    if isinstance(sql, bytes):
+        sql = sql.decode(errors="replace")
+    elif not isinstance(sql, str):
+        sql = str(sql)
+    return re.sub(r"\s+", " ", sql).strip()[:500]
+
+
+class StageProfile:
+    """Accumulated profile of one stage across the chunks of a run."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_bytes = 0
+        # Times the CPU profile could not be enabled (another profiler active)
+        self.unprofiled = 0
+
+
+class _Frame:
+    """An entered stage on one thread's stack."""
+
+    __slots__ = ("stage", "wall", "cpu", "memory", "profiling")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.memory = 0
+        self.profiling = False
+
+
+class RunProfiler:
+    """CPU, memory and SQL profile of one table run.
+
+    Stages nest per thread (transform runs inside load): entering a stage
+    pauses the enclosing one, so stage times are exclusive and add up to
+    the profiled part of the run, as in the etl_stage_duration_seconds
+    metric.
+    """
+
+    def __init__(self, source: str, table: str, directory: str = ETL_PROFILE_DIR):
+        self.source = source
+        self.table = table
+        self.directory = directory
+        self.run_id: Optional[int] = None
+        self.started = datetime.utcnow()
+        self.stages: Dict[str, StageProfile] = {}
+        # statement -> [calls, seconds, max seconds, rows, stage]
+        self.statements: Dict[str, List[Any]] = {}
+        self.allocations: List[Dict[str, Any]] = []
+        self.allocations_at = 0
+        self.server_before: Dict[str, Dict[Tuple, Tuple]] = {}
+        self.server_statements: Dict[str, List[Dict[str, Any]]] = {}
+        self.conns: Dict[str, Any] = {}
+        self.factories: Dict[str, Any] = {}
+        self.cursor_classes: Dict[type, type] = {}
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    # =========================================
+    # STAGES
+    # =========================================
+
+    def _stack(self) -> List[_Frame]:
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def current_stage(self) -> str:
+        """Stage running on the calling thread ('run' outside any stage)."""
+        stack = self._stack()
+        return stack[-1].stage if stack else "run"
+
+    def _stage(self, name: str) -> StageProfile:
+        with self.lock:
+            if name not in self.stages:
+                self.stages[name] = StageProfile()
+            return self.stages[name]
+
+    def _resume(self, frame: _Frame):
+        stage = self._stage(frame.stage)
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            frame.memory = tracemalloc.get_traced_memory()[0]
+        try:
+            stage.profile.enable()
+            frame.profiling = True
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process
+            stage.unprofiled += 1
+        frame.wall = time.perf_counter()
+        frame.cpu = time.thread_time()
+
+    def _pause(self, frame: _Frame):
+        wall = time.perf_counter() - frame.wall
+        cpu = time.thread_time() - frame.cpu
+        stage = self._stage(frame.stage)
+        if frame.profiling:
+            stage.profile.disable()
+            frame.profiling = False
+        current = peak = 0
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+        with self.lock:
+            stage.wall_seconds += wall
+            stage.cpu_seconds += cpu
+            stage.peak_bytes = max(stage.peak_bytes, peak - frame.memory)
+        if current > self.allocations_at * SNAPSHOT_GROWTH:
+            self.capture_allocations(current)
+
+    def enter(self, name: str):
+        """Start (or resume) timing a stage on the calling thread."""
+        stack = self._stack()
+        if stack:
+            self._pause(stack[-1])
+        frame = _Frame(name)
+        stack.append(frame)
+        self._resume(frame)
+
+    def exit(self):
+        """Stop the stage last entered on the calling thread."""
+        stack = self._stack()
+        frame = stack.pop()
+        self._pause(frame)
+        with self.lock:
+            self.stages[frame.stage].calls += 1
+        if stack:
+            self._resume(stack[-1])
+
+    def stage(self, name: str) -> "_StageContext":
+        """Context manager profiling its body as one call of a stage."""
+        return _StageContext(self, name)
+
+    def iterate(self, name: str, chunks: Iterator[Any]) -> Iterator[Any]:
+        """Profile each next() of an iterator (e.g. extract chunks) as a stage."""
+        try:
+            while True:
+                with self.stage(name):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            chunks.close()
+
+    def capture_allocations(self, current: int):
+        """Record the largest allocation sites at a new memory high-water mark."""
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        top = snapshot.statistics("lineno")[:PROFILE_TOP]
+        with self.lock:
+            if current <= self.allocations_at:
+                return
+            self.allocations_at = current
+            self.allocations = [
+                {
+                    "site": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                    "bytes": s.size,
+                    "blocks": s.count,
+                }
+                for s in top
+            ]
+
+    # =========================================
+    # SQL STATEMENTS
+    # =========================================
+
+    def record_statement(self, sql: Any, seconds: float, rows: int):
+        """Add one round trip of a statement to its timings."""
+        key = statement_key(sql)
+        stage = self.current_stage()
+        with self.lock:
+            entry = self.statements.setdefault(key, [0, 0.0, 0.0, 0, stage])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3] += max(rows, 0)
+
+    def cursor_class(self, base: type = psycopg2.extensions.cursor) -> type:
+        """Subclass of a cursor class that times its round trips."""
+        if base not in self.cursor_classes:
+            self.cursor_classes[base] = _timed_cursor(base, self)
+        return self.cursor_classes[base]
+
+    def attach(self, conns: Dict[str, Any]):
+        """Start profiling the statements of the run's connections."""
+        _start_tracing()
+        self.conns = dict(conns)
+        for name, conn in self.conns.items():
+            self.server_before[name] = self.server_snapshot(conn)
+            self.factories[name] = conn.cursor_factory
+            conn.cursor_factory = self.cursor_class()
+
+    def detach(self):
+        """Stop timing statements and compare the server statistics."""
+        for name, conn in self.conns.items():
+            conn.cursor_factory = self.factories.pop(name, None)
+            after = self.server_snapshot(conn)
+            before = self.server_before.get(name) or {}
+            if after:
+                self.server_statements[name] = server_deltas(before, after)
+        self.conns = {}
+        _stop_tracing()
+
+    @staticmethod
+    def server_snapshot(conn) -> Dict[Tuple, Tuple]:
+        """pg_stat_statements of the connection's database, if installed."""
+        if conn.closed:
+            return {}
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT to_regclass('pg_stat_statements') IS NOT NULL")
+                if not cur.fetchone()[0]:
+                    conn.commit()
+                    return {}
+                cur.execute(
+                    """
+                    SELECT userid, queryid, query, calls, total_exec_time, rows
+                    FROM pg_stat_statements
+                    WHERE dbid = (SELECT oid FROM pg_database
+                                  WHERE datname = current_database())
+                """
+                )
+                rows = cur.fetchall()
+            conn.commit()
+        except psycopg2.Error as e:
+            conn.rollback()
+            logger.debug(f"pg_stat_statements unavailable: {e}")
+            return {}
+        return {(r[0], r[1]): (r[2], r[3], r[4], r[5]) for r in rows}
+
+    # =========================================
+    # REPORT
+    # =========================================
+
+    def summary(self, status: str) -> Dict[str, Any]:
+        """Everything recorded for the run, as written to summary.json."""
+        statements = [
+            {
+                "statement": key,
+                "stage": stage,
+                "calls": calls,
+                "total_seconds": round(total, 6),
+                "max_seconds": round(slowest, 6),
+                "rows": rows,
+            }
+            for key, (calls, total, slowest, rows, stage) in self.statements.items()
+        ]
+        return {
+            "run_id": self.run_id,
+            "source": self.source,
+            "table": self.table,
+            "status": status,
+            "started": self.started.isoformat(),
+            "finished": datetime.utcnow().isoformat(),
+            "stages": {
+                name: {
+                    "calls": stage.calls,
+                    "wall_seconds": round(stage.wall_seconds, 6),
+                    "cpu_seconds": round(stage.cpu_seconds, 6),
+                    "peak_alloc_bytes": stage.peak_bytes,
+                    "unprofiled_calls": stage.unprofiled,
+                }
+                for name, stage in sorted(self.stages.items())
+            },
+            "peak_traced_bytes": self.allocations_at,
+            "top_allocations": self.allocations,
+            "slowest_statements": sorted(
+                statements, key=lambda s: s["max_seconds"], reverse=True
+            )[:PROFILE_TOP],
+            "busiest_statements": sorted(
+                statements, key=lambda s: s["total_seconds"], reverse=True
+            )[:PROFILE_TOP],
+            "server_statements": self.server_statements,
+        }
+
+    def write(self, status: str) -> Optional[str]:
+        """Write the run's artifacts; returns their directory."""
+        if self.run_id is None:
+            return None
+        path = os.path.join(self.directory, f"run_{self.run_id}")
+        os.makedirs(path, exist_ok=True)
+        for name, stage in self.stages.items():
+            stage.profile.create_stats()
+            if not stage.profile.stats:
+                continue
+            stage.profile.dump_stats(os.path.join(path, f"{name}.prof"))
+            with open(os.path.join(path, f"{name}.txt"), "w") as f:
+                stats = pstats.Stats(stage.profile, stream=f)
+                stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+        summary = self.summary(status)
+        with open(os.path.join(path, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=2, default=str)
+
+        stages = ", ".join(
+            f"{name} {s['wall_seconds']:.2f}s" for name, s in summary["stages"].items()
+        )
+        logger.info(
+            f"🔬 Profiled {self.table} run {self.run_id} ({stages}, peak "
+            f"{self.allocations_at / 2**20:.1f} MiB traced) -> {path}"
+        )
+        prune_profiles(self.directory)
+        return path
+
+
+class _StageContext:
+    __slots__ = ("profiler", "name")
+
+    def __init__(self, profiler: RunProfiler, name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.enter(self.name)
+
+    def __exit__(self, *exc):
+        self.profiler.exit()
+        return False
+
+
+def _timed_cursor(base: type, profiler: RunProfiler) -> type:
+    """Cursor class that reports the time of each round trip to a profiler."""
+
+    class TimedCursor(base):
+        def execute(self, query, vars=None):
+            started = time.perf_counter()
+            try:
+                return super().execute(query, vars)
+            finally:
+                profiler.record_statement(
+                    query, time.perf_counter() - started, self.rowcount
+                )
+
+        def copy_expert(self, sql, file, size=8192):
+            started = time.perf_counter()
+            try:
+                return super().copy_expert(sql, file, size)
+            finally:
+                profiler.record_statement(
+                    sql, time.perf_counter() - started, self.rowcount
+                )
+
+        def fetchmany(self, size=None):
+            started = time.perf_counter()
+            rows = super().fetchmany(self.arraysize if size is None else size)
+            if self.name:
+                # Named cursors run their query on the server as they fetch
+                profiler.record_statement(
+                    f"FETCH {statement_key(self.query or self.name)}",
+                    time.perf_counter() - started,
+                    len(rows),
+                )
+            return rows
+
+    TimedCursor.__name__ = f"Timed{base.__name__}"
+    return TimedCursor
+
+
+def server_deltas(
+    before: Dict[Tuple, Tuple], after: Dict[Tuple, Tuple]
+) -> List[Dict[str, Any]]:
+    """Statements with the most server execution time between two snapshots.
+
+    pg_stat_statements is database-wide, so concurrent sessions are included.
+    """
+    deltas = []
+    for key, (query, calls, total_ms, rows) in after.items():
+        _, calls_before, total_before, rows_before = before.get(key, (None, 0, 0.0, 0))
+        if calls <= calls_before:
+            continue
+        deltas.append(
+            {
+                "statement": statement_key(query),
+                "calls": calls - calls_before,
+                "exec_seconds": round((total_ms - total_before) / 1000, 6),
+                "rows": rows - rows_before,
+            }
+        )
+    deltas.sort(key=lambda d: d["exec_seconds"], reverse=True)
+    return deltas[:PROFILE_TOP]
+
+
+def prune_profiles(directory: str, keep: int = ETL_PROFILE_KEEP_RUNS):
+    """Delete all but the `keep` newest run directories."""
+    if keep <= 0:
+        return
+    runs = []
+    for name in os.listdir(directory):
+        match = re.fullmatch(r"run_(\d+)", name)
+        if match:
+            runs.append((int(match.group(1)), name))
+    for _, name in sorted(runs)[:-keep]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
@@ -2,26 +2,58 @@
 Scheduled ETL Runner for Data Warehouse
 
 This script runs the ETL pipeline on a schedule using APScheduler.
-It performs incremental loads every 5 minutes and full loads daily.
+It performs incremental loads every 5 minutes, a nightly checksum
+reconciliation of the dimensions (which repairs drift and source deletes
+while transferring almost nothing when the tables agree) and a weekly full
+load as a safety net.
+
+Runs never overlap: an incremental trigger that fires while another run is
+in progress is skipped, a full load or maintenance job (reconciliation,
+partition maintenance, cold storage export) waits for it, and every table
+job holds a warehouse advisory lock against runs in other processes. The incremental
+interval adapts to the backlog: the next run comes after
+ETL_MIN_INTERVAL_SECONDS when a table hit ETL_MAX_ROWS_PER_RUN, and the
+interval doubles (up to ETL_MAX_INTERVAL_MINUTES) while runs find nothing new.
 
 Usage:
     python scheduler.py
 
+Connections to the warehouse and every source database are pooled for the
+lifetime of the scheduler process and shared by all runs, and so is the
+dimension key cache (cleared before each full load). Prometheus
+metrics are served on http://<host>:ETL_METRICS_PORT/metrics.
+
 Environment Variables:
-    ETL_INTERVAL_MINUTES: Interval between incremental ETL runs (default: 5)
-    ETL_FULL_LOAD_HOUR: Hour to run full load (default: 2 = 2 AM)
+    ETL_INTERVAL_MINUTES: Interval between incremental ETL runs, fractions
+        allowed (default: 5)
+    ETL_MIN_INTERVAL_SECONDS: Interval while draining a backlog (default: 15)
+    ETL_MAX_INTERVAL_MINUTES: Longest interval when idle (default: 4x
+        ETL_INTERVAL_MINUTES)
+    ETL_FULL_LOAD_HOUR: Hour to run full load, negative to disable (default: 2 = 2 AM)
+    ETL_FULL_LOAD_DAY_OF_WEEK: Cron day(s) of week for the full load,
+        "*" for daily (default: sun)
+    ETL_METRICS_PORT: Port of the /metrics endpoint, 0 to disable (default: 9108)
+    ETL_RECONCILE_HOUR: Hour of the nightly dimension reconciliation,
+        negative to disable (default: 3)
+    ETL_EXPORT_HOUR: Hour of the daily Parquet cold storage export, negative
+        to disable (default: -1)
+    ETL_PROFILE: Profile every table run, writing per-stage CPU, memory and
+        SQL artifacts to ETL_PROFILE_DIR/run_<run_id> (default: false)
 """
 
 import os
 import signal
 import sys
 import logging
+import threading
 from datetime import datetime
+from typing import Any, Dict
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 
-from etl_pipeline import ETLPipeline
+import metrics
+from etl_pipeline import ConnectionPools, DimensionKeyCache, ETLPipeline
 
 # Configure logging
 logging.basicConfig(
@@ -31,69 +63,259 @@ logging.basicConfig(
 logger = logging.getLogger("ETL-Scheduler")
 
 # Configuration
-ETL_INTERVAL_MINUTES = int(os.getenv("ETL_INTERVAL_MINUTES", "5"))
+ETL_INTERVAL_MINUTES = float(os.getenv("ETL_INTERVAL_MINUTES", "5"))
 ETL_FULL_LOAD_HOUR = int(os.getenv("ETL_FULL_LOAD_HOUR", "2"))
+ETL_FULL_LOAD_DAY_OF_WEEK = os.getenv("ETL_FULL_LOAD_DAY_OF_WEEK", "sun")
+ETL_MIN_INTERVAL_SECONDS = float(os.getenv("ETL_MIN_INTERVAL_SECONDS", "15"))
+ETL_MAX_INTERVAL_MINUTES = float(
+    os.getenv("ETL_MAX_INTERVAL_MINUTES", str(ETL_INTERVAL_MINUTES * 4))
+)
+ETL_METRICS_PORT = int(os.getenv("ETL_METRICS_PORT", "9108"))
+ETL_RECONCILE_HOUR = int(os.getenv("ETL_RECONCILE_HOUR", "3"))
+ETL_EXPORT_HOUR = int(os.getenv("ETL_EXPORT_HOUR", "-1"))
+
+# Connection pools shared by every scheduled run
+POOLS = ConnectionPools()
+# Dimension key cache shared by every scheduled run; warmed once, kept
+# current by the pipeline's invalidations and cleared before each full load
+KEY_CACHE = DimensionKeyCache()
+
+SCHEDULER = BlockingScheduler()
+
+# Held by the ETL run or maintenance job in progress, so scheduled jobs never
+# overlap and never need more pooled connections than a single run
+RUN_LOCK = threading.Lock()
+
+# Current incremental interval in seconds, adapted after every run
+incremental_interval = ETL_INTERVAL_MINUTES * 60
+
+
+def next_incremental_interval(results: Dict[str, Dict[str, Any]], current: float) -> float:
+    """Pick the next incremental interval from the table job results.
+
+    Poll again quickly while any table still has a backlog, back off while
+    every table comes back empty, and use the configured interval otherwise
+    (including after failures or skipped jobs).
+    """
+    base = ETL_INTERVAL_MINUTES * 60
+    if any(r["capped"] for r in results.values()):
+        return ETL_MIN_INTERVAL_SECONDS
+    idle = results and all(
+        r["status"] == "success" and r["new_rows"] == 0 for r in results.values()
+    )
+    if idle:
+        return min(max(current, base) * 2, ETL_MAX_INTERVAL_MINUTES * 60)
+    return base
+
+
+def schedule_next_incremental(results: Dict[str, Dict[str, Any]]):
+    """Reschedule the incremental job according to the last run's results."""
+    global incremental_interval
+    interval = next_incremental_interval(results, incremental_interval)
+    if interval != incremental_interval:
+        logger.info(f"⏱️ Next incremental ETL in {interval:.0f}s")
+    incremental_interval = interval
+    SCHEDULER.reschedule_job(
+        "incremental_etl", trigger=IntervalTrigger(seconds=interval)
+    )
 
 
 def run_incremental_etl():
-    """Run incremental ETL for all sources."""
-    logger.info(f"⏰ Scheduled incremental ETL starting at {datetime.utcnow()}")
+    """Run incremental ETL for all sources, unless another run is in progress."""
+    if not RUN_LOCK.acquire(blocking=False):
+        logger.info("⏭️ Previous ETL run still in progress, skipping this trigger")
+        return
 
+    logger.info(f"⏰ Scheduled incremental ETL starting at {datetime.utcnow()}")
+    results = {}
     try:
-        pipeline = ETLPipeline()
+        pipeline = ETLPipeline(pools=POOLS, key_cache=KEY_CACHE)
         pipeline.run_all(full_load=False)
+        results = pipeline.job_results
     except Exception as e:
         logger.error(f"❌ Scheduled ETL failed: {e}")
+        metrics.JOB_FAILURES_TOTAL.labels("incremental_etl").inc()
+    finally:
+        RUN_LOCK.release()
+
+    schedule_next_incremental(results)
+
+
+def wait_for_run_lock(job: str):
+    """Acquire RUN_LOCK, waiting for the run in progress if there is one."""
+    if not RUN_LOCK.acquire(blocking=False):
+        logger.info(f"⏳ Waiting for the ETL run in progress before the {job}")
+        RUN_LOCK.acquire()
 
 
 def run_full_etl():
-    """Run full ETL for all sources (daily)."""
-    logger.info(f"⏰ Scheduled FULL ETL starting at {datetime.utcnow()}")
+    """Run full ETL for all sources (weekly by default)."""
+    wait_for_run_lock("full load")
 
+    logger.info(f"⏰ Scheduled FULL ETL starting at {datetime.utcnow()}")
+    # Picks up dimension versions written by runs in other processes
+    KEY_CACHE.clear()
     try:
-        pipeline = ETLPipeline()
+        pipeline = ETLPipeline(pools=POOLS, key_cache=KEY_CACHE)
         pipeline.run_all(full_load=True)
     except Exception as e:
         logger.error(f"❌ Scheduled full ETL failed: {e}")
+        metrics.JOB_FAILURES_TOTAL.labels("full_etl").inc()
+    finally:
+        RUN_LOCK.release()
+
+
+def run_reconciliation():
+    """Reconcile the dimensions with their source tables (nightly)."""
+    wait_for_run_lock("reconciliation")
+    logger.info(f"⏰ Scheduled reconciliation starting at {datetime.utcnow()}")
+    try:
+        ETLPipeline(pools=POOLS, key_cache=KEY_CACHE).run_reconcile()
+    except Exception as e:
+        logger.error(f"❌ Reconciliation failed: {e}")
+        metrics.JOB_FAILURES_TOTAL.labels("reconciliation").inc()
+    finally:
+        RUN_LOCK.release()
+
+
+def run_partition_maintenance():
+    """Create upcoming fact partitions and apply retention (daily)."""
+    wait_for_run_lock("partition maintenance")
+    logger.info(f"⏰ Scheduled partition maintenance starting at {datetime.utcnow()}")
+
+    pipeline = ETLPipeline(pools=POOLS, key_cache=KEY_CACHE)
+    try:
+        pipeline.connect_warehouse()
+        pipeline.maintain_partitions()
+    except Exception as e:
+        logger.error(f"❌ Partition maintenance failed: {e}")
+        metrics.JOB_FAILURES_TOTAL.labels("partition_maintenance").inc()
+    finally:
+        pipeline.close_connections()
+        RUN_LOCK.release()
+
+
+def run_cold_storage_export():
+    """Export closed fact months to the Parquet cold storage (daily)."""
+    wait_for_run_lock("cold storage export")
+    logger.info(f"⏰ Scheduled cold storage export starting at {datetime.utcnow()}")
+
+    pipeline = ETLPipeline(pools=POOLS, key_cache=KEY_CACHE)
+    try:
+        pipeline.connect_warehouse()
+        pipeline.export_cold_storage()
+    except Exception as e:
+        logger.error(f"❌ Cold storage export failed: {e}")
+        metrics.JOB_FAILURES_TOTAL.labels("cold_storage_export").inc()
+    finally:
+        pipeline.close_connections()
+        RUN_LOCK.release()
 
 
 def graceful_shutdown(signum, frame):
     """Handle shutdown signals."""
     logger.info("Received shutdown signal, stopping scheduler...")
+    POOLS.closeall()
     sys.exit(0)
 
 
 def main():
     logger.info("=" * 60)
     logger.info("🚀 Starting ETL Scheduler")
-    logger.info(f"   Incremental ETL every {ETL_INTERVAL_MINUTES} minutes")
-    logger.info(f"   Full ETL daily at {ETL_FULL_LOAD_HOUR}:00 UTC")
+    logger.info(
+        f"   Incremental ETL every {ETL_INTERVAL_MINUTES} minutes "
+        f"(adaptive: {ETL_MIN_INTERVAL_SECONDS:.0f}s to {ETL_MAX_INTERVAL_MINUTES} minutes)"
+    )
+    if ETL_FULL_LOAD_HOUR >= 0:
+        logger.info(
+            f"   Full ETL at {ETL_FULL_LOAD_HOUR}:00 UTC "
+            f"(day of week: {ETL_FULL_LOAD_DAY_OF_WEEK})"
+        )
+    else:
+        logger.info("   Full ETL disabled")
+    if ETL_RECONCILE_HOUR >= 0:
+        logger.info(f"   Dimension reconciliation at {ETL_RECONCILE_HOUR}:00 UTC")
+    if ETL_EXPORT_HOUR >= 0:
+        logger.info(f"   Cold storage export at {ETL_EXPORT_HOUR}:00 UTC")
+    if ETL_METRICS_PORT:
+        logger.info(f"   Metrics on :{ETL_METRICS_PORT}/metrics")
     logger.info("=" * 60)
 
+    if ETL_METRICS_PORT:
+        metrics.serve(ETL_METRICS_PORT, POOLS)
+
     # Handle shutdown gracefully
     signal.signal(signal.SIGTERM, graceful_shutdown)
     signal.signal(signal.SIGINT, graceful_shutdown)
 
-    scheduler = BlockingScheduler()
+    scheduler = SCHEDULER
 
-    # Incremental ETL every N minutes
+    # Incremental ETL every N minutes (rescheduled after each run); late
+    # triggers are coalesced into one run
     scheduler.add_job(
         run_incremental_etl,
         IntervalTrigger(minutes=ETL_INTERVAL_MINUTES),
         id="incremental_etl",
         name="Incremental ETL",
         replace_existing=True,
+        max_instances=1,
+        coalesce=True,
     )
 
-    # Full ETL daily at specified hour
+    # Full ETL at the specified hour on the specified days
+    if ETL_FULL_LOAD_HOUR >= 0:
+        scheduler.add_job(
+            run_full_etl,
+            CronTrigger(
+                day_of_week=ETL_FULL_LOAD_DAY_OF_WEEK,
+                hour=ETL_FULL_LOAD_HOUR,
+                minute=0,
+            ),
+            id="full_etl",
+            name="Full ETL",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+
+    # Checksum reconciliation of the dimensions every night
+    if ETL_RECONCILE_HOUR >= 0:
+        scheduler.add_job(
+            run_reconciliation,
+            CronTrigger(hour=ETL_RECONCILE_HOUR, minute=0),
+            id="reconciliation",
+            name="Dimension Reconciliation",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+
+    # Partition maintenance daily, an hour before the full load window
     scheduler.add_job(
-        run_full_etl,
-        CronTrigger(hour=ETL_FULL_LOAD_HOUR, minute=0),
-        id="full_etl",
-        name="Daily Full ETL",
+        run_partition_maintenance,
+        CronTrigger(hour=(max(ETL_FULL_LOAD_HOUR, 0) + 23) % 24, minute=0),
+        id="partition_maintenance",
+        name="Partition Maintenance",
         replace_existing=True,
+        max_instances=1,
+        coalesce=True,
     )
 
+    # Parquet export of closed months, ahead of "archive" partition retention
+    if ETL_EXPORT_HOUR >= 0:
+        scheduler.add_job(
+            run_cold_storage_export,
+            CronTrigger(hour=ETL_EXPORT_HOUR, minute=30),
+            id="cold_storage_export",
+            name="Cold Storage Export",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+
+    # Make sure partitions exist before the first load
+    run_partition_maintenance()
+
     # Run initial ETL on startup
     logger.info("Running initial incremental ETL on startup...")
     run_incremental_etl()
@@ -8,12 +8,14 @@
 
 -- Dimension: Users
 CREATE TABLE IF NOT EXISTS dim_users (
-    user_id VARCHAR(255) PRIMARY KEY,
+    user_key BIGSERIAL PRIMARY KEY,
+    user_id VARCHAR(255) NOT NULL,
     username VARCHAR(255) NOT NULL,
     email VARCHAR(255),
     created_at TIMESTAMP NOT NULL,
     last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    -- Slowly changing dimension tracking
+    -- Slowly changing dimension tracking (Type 2: one row per version)
+    hash_diff CHAR(32), -- md5 of the tracked columns (username, email)
     is_current BOOLEAN DEFAULT TRUE,
     valid_from TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     valid_to TIMESTAMP DEFAULT '9999-12-31 23:59:59'
@@ -53,6 +55,9 @@ CREATE TABLE IF NOT EXISTS dim_time (
 -- ============================================
 -- FACT TABLES (transactional data)
 -- ============================================
+-- The large fact tables are range-partitioned by month on their event
+-- time. Monthly partitions (<table>_pYYYYMM) are created ahead of time by
+-- the ETL service; primary and unique keys include the partition column.
 
 -- Fact: Games Played
 CREATE TABLE IF NOT EXISTS fact_games (
@@ -61,7 +66,7 @@ CREATE TABLE IF NOT EXISTS fact_games (
     start_time TIMESTAMP NOT NULL,
     end_time TIMESTAMP,
     duration_minutes INTEGER,
-    total_players INTEGER NOT NULL,
+    total_players INTEGER NOT NULL DEFAULT 0,
     winner_faction VARCHAR(50), -- 'mafia', 'citizens', 'draw'
     total_cycles INTEGER,
     etl_loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -70,48 +75,56 @@ CREATE TABLE IF NOT EXISTS fact_games (
 
 -- Fact: Player Sessions (per game participation)
 CREATE TABLE IF NOT EXISTS fact_player_sessions (
-    session_id SERIAL PRIMARY KEY,
+    session_id SERIAL,
     user_id VARCHAR(255) NOT NULL,
+    user_key BIGINT, -- dim_users version current at load time
     lobby_id VARCHAR(255) NOT NULL,
     game_id INTEGER REFERENCES fact_games(game_id),
     role_assigned VARCHAR(50),
+    role_id INTEGER, -- dim_roles.role_id, NULL for roles not in dim_roles
     joined_at TIMESTAMP NOT NULL,
     left_at TIMESTAMP,
     is_winner BOOLEAN,
     survived_until_end BOOLEAN,
     actions_taken INTEGER DEFAULT 0,
     votes_cast INTEGER DEFAULT 0,
-    etl_loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    etl_loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    source_session_id VARCHAR(255), -- LobbyPlayer.id
+    PRIMARY KEY (session_id, joined_at)
+) PARTITION BY RANGE (joined_at);
 
 -- Fact: Currency Transactions
 CREATE TABLE IF NOT EXISTS fact_transactions (
-    transaction_id SERIAL PRIMARY KEY,
+    transaction_id SERIAL,
     user_id VARCHAR(255) NOT NULL,
+    user_key BIGINT, -- dim_users version current at load time
     transaction_type VARCHAR(50) NOT NULL, -- 'purchase', 'reward', 'spend'
     amount DECIMAL(10, 2) NOT NULL,
     currency_type VARCHAR(50) DEFAULT 'coins',
     description TEXT,
     occurred_at TIMESTAMP NOT NULL,
     etl_loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    source_system VARCHAR(50) DEFAULT 'user_service'
-);
+    source_system VARCHAR(50) DEFAULT 'user_service',
+    source_transaction_id VARCHAR(255), -- CurrencyTransaction.id
+    PRIMARY KEY (transaction_id, occurred_at)
+) PARTITION BY RANGE (occurred_at);
 
 -- Fact: User Access Events (logins, logouts)
 CREATE TABLE IF NOT EXISTS fact_access_events (
-    event_id SERIAL PRIMARY KEY,
+    event_id SERIAL,
     user_id VARCHAR(255) NOT NULL,
     event_type VARCHAR(50) NOT NULL, -- 'login', 'logout', 'session_start'
     device_type VARCHAR(100),
     ip_address VARCHAR(45),
     occurred_at TIMESTAMP NOT NULL,
     etl_loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    source_system VARCHAR(50) DEFAULT 'user_service'
-);
+    source_system VARCHAR(50) DEFAULT 'user_service',
+    PRIMARY KEY (event_id, occurred_at)
+) PARTITION BY RANGE (occurred_at);
 
 -- Fact: Game Actions (kills, votes, abilities)
 CREATE TABLE IF NOT EXISTS fact_game_actions (
-    action_id SERIAL PRIMARY KEY,
+    action_id SERIAL,
     game_id INTEGER REFERENCES fact_games(game_id),
     lobby_id VARCHAR(255) NOT NULL,
     cycle_number INTEGER NOT NULL,
@@ -121,8 +134,10 @@ CREATE TABLE IF NOT EXISTS fact_game_actions (
     action_type VARCHAR(50) NOT NULL, -- 'vote', 'kill', 'investigate', 'heal'
     action_result VARCHAR(50), -- 'success', 'blocked', 'failed'
     occurred_at TIMESTAMP NOT NULL,
-    etl_loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    etl_loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    source_action_id VARCHAR(255), -- Vote.id
+    PRIMARY KEY (action_id, occurred_at)
+) PARTITION BY RANGE (occurred_at);
 
 -- ============================================
 -- ETL TRACKING TABLE
@@ -136,15 +151,152 @@ CREATE TABLE IF NOT EXISTS etl_run_log (
     run_end_time TIMESTAMP,
     records_extracted INTEGER DEFAULT 0,
     records_loaded INTEGER DEFAULT 0,
-    status VARCHAR(20) DEFAULT 'running', -- 'running', 'success', 'failed'
+    status VARCHAR(20) DEFAULT 'running', -- 'running', 'success', 'failed', 'aborted'
     error_message TEXT,
-    last_extracted_timestamp TIMESTAMP
+    last_extracted_timestamp TIMESTAMP,
+    -- Row outcomes of set-based dimension merges
+    records_inserted INTEGER,
+    records_updated INTEGER,
+    records_unchanged INTEGER,
+    -- Replication position applied by CDC runs
+    last_extracted_lsn PG_LSN,
+    -- Tie-breaker of the (last_extracted_timestamp, id) keyset watermark
+    last_extracted_id VARCHAR(255),
+    -- Full loads are resumed from the checkpoint of an unfinished run
+    full_load BOOLEAN DEFAULT FALSE,
+    resumed_from_run_id INTEGER,
+    -- Range-sharded backfills: the parent run holds the shard count, each
+    -- shard run its parent and its [range_start, range_end) time range
+    shard_count INTEGER,
+    parent_run_id INTEGER,
+    range_start TIMESTAMP,
+    range_end TIMESTAMP,
+    -- Bulk load runs until their shadow table is swapped in; their
+    -- watermarks cover rows the live table does not have yet
+    bulk_load BOOLEAN DEFAULT FALSE
+);
+
+-- Source rows loaded inside the watermark overlap window of each table,
+-- used to skip them when the next incremental run re-reads the window
+CREATE TABLE IF NOT EXISTS etl_watermark_keys (
+    source_system VARCHAR(100) NOT NULL,
+    table_name VARCHAR(100) NOT NULL,
+    source_id VARCHAR(255) NOT NULL,
+    source_updated_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (source_system, table_name, source_id, source_updated_at)
+);
+
+-- Days whose rollup rows are stale, recorded as fact rows load and cleared
+-- by each rollup's refresh, so a failed refresh is retried by the next run
+CREATE TABLE IF NOT EXISTS etl_rollup_pending (
+    rollup_table VARCHAR(100) NOT NULL,
+    day DATE NOT NULL,
+    PRIMARY KEY (rollup_table, day)
+);
+
+-- ============================================
+-- AGGREGATE TABLES
+-- (daily rollups, refreshed per touched day after each ETL run)
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS agg_daily_user_transactions (
+    time_id INTEGER NOT NULL REFERENCES dim_time(time_id),
+    user_id VARCHAR(255) NOT NULL,
+    transaction_type VARCHAR(50) NOT NULL,
+    transaction_count INTEGER NOT NULL,
+    total_amount DECIMAL(14, 2) NOT NULL,
+    PRIMARY KEY (time_id, user_id, transaction_type)
+);
+
+CREATE TABLE IF NOT EXISTS agg_daily_transaction_types (
+    time_id INTEGER NOT NULL REFERENCES dim_time(time_id),
+    transaction_type VARCHAR(50) NOT NULL,
+    transaction_count INTEGER NOT NULL,
+    total_amount DECIMAL(14, 2) NOT NULL,
+    unique_users INTEGER NOT NULL,
+    PRIMARY KEY (time_id, transaction_type)
 );
 
+CREATE TABLE IF NOT EXISTS agg_daily_active_players (
+    time_id INTEGER PRIMARY KEY REFERENCES dim_time(time_id),
+    active_players INTEGER NOT NULL,
+    sessions INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS agg_daily_lobby_games (
+    time_id INTEGER NOT NULL REFERENCES dim_time(time_id),
+    lobby_id VARCHAR(255) NOT NULL,
+    games INTEGER NOT NULL,
+    total_players INTEGER NOT NULL,
+    PRIMARY KEY (time_id, lobby_id)
+);
+
+CREATE TABLE IF NOT EXISTS agg_daily_role_stats (
+    time_id INTEGER NOT NULL REFERENCES dim_time(time_id),
+    role_id INTEGER NOT NULL REFERENCES dim_roles(role_id),
+    sessions INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    survivals INTEGER NOT NULL,
+    PRIMARY KEY (time_id, role_id)
+);
+
+-- ============================================
+-- MIGRATIONS FOR EXISTING WAREHOUSES
+-- (idempotent; re-run this file with psql to upgrade)
+-- ============================================
+
+ALTER TABLE etl_run_log ADD COLUMN IF NOT EXISTS records_inserted INTEGER;
+ALTER TABLE etl_run_log ADD COLUMN IF NOT EXISTS records_updated INTEGER;
+ALTER TABLE etl_run_log ADD COLUMN IF NOT EXISTS records_unchanged INTEGER;
+ALTER TABLE etl_run_log ADD COLUMN IF NOT EXISTS last_extracted_lsn PG_LSN;
+ALTER TABLE etl_run_log ADD COLUMN IF NOT EXISTS last_extracted_id VARCHAR(255);
+ALTER TABLE etl_run_log ADD COLUMN IF NOT EXISTS full_load BOOLEAN DEFAULT FALSE;
+ALTER TABLE etl_run_log ADD COLUMN IF NOT EXISTS resumed_from_run_id INTEGER;
+ALTER TABLE etl_run_log ADD COLUMN IF NOT EXISTS shard_count INTEGER;
+ALTER TABLE etl_run_log ADD COLUMN IF NOT EXISTS parent_run_id INTEGER;
+ALTER TABLE etl_run_log ADD COLUMN IF NOT EXISTS range_start TIMESTAMP;
+ALTER TABLE etl_run_log ADD COLUMN IF NOT EXISTS range_end TIMESTAMP;
+ALTER TABLE etl_run_log ADD COLUMN IF NOT EXISTS bulk_load BOOLEAN DEFAULT FALSE;
+ALTER TABLE fact_transactions ADD COLUMN IF NOT EXISTS source_transaction_id VARCHAR(255);
+ALTER TABLE fact_player_sessions ADD COLUMN IF NOT EXISTS source_session_id VARCHAR(255);
+ALTER TABLE fact_game_actions ADD COLUMN IF NOT EXISTS source_action_id VARCHAR(255);
+-- Dimension surrogate keys resolved at load time (the user's current version)
+ALTER TABLE fact_transactions ADD COLUMN IF NOT EXISTS user_key BIGINT;
+ALTER TABLE fact_player_sessions ADD COLUMN IF NOT EXISTS user_key BIGINT;
+ALTER TABLE fact_player_sessions ADD COLUMN IF NOT EXISTS role_id INTEGER;
+-- Games are inserted from the lobby, player counts are derived afterwards
+ALTER TABLE fact_games ALTER COLUMN total_players SET DEFAULT 0;
+-- dim_users keeps one row per version: surrogate key, hash-diff change
+-- detection, and the first version valid from the user's creation
+ALTER TABLE dim_users ADD COLUMN IF NOT EXISTS user_key BIGSERIAL;
+ALTER TABLE dim_users ADD COLUMN IF NOT EXISTS hash_diff CHAR(32);
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.key_column_usage
+        WHERE table_name = 'dim_users' AND constraint_name = 'dim_users_pkey'
+          AND column_name = 'user_key'
+    ) THEN
+        ALTER TABLE dim_users DROP CONSTRAINT IF EXISTS dim_users_pkey;
+        ALTER TABLE dim_users ADD PRIMARY KEY (user_key);
+    END IF;
+END $$;
+UPDATE dim_users
+SET hash_diff = md5(ROW(username, email)::text),
+    valid_from = LEAST(valid_from, created_at)
+WHERE hash_diff IS NULL;
+-- Source-key unique indexes now include the partition column
+DROP INDEX IF EXISTS ux_fact_transactions_source;
+DROP INDEX IF EXISTS ux_fact_sessions_source;
+
 -- ============================================
 -- INDEXES FOR PERFORMANCE
 -- ============================================
 
+-- One current version per user (also the ON CONFLICT target of batch loads)
+CREATE UNIQUE INDEX IF NOT EXISTS ux_dim_users_current ON dim_users(user_id) WHERE is_current;
+-- Point-in-time joins: f.user_id = d.user_id AND f.ts >= d.valid_from AND f.ts < d.valid_to
+CREATE INDEX IF NOT EXISTS idx_dim_users_validity ON dim_users(user_id, valid_from, valid_to);
 CREATE INDEX IF NOT EXISTS idx_fact_games_lobby ON fact_games(lobby_id);
 CREATE INDEX IF NOT EXISTS idx_fact_games_start ON fact_games(start_time);
 CREATE INDEX IF NOT EXISTS idx_fact_sessions_user ON fact_player_sessions(user_id);
@@ -152,7 +304,19 @@ CREATE INDEX IF NOT EXISTS idx_fact_sessions_lobby ON fact_player_sessions(lobby
 CREATE INDEX IF NOT EXISTS idx_fact_transactions_user ON fact_transactions(user_id);
 CREATE INDEX IF NOT EXISTS idx_fact_transactions_date ON fact_transactions(occurred_at);
 CREATE INDEX IF NOT EXISTS idx_fact_actions_game ON fact_game_actions(game_id);
+CREATE INDEX IF NOT EXISTS idx_fact_actions_lobby ON fact_game_actions(lobby_id);
+-- Source natural keys make fact loads idempotent (legacy rows keep NULL);
+-- the event time is immutable per source row, so it can join the key
+CREATE UNIQUE INDEX IF NOT EXISTS ux_fact_transactions_source_time ON fact_transactions(source_transaction_id, occurred_at);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_fact_sessions_source_time ON fact_player_sessions(source_session_id, joined_at);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_fact_actions_source_time ON fact_game_actions(source_action_id, occurred_at);
+-- One game per lobby start (a lobby can host several games over time)
+CREATE UNIQUE INDEX IF NOT EXISTS ux_fact_games_lobby_start ON fact_games(lobby_id, start_time);
+-- Natural-key lookups used by --compact-facts
+CREATE INDEX IF NOT EXISTS idx_fact_sessions_natural ON fact_player_sessions(user_id, lobby_id, joined_at);
 CREATE INDEX IF NOT EXISTS idx_etl_log_source ON etl_run_log(source_system, table_name);
+CREATE INDEX IF NOT EXISTS idx_etl_log_parent ON etl_run_log(parent_run_id) WHERE parent_run_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_agg_user_transactions_user ON agg_daily_user_transactions(user_id);
 
 -- ============================================
 -- INITIAL SEED DATA FOR DIMENSIONS